@@ -1,28 +1,16 @@
 import os
-import logging
-
-from flask import Flask
-from flask import render_template, jsonify, request
-from models import (
-    ElementSummaryRequest,
-    ElementFromTeamRequest
-)
-from config import Config
-
-from etl.process.bootstrap_static import get_elements_from_team
-from etl.process.element_summary import fetch_and_upload_element_summary
-from log.logger import setup_logging
 
+from flask import Flask, Response
+from flask import render_template, request
 
-# Initialize logging
-setup_logging()
+from handlers import (
+    READ_ROUTES,
+    WRITE_ROUTES,
+    ApiRequest,
+    HandlerResult,
+    fetch_and_upload_element_summary_endpoint
+)
 
-# Load and validate configuration early
-try:
-    config = Config.from_env()
-except ValueError as e:
-    logging.error(f"Failed to load configuration: {e}")
-    raise
 
 # Create Flask app
 app = Flask(
@@ -32,6 +20,27 @@ app = Flask(
 )
 
 
+def api_request() -> ApiRequest:
+    """Adapt the current Flask request for the shared handlers."""
+    return ApiRequest(body=request.get_data(),
+                      headers=request.headers,
+                      method=request.method,
+                      query=request.args.to_dict(flat=False))
+
+
+def flask_response(result: HandlerResult) -> Response:
+    """Adapt a handler's status, body and headers into a Flask response."""
+    status, body, headers = result
+    return Response(body, status=status, headers=headers)
+
+
+def flask_view(handler):
+    """Wrap a shared handler as a Flask view function."""
+    def view() -> Response:
+        return flask_response(handler(api_request()))
+    return view
+
+
 @app.route('/')
 def hello():
     """Return a friendly HTTP greeting."""
@@ -47,53 +56,19 @@ def hello():
                            Revision=revision)
 
 
-@app.route('/fetch-and-upload-element-summary', methods=['POST'])
-def fetch_and_upload_element_summary_endpoint():
-    try:
-        data = ElementSummaryRequest(**request.get_json())
-
-        fetch_and_upload_element_summary(
-            project_id=config.project_id,
-            bucket_name=config.bucket_name,
-            dataset_id=config.dataset_id,
-            destination_folder=data.destination_folder,
-            team_ids=data.team_ids,
-            element_ids=data.element_ids,
-            max_workers=data.max_workers
-        )
-
-        return jsonify({"status": "success"}), 200
-
-    except ValueError as ve:
-        logging.error(f"Validation error in "
-                      f"fetch_and_upload_element_summary_endpoint: {ve}")
-        return jsonify({"status": "error", "message": str(ve)}), 400
-
-    except Exception as e:
-        logging.error(
-            f"Error in fetch_and_upload_element_summary_endpoint: {e}")
-        return jsonify({"status": "error", "message": str(e)}), 500
-
-
-@app.route('/get-elements-from-team', methods=['POST'])
-def get_elements_from_team_endpoint():
-    try:
-        # Validate input using Pydantic model
-        data = ElementFromTeamRequest(**request.get_json())
-
-        logging.info(f"Retrieveing elements for team_id: {data.team_id}")
-        elements = get_elements_from_team(data.team_id)
-        return jsonify({"elements": elements}), 200
-
-    except ValueError as ve:
-        logging.error(f"Validation error in get_elements_from_team_endpoint:"
-                      f" {ve}")
-        return jsonify({"status": "error", "message": str(ve)}), 400
-
-    except Exception as e:
-        logging.error(
-            f"Error in get_elements_from_team_endpoint: {e}")
-        return jsonify({"status": "error", "message": str(e)}), 500
+app.add_url_rule(
+    '/fetch-and-upload-element-summary',
+    endpoint=fetch_and_upload_element_summary_endpoint.__name__,
+    view_func=flask_view(fetch_and_upload_element_summary_endpoint),
+    methods=['POST'])
+
+for path, handler in READ_ROUTES.items():
+    app.add_url_rule(path, endpoint=handler.__name__,
+                     view_func=flask_view(handler), methods=['GET', 'POST'])
+
+for path, handler in WRITE_ROUTES.items():
+    app.add_url_rule(path, endpoint=handler.__name__,
+                     view_func=flask_view(handler), methods=['POST'])
 
 
 if __name__ == '__main__':
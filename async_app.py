@@ -0,0 +1,115 @@
+import os
+import asyncio
+
+import aiohttp
+import jinja2
+from aiohttp import web
+
+from handlers import (
+    READ_ROUTES,
+    WRITE_ROUTES,
+    ApiRequest,
+    HandlerResult,
+    fetch_and_upload_element_summary_endpoint_async
+)
+
+
+# Async serving mode: the same API as app.py served by aiohttp under
+# gunicorn's aiohttp.GunicornWebWorker. Each worker runs one event loop and
+# one aiohttp session that every request shares. The request handlers are
+# shared with app.py; the blocking ones run in the loop's executor.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CLIENT_SESSION = web.AppKey("client_session", aiohttp.ClientSession)
+
+templates = jinja2.Environment(
+    loader=jinja2.FileSystemLoader(os.path.join(BASE_DIR, 'ui/templates')),
+    autoescape=True
+)
+routes = web.RouteTableDef()
+
+
+async def api_request(request: web.Request) -> ApiRequest:
+    """Adapt an aiohttp request for the shared handlers."""
+    return ApiRequest(body=await request.read(),
+                      headers=request.headers,
+                      method=request.method,
+                      query={key: request.query.getall(key)
+                             for key in request.query})
+
+
+def aiohttp_response(result: HandlerResult) -> web.Response:
+    """Adapt a handler's status, body and headers into an aiohttp
+    response."""
+    status, body, headers = result
+    return web.Response(body=body, status=status, headers=headers)
+
+
+def aiohttp_view(handler):
+    """Wrap a blocking shared handler as an aiohttp view that runs it in
+    the loop's executor, so store reloads, SQLite queries and first
+    bootstrap-static fetches never block the loop."""
+    async def view(request: web.Request) -> web.Response:
+        result = await asyncio.get_running_loop().run_in_executor(
+            None, handler, await api_request(request))
+        return aiohttp_response(result)
+    return view
+
+
+async def client_session_ctx(app: web.Application):
+    """Open the worker's shared aiohttp session for the app's lifetime."""
+    async with aiohttp.ClientSession() as session:
+        app[CLIENT_SESSION] = session
+        yield
+
+
+@routes.get('/')
+async def hello(request: web.Request) -> web.Response:
+    """Return a friendly HTTP greeting."""
+    message = "It's running!"
+
+    """Get Cloud Run environment variables."""
+    service = os.environ.get('K_SERVICE', 'Unknown service')
+    revision = os.environ.get('K_REVISION', 'Unknown revision')
+
+    body = templates.get_template('index.html').render(
+        message=message,
+        Service=service,
+        Revision=revision
+    )
+    return web.Response(text=body, content_type='text/html')
+
+
+@routes.post('/fetch-and-upload-element-summary')
+async def fetch_and_upload_element_summary_endpoint(
+        request: web.Request
+        ) -> web.Response:
+    return aiohttp_response(
+        await fetch_and_upload_element_summary_endpoint_async(
+            await api_request(request), request.app[CLIENT_SESSION]))
+
+
+for path, handler in READ_ROUTES.items():
+    routes.get(path)(aiohttp_view(handler))
+    routes.post(path)(aiohttp_view(handler))
+
+for path, handler in WRITE_ROUTES.items():
+    routes.post(path)(aiohttp_view(handler))
+
+
+def create_app() -> web.Application:
+    """Create the aiohttp application."""
+    application = web.Application()
+    application.cleanup_ctx.append(client_session_ctx)
+    application.add_routes(routes)
+    application.router.add_static(
+        '/static', os.path.join(BASE_DIR, 'ui/static'))
+    return application
+
+
+app = create_app()
+
+
+if __name__ == '__main__':
+    server_port = int(os.environ.get('PORT', '8080'))
+    web.run_app(app, port=server_port, host='0.0.0.0')
@@ -1,21 +1,44 @@
 import os
-from pydantic import BaseModel, Field
+from typing import Optional
+from pydantic import BaseModel, Field, field_validator, model_validator
 from pydantic import StrictStr
 
+from etl.upload.sinks import SINKS
+
 
 class Config(BaseModel):
-    project_id: StrictStr = Field(
-        ...,
+    project_id: Optional[StrictStr] = Field(
+        None,
         description="Google Cloud Project ID"
     )
-    bucket_name: StrictStr = Field(
-        ...,
+    bucket_name: Optional[StrictStr] = Field(
+        None,
         description="Google Cloud Storage bucket name"
     )
-    dataset_id: StrictStr = Field(
-        ...,
+    dataset_id: Optional[StrictStr] = Field(
+        None,
         description="BigQuery dataset ID"
     )
+    sink: StrictStr = Field(
+        "gcs",
+        description="Where pipeline runs write their tables"
+    )
+
+    @field_validator('sink')
+    def validate_sink(cls, v):
+        if v not in SINKS:
+            raise ValueError(f"sink must be one of {SINKS}")
+        return v
+
+    @model_validator(mode='after')
+    def validate_gcp_settings(self) -> 'Config':
+        # Only the gcs sink writes to Google Cloud
+        if self.sink == "gcs" and not (
+                self.project_id and self.bucket_name and self.dataset_id):
+            raise ValueError(
+                "project_id, bucket_name and dataset_id are required by the "
+                "gcs sink")
+        return self
 
     @classmethod
     def from_env(cls) -> 'Config':
@@ -24,7 +47,8 @@ class Config(BaseModel):
             return cls(
                 project_id=os.getenv('PROJECT_ID'),
                 bucket_name=os.getenv('BUCKET_ID'),
-                dataset_id=os.getenv('DATASET_ID')
+                dataset_id=os.getenv('DATASET_ID'),
+                sink=os.getenv('SINK', 'gcs')
             )
         except ValueError as e:
             raise ValueError(f"Configuration error: {e}")
@@ -0,0 +1,2 @@
+from .snapshot import SnapshotArchive  # noqa: F401
+from .snapshot import current_gameweek, get_archive  # noqa: F401
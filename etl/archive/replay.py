@@ -0,0 +1,119 @@
+import logging
+from typing import List, Dict, Any
+
+from etl.archive.snapshot import SnapshotArchive
+from etl.fetch.bootstrap_static import BootstrapStaticFetcher
+from etl.fetch.element_summary import ElementSummaryFetcher
+
+
+class ReplayBootstrapStaticFetcher(BootstrapStaticFetcher):
+    """
+    Serves bootstrap-static data from a SnapshotArchive instead of the API.
+
+    Attributes:
+        archive (SnapshotArchive): Archive to read payloads from
+        gameweek (int): Gameweek whose latest payload is replayed
+    """
+
+    def __init__(self, archive: SnapshotArchive, gameweek: int) -> None:
+        """
+        Initialize the ReplayBootstrapStaticFetcher.
+
+        Args:
+            archive (SnapshotArchive): Archive to read payloads from
+            gameweek (int): Gameweek whose latest payload is replayed
+        """
+        super().__init__()
+        self.archive = archive
+        self.gameweek = gameweek
+
+    def fetch(self) -> Dict[str, Any]:
+        """
+        Loads the archived bootstrap-static payload.
+
+        Returns:
+            Dict[str, Any]: The archived JSON payload
+
+        Raises:
+            ValueError: If no payload is archived for the gameweek
+        """
+        data = self.archive.latest("bootstrap_static", self.gameweek)
+        if data is None:
+            raise ValueError(
+                "No bootstrap-static payload archived for gameweek "
+                f"{self.gameweek}")
+        return data
+
+
+class ReplayElementSummaryFetcher(ElementSummaryFetcher):
+    """
+    Serves element-summary data from a SnapshotArchive instead of the API.
+
+    Payloads are read synchronously from disk, so no event loop or HTTP
+    session is created. Players with nothing archived for the gameweek are
+    reported in the errors table, as a failed request would be.
+    """
+
+    def __init__(self,
+                 player_ids: List[int],
+                 archive: SnapshotArchive,
+                 gameweek: int
+                 ) -> None:
+        """
+        Initialize the ReplayElementSummaryFetcher.
+
+        Args:
+            player_ids (List[int]): List of player IDs to replay
+            archive (SnapshotArchive): Archive to read payloads from
+            gameweek (int): Gameweek whose latest payloads are replayed
+        """
+        super().__init__(player_ids=player_ids, gameweek=gameweek)
+        # Kept separate from self.archive so replayed payloads are not
+        # written back into the archive
+        self.source_archive = archive
+
+    def fetch_all_players_from_archive(self) -> List[Dict[str, Any]]:
+        """
+        Loads all players' payloads from the archive.
+
+        Returns:
+            List[Dict[str, Any]]: List of dictionaries containing player data
+        """
+        digests = self.source_archive.latest_digests(
+            "element_summary", self.gameweek)
+        results = []
+        for player_id in self.player_ids:
+            digest = digests.get(player_id)
+            if digest is None:
+                results.append({
+                    "player_id": player_id,
+                    "fixtures": [],
+                    "history": [],
+                    "history_past": [],
+                    "error": f"Not archived for gameweek {self.gameweek}"
+                })
+                continue
+            raw_data = self.source_archive.get(digest)
+            results.append(self.parse_player(player_id, raw_data))
+
+        logging.info("Replayed %d players from gameweek %d",
+                     len(results), self.gameweek)
+        return results
+
+    def run(self) -> Dict[str, List[Any]]:
+        """
+        Replays the archived payloads and returns flattened results.
+
+        Returns:
+            Dict[str, List[Any]]: Dictionary containing all replayed data
+        """
+        return self.flatten_results(self.fetch_all_players_from_archive())
+
+    async def run_async(self, session=None) -> Dict[str, List[Any]]:
+        """
+        Replays the archived payloads; the session is not used.
+
+        Returns:
+            Dict[str, List[Any]]: Dictionary containing all replayed data
+        """
+        return self.run()
@@ -0,0 +1,302 @@
+import os
+import json
+import gzip
+import fcntl
+import hashlib
+import logging
+import threading
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import List, Dict, Optional, Any, Tuple
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - depends on the environment
+    zstandard = None
+
+
+def current_gameweek(events: List[Dict[str, Any]]) -> int:
+    """
+    Determine the current gameweek from the bootstrap-static events table.
+
+    Args:
+        events (List[Dict[str, Any]]): The bootstrap-static events table
+
+    Returns:
+        int: The id of the current event, or 0 before the season starts
+    """
+    for event in events:
+        if event.get("is_current"):
+            return event["id"]
+    return 0
+
+
+class SnapshotArchive:
+    """
+    Stores raw API payloads on local disk, compressed and deduplicated by
+    content hash, with a per-gameweek index of every payload fetched.
+
+    Objects are written to ``objects/<aa>/<sha256>.json.zst`` (or
+    ``.json.gz`` when zstandard is not installed) and each gameweek has an
+    index file ``index/gw<NN>.jsonl`` with one line per distinct payload.
+    Objects are compressed and written outside any lock, as concurrent
+    writers of one object write the same bytes. Index lines are appended
+    under an exclusive file lock, after reading the lines other processes
+    appended since, so processes sharing the archive never index the same
+    payload twice in a row.
+
+    Attributes:
+        root_dir (str): Directory the archive is stored in
+        level (int): Compression level used for new objects
+    """
+
+    def __init__(self, root_dir: str, level: int = 10) -> None:
+        """
+        Initialize the SnapshotArchive.
+
+        Args:
+            root_dir (str): Directory the archive is stored in. Created if it
+                does not exist.
+            level (int): Compression level used for new objects
+        """
+        self.root_dir = root_dir
+        self.level = level
+        self._lock = threading.Lock()
+        # gameweek -> {(kind, key): digest} of the latest indexed payloads,
+        # and the length of the index read into it
+        self._latest: Dict[int, Dict[Tuple[str, Optional[int]], str]] = {}
+        self._index_offsets: Dict[int, int] = {}
+        os.makedirs(os.path.join(root_dir, "objects"), exist_ok=True)
+        os.makedirs(os.path.join(root_dir, "index"), exist_ok=True)
+
+    @staticmethod
+    def encode(payload: Any) -> bytes:
+        """Serialise a payload to canonical JSON bytes."""
+        return json.dumps(
+            payload, sort_keys=True, separators=(",", ":")
+        ).encode("utf-8")
+
+    def _object_path(self, digest: str, extension: str) -> str:
+        return os.path.join(
+            self.root_dir, "objects", digest[:2], f"{digest}{extension}")
+
+    def _index_path(self, gameweek: int) -> str:
+        return os.path.join(self.root_dir, "index", f"gw{gameweek:02d}.jsonl")
+
+    def _compress(self, raw: bytes) -> Tuple[bytes, str]:
+        if zstandard is not None:
+            compressor = zstandard.ZstdCompressor(level=self.level)
+            return compressor.compress(raw), ".json.zst"
+        return gzip.compress(raw, compresslevel=min(self.level, 9)), \
+            ".json.gz"
+
+    def _write_object(self, digest: str, raw: bytes) -> None:
+        for extension in (".json.zst", ".json.gz"):
+            if os.path.exists(self._object_path(digest, extension)):
+                return
+
+        body, extension = self._compress(raw)
+        path = self._object_path(digest, extension)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(body)
+        os.replace(tmp_path, path)
+
+    def _load_latest(
+            self,
+            gameweek: int
+            ) -> Dict[Tuple[str, Optional[int]], str]:
+        """
+        Bring the latest digests of a gameweek up to date with the index
+        lines appended since they were last read, by any process. Called
+        with the lock held.
+        """
+        latest = self._latest.setdefault(gameweek, {})
+        offset = self._index_offsets.get(gameweek, 0)
+        try:
+            with open(self._index_path(gameweek), "rb") as f:
+                f.seek(offset)
+                appended = f.read()
+        except FileNotFoundError:
+            return latest
+
+        # A line still being written is read on the next call
+        end = appended.rfind(b"\n") + 1
+        for line in appended[:end].splitlines():
+            if line.strip():
+                entry = json.loads(line)
+                latest[(entry["kind"], entry["key"])] = entry["sha256"]
+        self._index_offsets[gameweek] = offset + end
+        return latest
+
+    def put(self,
+            kind: str,
+            payload: Any,
+            gameweek: Optional[int] = None,
+            key: Optional[int] = None
+            ) -> str:
+        """
+        Store a raw payload and record it in the gameweek index.
+
+        The payload is only written if its content hash is new, and an index
+        line is only appended if the content differs from the latest payload
+        already indexed for the same kind and key in that gameweek.
+
+        Args:
+            kind (str): Payload type, e.g. "bootstrap_static" or
+                "element_summary"
+            payload (Any): The decoded JSON payload
+            gameweek (Optional[int]): Gameweek to index the payload under.
+                Defaults to 0.
+            key (Optional[int]): Identifier within the kind, e.g. the player
+                id for element-summary payloads
+
+        Returns:
+            str: The sha256 content hash of the payload
+        """
+        gameweek = gameweek or 0
+        raw = self.encode(payload)
+        digest = hashlib.sha256(raw).hexdigest()
+        self._write_object(digest, raw)
+
+        with self._lock, open(self._index_path(gameweek), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                if self._load_latest(gameweek).get((kind, key)) == digest:
+                    return digest
+
+                entry = {
+                    "kind": kind,
+                    "key": key,
+                    "sha256": digest,
+                    "fetched_at": datetime.now(timezone.utc).isoformat(),
+                }
+                f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+                f.flush()
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+        return digest
+
+    def put_bootstrap_static(self, payload: Dict[str, Any]) -> str:
+        """
+        Store a raw bootstrap-static payload under its current gameweek.
+
+        Args:
+            payload (Dict[str, Any]): The full bootstrap-static response
+
+        Returns:
+            str: The sha256 content hash of the payload
+        """
+        return self.put(
+            kind="bootstrap_static",
+            payload=payload,
+            gameweek=current_gameweek(payload.get("events", []))
+        )
+
+    def get(self, digest: str) -> Any:
+        """
+        Load a payload by content hash.
+
+        Args:
+            digest (str): The sha256 content hash of the payload
+
+        Returns:
+            Any: The decoded JSON payload
+
+        Raises:
+            KeyError: If the payload is not in the archive
+        """
+        zst_path = self._object_path(digest, ".json.zst")
+        gz_path = self._object_path(digest, ".json.gz")
+        if os.path.exists(zst_path):
+            if zstandard is None:
+                raise RuntimeError(
+                    "zstandard is required to read archived object "
+                    f"{digest}")
+            with open(zst_path, "rb") as f:
+                raw = zstandard.ZstdDecompressor().decompress(f.read())
+        elif os.path.exists(gz_path):
+            with open(gz_path, "rb") as f:
+                raw = gzip.decompress(f.read())
+        else:
+            raise KeyError(f"Object {digest} not found in archive")
+        return json.loads(raw)
+
+    def entries(self, gameweek: int) -> List[Dict[str, Any]]:
+        """
+        Read the index of a gameweek.
+
+        Args:
+            gameweek (int): The gameweek to read
+
+        Returns:
+            List[Dict[str, Any]]: Index entries in the order they were written
+        """
+        path = self._index_path(gameweek)
+        if not os.path.exists(path):
+            return []
+        with open(path) as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def latest_digests(
+            self,
+            kind: str,
+            gameweek: int
+            ) -> Dict[Optional[int], str]:
+        """
+        Map each key of a kind to its latest payload hash in a gameweek.
+
+        Args:
+            kind (str): Payload type to look up
+            gameweek (int): The gameweek to read
+
+        Returns:
+            Dict[Optional[int], str]: Latest content hash for each key
+        """
+        with self._lock:
+            latest = self._load_latest(gameweek)
+            return {k: digest for (entry_kind, k), digest in latest.items()
+                    if entry_kind == kind}
+
+    def latest(self,
+               kind: str,
+               gameweek: int,
+               key: Optional[int] = None
+               ) -> Optional[Any]:
+        """
+        Load the latest payload of a kind and key in a gameweek.
+
+        Args:
+            kind (str): Payload type to look up
+            gameweek (int): The gameweek to read
+            key (Optional[int]): Identifier within the kind
+
+        Returns:
+            Optional[Any]: The decoded payload, or None if nothing is archived
+        """
+        digest = self.latest_digests(kind, gameweek).get(key)
+        if digest is None:
+            return None
+        return self.get(digest)
+
+
+@lru_cache(maxsize=None)
+def _get_archive_internal(root_dir: str) -> SnapshotArchive:
+    logging.info(f"Archiving raw API payloads to {root_dir}")
+    return SnapshotArchive(root_dir)
+
+
+def get_archive() -> Optional[SnapshotArchive]:
+    """
+    Return the archive configured by the ARCHIVE_DIR environment variable.
+
+    Returns:
+        Optional[SnapshotArchive]: The shared archive, or None if archiving
+            is not enabled
+    """
+    root_dir = os.getenv("ARCHIVE_DIR")
+    if not root_dir:
+        return None
+    return _get_archive_internal(root_dir)
@@ -1,8 +1,13 @@
+import time
 import logging
 import requests
 from typing import List, Dict, Optional, Any
 from functools import lru_cache
 
+from etl.archive import SnapshotArchive, get_archive
+from etl.fetch.circuit_breaker import CircuitBreaker, fpl_circuit_breaker
+from etl.fetch.shared_snapshot import get_shared_snapshot
+
 
 class BootstrapStaticFetcher:
     """
@@ -12,11 +17,21 @@ class BootstrapStaticFetcher:
         URL (str): The API endpoint URL for bootstrap-static data
         tables_to_extract (List[str]): List of table names to extract from the
             response
+        archive (Optional[SnapshotArchive]): Archive that raw payloads are
+            written to as they are fetched
+        circuit_breaker (CircuitBreaker): Breaker that pauses requests while
+            the game is updating
+        timeout (float): Seconds to wait for the API to connect or send data
     """
 
     URL = "https://fantasy.premierleague.com/api/bootstrap-static/"
 
-    def __init__(self, tables_to_extract: Optional[List[str]] = None) -> None:
+    def __init__(self,
+                 tables_to_extract: Optional[List[str]] = None,
+                 archive: Optional[SnapshotArchive] = None,
+                 circuit_breaker: Optional[CircuitBreaker] = None,
+                 timeout: float = 30.0
+                 ) -> None:
         """
         Initialize the BootstrapStaticFetcher.
 
@@ -25,10 +40,19 @@ class BootstrapStaticFetcher:
                 extract.
                 Defaults to ['elements', 'teams', 'events', 'element_types']
                 if not provided.
+            archive (Optional[SnapshotArchive]): If provided, every raw
+                payload is stored in the archive before it is returned
+            circuit_breaker (Optional[CircuitBreaker]): Defaults to the
+                breaker shared by all FPL fetchers
+            timeout (float): Seconds to wait for the API to connect or send
+                data before giving up
         """
         self.tables_to_extract = tables_to_extract or [
             "elements", "teams", "events", "element_types"
         ]
+        self.archive = archive
+        self.circuit_breaker = circuit_breaker or fpl_circuit_breaker
+        self.timeout = timeout
 
     def fetch(self) -> Dict[str, Any]:
         """
@@ -40,13 +64,20 @@ class BootstrapStaticFetcher:
         Raises:
             requests.exceptions.RequestException: If there's an error making
             the request
+            CircuitOpenError: If the API stayed unavailable while waiting
         """
+        self.circuit_breaker.before_request()
         try:
-            response = requests.get(self.URL)
+            response = requests.get(self.URL, timeout=self.timeout)
             if response.status_code == 200:
-                return response.json()
+                self.circuit_breaker.record_success()
+                data = response.json()
+                if self.archive is not None:
+                    self.archive.put_bootstrap_static(data)
+                return data
             else:
                 if response.status_code == 503:
+                    self.circuit_breaker.record_failure()
                     logging.error("Service Unavailable (503) - "
                                   "The game may be updating.")
                 response.raise_for_status()
@@ -78,6 +109,10 @@ class BootstrapStaticFetcher:
         return self.extract_tables(data)
 
 
+# Changes whenever the per-process cache is filled with a new fetch
+_bootstrap_static_version = 0
+
+
 @lru_cache(maxsize=None)
 def __fetch_bootstrap_static_internal() -> Dict[str, List[Any]]:
     """
@@ -86,8 +121,12 @@ def __fetch_bootstrap_static_internal() -> Dict[str, List[Any]]:
     Returns:
         Dict[str, List[Any]]: Dictionary containing the extracted tables
     """
-    bootstrap_static_fetcher = BootstrapStaticFetcher()
-    return bootstrap_static_fetcher.run()
+    global _bootstrap_static_version
+
+    bootstrap_static_fetcher = BootstrapStaticFetcher(archive=get_archive())
+    data = bootstrap_static_fetcher.run()
+    _bootstrap_static_version = time.time_ns()
+    return data
 
 
 def fetch_bootstrap_static(
@@ -96,17 +135,44 @@ def fetch_bootstrap_static(
     """
     Retrieve the data from bootstrap static, using cached data if available.
 
+    When BOOTSTRAP_SNAPSHOT_PATH is set the tables are served from a
+    snapshot file shared by all worker processes rather than a per-process
+    cache, and only one process fetches when it is missing or refreshed.
+
     Args:
         force_refresh (bool): If True, clears the cache and fetches fresh data
 
     Returns:
         Dict[str, List[Any]]: Dictionary containing the extracted tables
     """
+    shared_snapshot = get_shared_snapshot()
+    if shared_snapshot is not None:
+        fetcher = BootstrapStaticFetcher(archive=get_archive())
+        return shared_snapshot.load(fetcher.run, force_refresh=force_refresh)
+
     if force_refresh:
         __fetch_bootstrap_static_internal.cache_clear()
     return __fetch_bootstrap_static_internal()
 
 
+def bootstrap_static_version() -> int:
+    """
+    Return the version of the bootstrap-static data currently being served,
+    loading the data first if required.
+
+    The version changes whenever the data is refreshed, so it can be used to
+    key anything derived from it.
+
+    Returns:
+        int: The version of the shared snapshot or of the per-process cache
+    """
+    fetch_bootstrap_static()
+    shared_snapshot = get_shared_snapshot()
+    if shared_snapshot is not None:
+        return shared_snapshot.version
+    return _bootstrap_static_version
+
+
 if __name__ == "__main__":
     fetcher = BootstrapStaticFetcher()
     data = fetcher.fetch()
@@ -0,0 +1,245 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+from typing import List, Dict, Any, Callable, Optional
+
+import requests
+
+
+class FplUnavailableError(Exception):
+    """
+    Raised when the FPL API cannot serve consistent data right now.
+
+    Attributes:
+        retry_after (int): Suggested number of seconds to wait before retrying
+    """
+
+    def __init__(self, message: str, retry_after: int = 300) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(FplUnavailableError):
+    """Raised when the API kept returning 503 for longer than the max pause."""
+
+
+class GameUpdatingError(FplUnavailableError):
+    """Raised when a finished gameweek's data has not been checked yet."""
+
+
+class CircuitBreaker:
+    """
+    Shared circuit breaker for requests to the FPL API.
+
+    While the game is updating the API returns 503 for every request. After
+    `failure_threshold` consecutive 503s the circuit opens: callers pause
+    instead of sending requests, and one caller at a time probes the API
+    with a cheap request every `cooldown` seconds. The first successful
+    probe closes the circuit and the paused callers resume. A caller that
+    has waited for `max_pause` seconds raises CircuitOpenError instead.
+
+    Safe to share between threads and event loops.
+
+    Attributes:
+        PROBE_URL (str): Small endpoint used to probe the API
+        failure_threshold (int): Consecutive 503s that open the circuit
+        cooldown (float): Seconds between probes while open
+        max_pause (float): Seconds a caller waits before giving up
+    """
+
+    PROBE_URL = "https://fantasy.premierleague.com/api/event-status/"
+
+    def __init__(self,
+                 failure_threshold: int = 5,
+                 cooldown: float = 30.0,
+                 max_pause: float = 900.0,
+                 probe: Optional[Callable[[], bool]] = None
+                 ) -> None:
+        """
+        Initialize the CircuitBreaker.
+
+        Args:
+            failure_threshold (int): Consecutive 503s that open the circuit
+            cooldown (float): Seconds between probes while open
+            max_pause (float): Seconds a caller waits before giving up
+            probe (Optional[Callable[[], bool]]): Returns True if the API is
+                available. Defaults to a GET of PROBE_URL.
+        """
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.max_pause = max_pause
+        self.probe = probe or self._probe
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """Close the circuit and forget past failures."""
+        with self._lock:
+            self._failures = 0
+            self._opened_at: Optional[float] = None
+            self._next_probe_at = 0.0
+            self._probing = False
+
+    @property
+    def is_open(self) -> bool:
+        """Whether requests are currently paused."""
+        return self._opened_at is not None
+
+    def _probe(self) -> bool:
+        try:
+            return requests.get(self.PROBE_URL, timeout=10).status_code == 200
+        except requests.exceptions.RequestException:
+            return False
+
+    def record_success(self) -> None:
+        """Record a successful request, closing the circuit."""
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+
+    def record_failure(self) -> None:
+        """Record a 503 response, opening the circuit at the threshold."""
+        with self._lock:
+            self._failures += 1
+            if self._opened_at is None \
+                    and self._failures >= self.failure_threshold:
+                now = time.monotonic()
+                self._opened_at = now
+                self._next_probe_at = now + self.cooldown
+                logging.warning(
+                    "FPL API returned %d consecutive 503s, the game may be "
+                    "updating. Pausing requests and probing every %.0fs.",
+                    self._failures, self.cooldown)
+
+    def _poll(self, deadline: float) -> Optional[float]:
+        """
+        Check the circuit once.
+
+        Args:
+            deadline (float): Monotonic time at which the caller gives up
+
+        Returns:
+            Optional[float]: None if requests may proceed, 0 if this caller
+                should probe now, otherwise the seconds to wait before
+                polling again
+
+        Raises:
+            CircuitOpenError: If the deadline has passed
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return None
+            now = time.monotonic()
+            if now > deadline:
+                raise CircuitOpenError(
+                    "FPL API unavailable for more than "
+                    f"{self.max_pause:.0f}s", retry_after=int(self.cooldown))
+            if not self._probing and now >= self._next_probe_at:
+                self._probing = True
+                return 0
+            return min(max(self._next_probe_at - now, 0.5),
+                       max(deadline - now, 0.0) + 0.01)
+
+    def _probe_done(self, available: bool) -> None:
+        with self._lock:
+            self._probing = False
+            if available:
+                logging.info("FPL API probe succeeded, resuming requests.")
+                self._failures = 0
+                self._opened_at = None
+            else:
+                self._next_probe_at = time.monotonic() + self.cooldown
+
+    def before_request(self) -> None:
+        """
+        Block while the circuit is open.
+
+        Raises:
+            CircuitOpenError: If the circuit stays open past max_pause
+        """
+        deadline = time.monotonic() + self.max_pause
+        while True:
+            wait = self._poll(deadline)
+            if wait is None:
+                return
+            if wait == 0:
+                available = False
+                try:
+                    available = self.probe()
+                finally:
+                    self._probe_done(available)
+            else:
+                time.sleep(wait)
+
+    async def before_request_async(self) -> None:
+        """
+        Wait without blocking the event loop while the circuit is open.
+
+        Raises:
+            CircuitOpenError: If the circuit stays open past max_pause
+        """
+        loop = asyncio.get_running_loop()
+        deadline = time.monotonic() + self.max_pause
+        while True:
+            wait = self._poll(deadline)
+            if wait is None:
+                return
+            if wait == 0:
+                available = False
+                try:
+                    available = await loop.run_in_executor(None, self.probe)
+                finally:
+                    self._probe_done(available)
+            else:
+                await asyncio.sleep(wait)
+
+    def raise_if_open(
+            self,
+            message: str = "FPL API became unavailable during the run"
+            ) -> None:
+        """
+        Raise if the circuit is open, e.g. before starting a run or loading
+        its output.
+
+        Args:
+            message (str): Message of the error
+
+        Raises:
+            CircuitOpenError: If the circuit is open
+        """
+        if self.is_open:
+            raise CircuitOpenError(message, retry_after=int(self.cooldown))
+
+
+def check_gameweek_settled(events: List[Dict[str, Any]]) -> None:
+    """
+    Raise if a finished gameweek is still waiting for its data check.
+
+    Between the last match of a gameweek and FPL setting `data_checked`,
+    points and bonus are still being corrected, so ingesting then stores
+    half-updated data.
+
+    Args:
+        events (List[Dict[str, Any]]): The bootstrap-static events table
+
+    Raises:
+        GameUpdatingError: If the current gameweek is finished but its data
+            has not been checked
+    """
+    for event in events:
+        if event.get("is_current") and event.get("finished") \
+                and not event.get("data_checked"):
+            raise GameUpdatingError(
+                f"Gameweek {event['id']} has finished but its data has not "
+                "been checked yet")
+
+
+# Every run is driven by an HTTP request, so callers give up well within
+# the request timeout and the client retries after the 503's Retry-After
+fpl_circuit_breaker = CircuitBreaker(
+    failure_threshold=int(os.getenv("FPL_BREAKER_THRESHOLD", "5")),
+    cooldown=float(os.getenv("FPL_BREAKER_COOLDOWN", "30")),
+    max_pause=float(os.getenv("FPL_BREAKER_MAX_PAUSE", "120"))
+)
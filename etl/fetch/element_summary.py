@@ -1,8 +1,23 @@
+import time
+import random
 import logging
-import aiohttp
 import asyncio
-from typing import List, Dict, Any
-from aiohttp import ClientSession
+from collections import Counter
+from typing import List, Dict, Any, Optional, Tuple, TYPE_CHECKING
+
+from etl.archive import SnapshotArchive
+from etl.fetch.circuit_breaker import (
+    CircuitBreaker,
+    CircuitOpenError,
+    fpl_circuit_breaker
+)
+from etl.utils.concurrency import (
+    AdaptiveConcurrencyLimiter,
+    fpl_request_limiter
+)
+
+if TYPE_CHECKING:
+    from aiohttp import ClientSession
 
 
 class ElementSummaryFetcher:
@@ -13,22 +28,53 @@ class ElementSummaryFetcher:
     Attributes:
         BASE_URL (str): The base URL template for element-summary endpoints
         player_ids (List[int]): List of player IDs to fetch data for
+        archive (Optional[SnapshotArchive]): Archive that raw payloads are
+            written to as they are fetched
+        gameweek (Optional[int]): Gameweek the raw payloads are archived
+            under
+        circuit_breaker (CircuitBreaker): Breaker that pauses requests while
+            the game is updating
+        limiter (AdaptiveConcurrencyLimiter): Limits the requests in flight
     """
 
     BASE_URL = "https://fantasy.premierleague.com/api/element-summary/{}/"
+    # Requests per player, so a 503 that trips the breaker is retried once
+    # the API is back
+    MAX_ATTEMPTS = 3
+    # Cap in seconds of the random wait before the first retry of a 503,
+    # doubling for every further retry, so that players that failed
+    # together do not retry together
+    RETRY_BACKOFF = 1.0
 
-    def __init__(self, player_ids: List[int]) -> None:
+    def __init__(self,
+                 player_ids: List[int],
+                 archive: Optional[SnapshotArchive] = None,
+                 gameweek: Optional[int] = None,
+                 circuit_breaker: Optional[CircuitBreaker] = None,
+                 limiter: Optional[AdaptiveConcurrencyLimiter] = None
+                 ) -> None:
         """
         Initialize the ElementSummaryFetcher.
 
         Args:
             player_ids (List[int]): List of player IDs to fetch data for
+            archive (Optional[SnapshotArchive]): If provided, every raw
+                payload is stored in the archive before it is processed
+            gameweek (Optional[int]): Gameweek to archive payloads under
+            circuit_breaker (Optional[CircuitBreaker]): Defaults to the
+                breaker shared by all FPL fetchers
+            limiter (Optional[AdaptiveConcurrencyLimiter]): Defaults to the
+                limiter shared by all element-summary fetchers
         """
         self.player_ids = player_ids
-        logging.info(f"Initialized fetcher with {len(player_ids)} player IDs")
+        self.archive = archive
+        self.gameweek = gameweek
+        self.circuit_breaker = circuit_breaker or fpl_circuit_breaker
+        self.limiter = limiter or fpl_request_limiter
+        logging.info("Initialized fetcher with %d player IDs", len(player_ids))
 
     async def fetch_player(self,
-                           session: ClientSession,
+                           session: 'ClientSession',
                            player_id: int
                            ) -> Dict[str, Any]:
         """
@@ -46,41 +92,56 @@ class ElementSummaryFetcher:
                 - history_past: List of past history data with element key
                     injected
                 - error (optional): Error message if the request failed
+
+        Raises:
+            CircuitOpenError: If the API stayed unavailable while waiting
         """
         url = self.BASE_URL.format(player_id)
         try:
-            async with session.get(url) as response:
-                if response.status == 200:
-                    logging.debug(f"Fetched data for player {player_id}")
-                    raw_data = await response.json()
-
-                    # Inject element key into each subtable record
-                    fixtures = [{'element': player_id, 'data': f}
-                                for f in raw_data.get("fixtures", [])]
-                    history = [{'element': player_id, 'data': f}
-                               for f in raw_data.get("history", [])]
-                    history_past = [{'element': player_id, 'data': hp}
-                                    for hp in raw_data.get("history_past", [])]
-
-                    return {
-                        "player_id": player_id,
-                        "fixtures": fixtures,
-                        "history": history,
-                        "history_past": history_past
-                    }
-                else:
-                    logging.error(
-                        f"HTTP {response.status} for player {player_id}")
-                    return {
-                        "player_id": player_id,
-                        "fixtures": [],
-                        "history": [],
-                        "history_past": [],
-                        "error": f"HTTP {response.status}"
-                    }
+            for attempt in range(self.MAX_ATTEMPTS):
+                # Waits while the game is updating instead of sending
+                # requests that are bound to fail
+                await self.circuit_breaker.before_request_async()
+                status, raw_data = await self.get_json(session, url)
+                if status == 200:
+                    self.circuit_breaker.record_success()
+                    logging.debug("Fetched data for player %s", player_id)
+                    if self.archive is not None:
+                        # Compressing and writing the payload blocks
+                        await asyncio.get_running_loop().run_in_executor(
+                            None,
+                            self.archive.put,
+                            "element_summary",
+                            raw_data,
+                            self.gameweek,
+                            player_id
+                        )
+                    return self.parse_player(player_id, raw_data)
+                if status == 503:
+                    self.circuit_breaker.record_failure()
+                    # An open breaker paces the retries itself
+                    if attempt + 1 < self.MAX_ATTEMPTS \
+                            and not self.circuit_breaker.is_open:
+                        await asyncio.sleep(random.uniform(
+                            0, self.RETRY_BACKOFF * 2 ** attempt))
+                    continue
+                break
 
+            # Failures are summarised once per run in flatten_results
+            logging.debug("HTTP %s for player %s", status, player_id)
+            return {
+                "player_id": player_id,
+                "fixtures": [],
+                "history": [],
+                "history_past": [],
+                "error": f"HTTP {status}"
+            }
+
+        except CircuitOpenError:
+            # Abort the run rather than upload a partial refresh
+            raise
         except Exception as e:
-            logging.error(f"Error fetching player {player_id}: {str(e)}")
+            logging.debug("Error fetching player %s: %s", player_id, e)
             return {
                 "player_id": player_id,
                 "fixtures": [],
@@ -89,18 +150,92 @@ class ElementSummaryFetcher:
                 "error": str(e)
             }
 
-    async def fetch_all_players(self) -> List[Dict[str, Any]]:
+    async def get_json(self,
+                       session: 'ClientSession',
+                       url: str
+                       ) -> Tuple[int, Optional[Dict[str, Any]]]:
+        """
+        Makes one request once the limiter has a slot for it, reporting its
+        latency and whether the API looked overloaded to the limiter.
+
+        Args:
+            session (ClientSession): aiohttp client session for making requests
+            url (str): URL to request
+
+        Returns:
+            Tuple[int, Optional[Dict[str, Any]]]: The status, and the JSON
+                body if the status is 200
+        """
+        await self.limiter.acquire_async()
+        start = time.perf_counter()
+        status = 0
+        try:
+            async with session.get(url) as response:
+                status = response.status
+                raw_data = await response.json() if status == 200 else None
+            return status, raw_data
+        finally:
+            self.limiter.release(
+                time.perf_counter() - start,
+                ok=status != 429 and not 500 <= status < 600 and status != 0)
+
+    @staticmethod
+    def parse_player(player_id: int,
+                     raw_data: Dict[str, Any]
+                     ) -> Dict[str, Any]:
+        """
+        Converts a raw element-summary payload into a player result.
+
+        Args:
+            player_id (int): ID of the player the payload belongs to
+            raw_data (Dict[str, Any]): The JSON response from the API
+
+        Returns:
+            Dict[str, Any]: Dictionary containing the player_id and the
+                fixtures, history and history_past subtables with the element
+                key injected into each record
+        """
+        fixtures = [{'element': player_id, 'data': f}
+                    for f in raw_data.get("fixtures", [])]
+        history = [{'element': player_id, 'data': f}
+                   for f in raw_data.get("history", [])]
+        history_past = [{'element': player_id, 'data': hp}
+                        for hp in raw_data.get("history_past", [])]
+
+        return {
+            "player_id": player_id,
+            "fixtures": fixtures,
+            "history": history,
+            "history_past": history_past
+        }
+
+    async def fetch_all_players(
+            self,
+            session: Optional['ClientSession'] = None
+            ) -> List[Dict[str, Any]]:
         """
         Fetches all players in parallel using asyncio.
 
+        Args:
+            session (Optional[ClientSession]): Session to make the requests
+                with. If not provided, a session is opened for this call and
+                closed afterwards.
+
         Returns:
             List[Dict[str, Any]]: List of dictionaries containing player data
         """
+        if session is None:
+            # aiohttp is imported on first use to keep application start up
+            # fast
+            import aiohttp
+
+            async with aiohttp.ClientSession() as own_session:
+                return await self.fetch_all_players(own_session)
+
         logging.info("Starting parallel fetch for players")
-        async with aiohttp.ClientSession() as session:
-            tasks = [self.fetch_player(session, player_id)
-                     for player_id in self.player_ids]
-            results = await asyncio.gather(*tasks)
+        tasks = [self.fetch_player(session, player_id)
+                 for player_id in self.player_ids]
+        results = await asyncio.gather(*tasks)
 
         logging.info("Completed all fetches")
         return results
@@ -113,6 +248,9 @@ class ElementSummaryFetcher:
         Flattens the results into a single dictionary with separate lists for
         each data type.
 
+        Failed players are logged as a single summary for the run rather than
+        one message each.
+
         Args:
             results (List[Dict[str, Any]]): List of player data dictionaries
 
@@ -130,9 +268,9 @@ class ElementSummaryFetcher:
 
         for result in results:
             if 'error' in result:
-                logging.warning(
-                    f"Adding error for player {result['player_id']}"
-                    f" to errors table due to error: {result['error']}")
+                logging.debug(
+                    "Adding error for player %s to errors table due to"
+                    " error: %s", result['player_id'], result['error'])
                 errors.append({
                     "player_id": result.get("player_id"),
                     "error": result.get("error")
@@ -143,6 +281,16 @@ class ElementSummaryFetcher:
             all_history.extend(result.get("history", []))
             all_history_past.extend(result.get("history_past", []))
 
+        if errors:
+            logging.warning(
+                "Adding %d of %d players to errors table (%s), e.g. players"
+                " %s",
+                len(errors),
+                len(results),
+                dict(Counter(error["error"] for error in errors)),
+                [error["player_id"] for error in errors[:10]]
+            )
+
         return {
             "fixtures": all_fixtures,
             "history": all_history,
@@ -160,6 +308,23 @@ class ElementSummaryFetcher:
         raw_results = asyncio.run(self.fetch_all_players())
         return self.flatten_results(raw_results)
 
+    async def run_async(
+            self,
+            session: Optional['ClientSession'] = None
+            ) -> Dict[str, List[Any]]:
+        """
+        Fetches on the running event loop and returns flattened results.
+
+        Args:
+            session (Optional[ClientSession]): Long-lived session to share
+                with other fetches on the same loop
+
+        Returns:
+            Dict[str, List[Any]]: Dictionary containing all fetched data
+        """
+        raw_results = await self.fetch_all_players(session)
+        return self.flatten_results(raw_results)
+
 
 # Example usage
 if __name__ == "__main__":
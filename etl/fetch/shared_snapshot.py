@@ -0,0 +1,296 @@
+import os
+import json
+import mmap
+import fcntl
+import struct
+import logging
+import threading
+import time
+from array import array
+from collections.abc import Mapping
+from functools import lru_cache
+from typing import List, Dict, Optional, Any, Callable, Iterator, Tuple
+
+
+class SnapshotTables(Mapping):
+    """
+    Read-only mapping of table name to table rows backed by a snapshot file.
+
+    Each access decodes the table from the shared mapping and keeps no copy,
+    so workers hold no per-process copy of the tables. Lookups of players by
+    team or of the team of a player should use the index on
+    SharedBootstrapSnapshot instead, which decodes no table at all.
+    """
+
+    def __init__(self, snapshot: 'SharedBootstrapSnapshot') -> None:
+        self._snapshot = snapshot
+        self._names = snapshot.table_names()
+
+    def __getitem__(self, name: str) -> List[Any]:
+        if name not in self._names:
+            raise KeyError(name)
+        return self._snapshot.table(name)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._names)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+
+class SharedBootstrapSnapshot:
+    """
+    Parsed bootstrap-static tables stored once in a memory-mapped file that
+    every worker process maps read-only.
+
+    The file holds a header, a directory of table offsets, an element to team
+    index and one JSON segment per table. New versions are written to a
+    temporary file and swapped in with an atomic rename, while an exclusive
+    file lock ensures only one process fetches at a time. Readers notice the
+    swap on their next access and remap.
+
+    Attributes:
+        path (str): Location of the snapshot file, ideally on a tmpfs such as
+            /dev/shm
+    """
+
+    MAGIC = b"FPLBS001"
+    # magic, version, directory length, number of index entries
+    HEADER = struct.Struct("<8sQII")
+
+    def __init__(self, path: str) -> None:
+        """
+        Initialize the SharedBootstrapSnapshot.
+
+        Args:
+            path (str): Location of the snapshot file
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._mapping: Optional[mmap.mmap] = None
+        self._identity: Optional[Tuple[int, int]] = None
+        self._version = 0
+        self._directory: Dict[str, List[int]] = {}
+        self._index_offset = 0
+        self._index_len = 0
+        # Element to team index of the mapped version
+        self._index: Optional[array] = None
+
+    @classmethod
+    def encode(cls, tables: Dict[str, List[Any]], version: int) -> bytes:
+        """
+        Serialise tables into the snapshot file format.
+
+        Args:
+            tables (Dict[str, List[Any]]): The extracted bootstrap-static
+                tables
+            version (int): Version number stored in the header
+
+        Returns:
+            bytes: The snapshot file contents
+        """
+        elements = tables.get("elements", [])
+        max_id = max((e["id"] for e in elements), default=0)
+        index = array("H", bytes(2 * (max_id + 1)))
+        for element in elements:
+            index[element["id"]] = element["team"]
+
+        segments = []
+        directory = {}
+        offset = 0
+        for name, rows in tables.items():
+            segment = json.dumps(rows, separators=(",", ":")).encode("utf-8")
+            directory[name] = [offset, len(segment)]
+            segments.append(segment)
+            offset += len(segment)
+
+        directory_bytes = json.dumps(directory).encode("utf-8")
+        header = cls.HEADER.pack(
+            cls.MAGIC, version, len(directory_bytes), len(index))
+        return b"".join([header, directory_bytes, index.tobytes()]
+                        + segments)
+
+    def publish(self, tables: Dict[str, List[Any]]) -> int:
+        """
+        Atomically replace the snapshot file with new tables.
+
+        Args:
+            tables (Dict[str, List[Any]]): The extracted bootstrap-static
+                tables
+
+        Returns:
+            int: The version of the published snapshot
+        """
+        version = time.time_ns()
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(self.encode(tables, version))
+        os.replace(tmp_path, self.path)
+        logging.info(f"Published bootstrap-static snapshot {version} to "
+                     f"{self.path}")
+        return version
+
+    def _remap(self) -> bool:
+        """Map the current snapshot file if it has been swapped."""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+
+        identity = (stat.st_ino, stat.st_mtime_ns)
+        if identity == self._identity:
+            return True
+
+        with open(self.path, "rb") as f:
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, directory_len, index_len = \
+            self.HEADER.unpack_from(mapping, 0)
+        if magic != self.MAGIC:
+            mapping.close()
+            raise ValueError(f"{self.path} is not a bootstrap-static "
+                             "snapshot")
+
+        start = self.HEADER.size
+        directory = json.loads(mapping[start:start + directory_len])
+        index_offset = start + directory_len
+        segments_offset = index_offset + 2 * index_len
+        for entry in directory.values():
+            entry[0] += segments_offset
+
+        if self._mapping is not None:
+            self._mapping.close()
+        self._mapping = mapping
+        self._identity = identity
+        self._version = version
+        self._directory = directory
+        self._index_offset = index_offset
+        self._index_len = index_len
+        self._index = None
+        return True
+
+    @property
+    def version(self) -> int:
+        """The version of the mapped snapshot, or 0 if there is none."""
+        with self._lock:
+            return self._version if self._remap() else 0
+
+    def table_names(self) -> List[str]:
+        """Return the names of the tables in the snapshot."""
+        with self._lock:
+            self._remap()
+            return list(self._directory)
+
+    def table(self, name: str) -> List[Any]:
+        """
+        Decode a single table from the snapshot without keeping it.
+
+        Args:
+            name (str): The table name
+
+        Returns:
+            List[Any]: The table rows, or an empty list if it is missing
+        """
+        with self._lock:
+            if not self._remap() or name not in self._directory:
+                return []
+            offset, length = self._directory[name]
+            segment = self._mapping[offset:offset + length]
+        return json.loads(segment)
+
+    def _element_index(self) -> array:
+        """Return the element to team index of the mapped version."""
+        with self._lock:
+            if not self._remap():
+                return array("H")
+            if self._index is None:
+                self._index = array("H")
+                self._index.frombytes(self._mapping[
+                    self._index_offset:
+                    self._index_offset + 2 * self._index_len])
+            return self._index
+
+    def element_teams(self) -> Dict[int, int]:
+        """
+        Map each element id to its team id using the snapshot index.
+
+        Returns:
+            Dict[int, int]: The team id of each element
+        """
+        return {element_id: team
+                for element_id, team in enumerate(self._element_index())
+                if team}
+
+    def team_elements(self, team_id: int) -> List[int]:
+        """
+        Look up the element ids of a team using the snapshot index.
+
+        Args:
+            team_id (int): The team ID
+
+        Returns:
+            List[int]: Element ids belonging to the team
+        """
+        return [element_id
+                for element_id, team in enumerate(self._element_index())
+                if team == team_id]
+
+    def refresh(self, fetch: Callable[[], Dict[str, List[Any]]]) -> None:
+        """
+        Fetch and publish new tables, unless another process already did.
+
+        Args:
+            fetch (Callable[[], Dict[str, List[Any]]]): Function returning
+                freshly fetched tables
+        """
+        seen_version = self.version
+        lock_path = f"{self.path}.lock"
+        with open(lock_path, "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                # Another worker swapped in a new version while we waited
+                if self.version != seen_version:
+                    return
+                self.publish(fetch())
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def load(self,
+             fetch: Callable[[], Dict[str, List[Any]]],
+             force_refresh: bool = False
+             ) -> SnapshotTables:
+        """
+        Return the shared tables, fetching them first if required.
+
+        Args:
+            fetch (Callable[[], Dict[str, List[Any]]]): Function returning
+                freshly fetched tables
+            force_refresh (bool): If True, publishes a new version first
+
+        Returns:
+            SnapshotTables: Read-only view of the shared tables
+        """
+        if force_refresh or not self.version:
+            self.refresh(fetch)
+        return SnapshotTables(self)
+
+
+@lru_cache(maxsize=None)
+def _get_shared_snapshot_internal(path: str) -> SharedBootstrapSnapshot:
+    return SharedBootstrapSnapshot(path)
+
+
+def get_shared_snapshot() -> Optional[SharedBootstrapSnapshot]:
+    """
+    Return the snapshot configured by BOOTSTRAP_SNAPSHOT_PATH.
+
+    Returns:
+        Optional[SharedBootstrapSnapshot]: The snapshot for this process, or
+            None if sharing is not enabled
+    """
+    path = os.getenv("BOOTSTRAP_SNAPSHOT_PATH")
+    if not path:
+        return None
+    return _get_shared_snapshot_internal(path)
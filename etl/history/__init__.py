@@ -0,0 +1,3 @@
+from .store import PlayerHistoryStore, HISTORY_COLUMNS  # noqa: F401
+from .store import TOTAL_COLUMNS  # noqa: F401
+from .store import get_history_store, update_history_store  # noqa: F401
@@ -0,0 +1,356 @@
+import os
+import sqlite3
+import logging
+import threading
+import time
+from typing import List, Dict, Optional, Any, Tuple
+
+# Typed columns of a history row as (name, SQLite type, key in the payload)
+HISTORY_FIELDS: List[Tuple[str, str, str]] = [
+    ("fixture", "INTEGER", "fixture"),
+    ("round", "INTEGER", "round"),
+    ("kickoff_time", "TEXT", "kickoff_time"),
+    ("was_home", "INTEGER", "was_home"),
+    ("opponent_team", "INTEGER", "opponent_team"),
+    ("minutes", "INTEGER", "minutes"),
+    ("total_points", "INTEGER", "total_points"),
+    ("goals_scored", "INTEGER", "goals_scored"),
+    ("assists", "INTEGER", "assists"),
+    ("clean_sheets", "INTEGER", "clean_sheets"),
+    ("goals_conceded", "INTEGER", "goals_conceded"),
+    ("bonus", "INTEGER", "bonus"),
+    ("bps", "INTEGER", "bps"),
+    ("expected_goals", "REAL", "expected_goals"),
+    ("expected_assists", "REAL", "expected_assists"),
+    ("value", "INTEGER", "value"),
+    ("selected", "INTEGER", "selected"),
+]
+HISTORY_COLUMNS = ["element"] + [name for name, _, _ in HISTORY_FIELDS]
+# Columns summed per player by totals()
+TOTAL_COLUMNS = [
+    "matches",
+    "minutes",
+    "total_points",
+    "goals_scored",
+    "assists",
+    "clean_sheets",
+    "goals_conceded",
+    "bonus",
+    "bps",
+    "expected_goals",
+    "expected_assists",
+]
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS history (
+    element INTEGER NOT NULL,
+    {", ".join(f"{name} {type_}" for name, type_, _ in HISTORY_FIELDS)},
+    PRIMARY KEY (element, fixture)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS history_kickoff_time ON history (kickoff_time);
+CREATE INDEX IF NOT EXISTS history_round ON history (round);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+class PlayerHistoryStore:
+    """
+    Embedded SQLite store of the element-summary history rows of every
+    player, for player-history and filter/sort queries without BigQuery.
+
+    Rows are keyed by player and fixture, so a player's matches are stored
+    together, and kickoff_time and round are indexed for date and gameweek
+    filters. An update replaces the rows of the players in it only.
+
+    The database is one file that several processes can share: readers do
+    not block the writer in WAL mode, and the version is stored in the
+    database so that every process sees when it changes. Safe to share
+    between threads.
+
+    Attributes:
+        path (str): Database file, or ":memory:"
+    """
+
+    def __init__(self, path: str = ":memory:") -> None:
+        """
+        Initialize the PlayerHistoryStore, creating the schema if needed.
+
+        Args:
+            path (str): Database file, or ":memory:"
+        """
+        self.path = path
+        self._lock = threading.RLock()
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(
+            path, timeout=30, check_same_thread=False,
+            isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    @property
+    def version(self) -> int:
+        """Changes whenever the rows change."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM meta WHERE key = 'version'").fetchone()
+        return row[0] if row else 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM history").fetchone()[0]
+
+    @staticmethod
+    def _row_values(element: int, row: Dict[str, Any]) -> List[Any]:
+        values: List[Any] = [element]
+        for _, type_, key in HISTORY_FIELDS:
+            value = row.get(key)
+            if value is not None and type_ == "INTEGER":
+                value = int(value)
+            elif value is not None and type_ == "REAL":
+                value = float(value)
+            values.append(value)
+        return values
+
+    def apply_results(self, data: Dict[str, List[Any]]) -> int:
+        """
+        Replace the rows of the players in a fetcher's flattened results.
+
+        Args:
+            data (Dict[str, List[Any]]): Output of
+                ElementSummaryFetcher.flatten_results, whose history rows
+                are {"element": id, "data": row}
+
+        Returns:
+            int: Number of players updated
+        """
+        rows = [self._row_values(row["element"], row["data"])
+                for row in data.get("history", [])]
+        elements = sorted({values[0] for values in rows})
+        if not elements:
+            return 0
+        placeholders = ", ".join("?" * len(HISTORY_COLUMNS))
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "DELETE FROM history WHERE element = ?",
+                    [(element,) for element in elements])
+                self._conn.executemany(
+                    f"INSERT OR REPLACE INTO history "
+                    f"({', '.join(HISTORY_COLUMNS)}) VALUES ({placeholders})",
+                    rows)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) "
+                    "VALUES ('version', ?)", (time.time_ns(),))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return len(elements)
+
+    @staticmethod
+    def _filters(round_from: Optional[int],
+                 round_to: Optional[int],
+                 since: Optional[str],
+                 until: Optional[str]
+                 ) -> Tuple[List[str], List[Any]]:
+        clauses, params = [], []
+        for clause, param in (("round >= ?", round_from),
+                              ("round <= ?", round_to),
+                              ("kickoff_time >= ?", since),
+                              ("kickoff_time < ?", until)):
+            if param is not None:
+                clauses.append(clause)
+                params.append(param)
+        return clauses, params
+
+    def history(self,
+                element: int,
+                columns: Optional[List[str]] = None,
+                round_from: Optional[int] = None,
+                round_to: Optional[int] = None,
+                page: int = 1,
+                page_size: int = 38
+                ) -> Dict[str, Any]:
+        """
+        Return a player's matches, most recent first.
+
+        Args:
+            element (int): The player's ID
+            columns (Optional[List[str]]): Columns to return, defaults to
+                HISTORY_COLUMNS
+            round_from (Optional[int]): First gameweek to include
+            round_to (Optional[int]): Last gameweek to include
+            page (int): Page to return, starting at 1
+            page_size (int): Matches per page
+
+        Returns:
+            Dict[str, Any]: The page of rows, the page and page size, and
+                the total number of matching rows
+
+        Raises:
+            ValueError: If a column is unknown
+        """
+        columns = columns or HISTORY_COLUMNS
+        unknown = set(columns) - set(HISTORY_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown columns: {sorted(unknown)}")
+        clauses, params = self._filters(round_from, round_to, None, None)
+        where = " AND ".join(["element = ?"] + clauses)
+        params = [element] + params
+        with self._lock:
+            total = self._conn.execute(
+                f"SELECT COUNT(*) FROM history WHERE {where}",
+                params).fetchone()[0]
+            rows = self._conn.execute(
+                f"SELECT {', '.join(columns)} FROM history WHERE {where} "
+                f"ORDER BY kickoff_time DESC LIMIT ? OFFSET ?",
+                params + [page_size, (page - 1) * page_size]).fetchall()
+        return {
+            "element": element,
+            "rows": [dict(row) for row in rows],
+            "page": page,
+            "page_size": page_size,
+            "total": total,
+        }
+
+    def totals(self,
+               columns: Optional[List[str]] = None,
+               order_by: str = "total_points",
+               ascending: bool = False,
+               element_ids: Optional[List[int]] = None,
+               round_from: Optional[int] = None,
+               round_to: Optional[int] = None,
+               since: Optional[str] = None,
+               until: Optional[str] = None,
+               min_minutes: int = 0,
+               page: int = 1,
+               page_size: int = 20
+               ) -> Dict[str, Any]:
+        """
+        Sum each player's matches in a gameweek or date range and rank the
+        players by one of the sums.
+
+        Args:
+            columns (Optional[List[str]]): Sums to return, defaults to
+                TOTAL_COLUMNS
+            order_by (str): Sum to rank by
+            ascending (bool): Rank the lowest sums first
+            element_ids (Optional[List[int]]): Players to include, defaults
+                to all
+            round_from (Optional[int]): First gameweek to include
+            round_to (Optional[int]): Last gameweek to include
+            since (Optional[str]): Include matches kicking off at or after
+                this ISO date or time
+            until (Optional[str]): Include matches kicking off before this
+                ISO date or time
+            min_minutes (int): Leave out players with fewer minutes in the
+                range
+            page (int): Page to return, starting at 1
+            page_size (int): Players per page
+
+        Returns:
+            Dict[str, Any]: The page of players, the page and page size, and
+                the total number of matching players
+
+        Raises:
+            ValueError: If a column is unknown
+        """
+        columns = columns or TOTAL_COLUMNS
+        unknown = (set(columns) | {order_by}) - set(TOTAL_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown columns: {sorted(unknown)}")
+        clauses, params = self._filters(round_from, round_to, since, until)
+        if element_ids:
+            clauses.append(
+                f"element IN ({', '.join('?' * len(element_ids))})")
+            params.extend(element_ids)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        # Only aggregate the requested and ranked columns
+        needed = [c for c in TOTAL_COLUMNS if c in columns or c == order_by]
+        sums = ", ".join(
+            "COUNT(*) AS matches" if column == "matches"
+            else f"SUM({column}) AS {column}"
+            for column in needed)
+        params.append(min_minutes)
+        direction = "ASC" if ascending else "DESC"
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT element, {sums}, COUNT(*) OVER () AS _total "
+                f"FROM history {where} GROUP BY element "
+                f"HAVING SUM(minutes) >= ? "
+                f"ORDER BY {order_by} {direction}, element "
+                f"LIMIT ? OFFSET ?",
+                params + [page_size, (page - 1) * page_size]).fetchall()
+            total = rows[0]["_total"] if rows else self._conn.execute(
+                f"SELECT COUNT(*) FROM (SELECT element FROM history {where} "
+                f"GROUP BY element HAVING SUM(minutes) >= ?)",
+                params).fetchone()[0]
+        return {
+            "players": [{key: row[key] for key in ["element"] + columns}
+                        for row in rows],
+            "page": page,
+            "page_size": page_size,
+            "total": total,
+        }
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
+
+
+_history_store: Optional[PlayerHistoryStore] = None
+_history_store_lock = threading.Lock()
+
+
+def get_history_store() -> PlayerHistoryStore:
+    """
+    Return this process's player history store.
+
+    The store is kept in HISTORY_STORE_PATH when set, so that every worker
+    serves the rows written by the latest pipeline run, and in memory
+    otherwise.
+
+    Returns:
+        PlayerHistoryStore: The store
+    """
+    global _history_store
+
+    with _history_store_lock:
+        if _history_store is None:
+            _history_store = PlayerHistoryStore(
+                os.getenv("HISTORY_STORE_PATH", ":memory:"))
+        return _history_store
+
+
+def update_history_store(data: Dict[str, List[Any]]) -> None:
+    """
+    Apply a fetcher's results to the history store, logging rather than
+    raising on failure, since the store only serves reads.
+
+    Args:
+        data (Dict[str, List[Any]]): Output of
+            ElementSummaryFetcher.flatten_results
+    """
+    try:
+        get_history_store().apply_results(data)
+    except sqlite3.Error as e:
+        logging.warning("Could not update player history store: %s", e)
+
+
+def _reset_history_store() -> None:
+    global _history_store
+    _history_store = None
+
+
+# SQLite connections must not be shared with forked workers
+os.register_at_fork(after_in_child=_reset_history_store)
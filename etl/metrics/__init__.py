@@ -0,0 +1,2 @@
+from .store import PlayerMetricsStore, METRICS  # noqa: F401
+from .store import get_metrics_store, save_metrics_store  # noqa: F401
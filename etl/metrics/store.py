@@ -0,0 +1,528 @@
+import os
+import json
+import fcntl
+import heapq
+import hashlib
+import struct
+import logging
+import threading
+import time
+from array import array
+from collections import defaultdict
+from typing import List, Dict, Optional, Any, Iterable
+
+# Season totals summed over every history row of a player
+SEASON_FIELDS = [
+    "total_points",
+    "minutes",
+    "goals_scored",
+    "assists",
+    "bonus",
+    "expected_goals",
+    "expected_assists",
+]
+# Per-match values kept for the rolling window
+ROLLING_FIELDS = [
+    "total_points",
+    "minutes",
+    "expected_goals",
+    "expected_assists",
+]
+DERIVED_METRICS = [
+    "points_per_90",
+    "form",
+    "rolling_minutes",
+    "rolling_xg",
+    "rolling_xa",
+    "fixture_difficulty",
+]
+METRICS = SEASON_FIELDS + DERIVED_METRICS
+
+
+class PlayerMetricsStore:
+    """
+    In-memory per-player aggregates maintained incrementally from
+    element-summary history rows.
+
+    Each metric is a column in a typed array indexed by a per-player slot.
+    A player's season totals are running sums, and the last `window`
+    matches are kept in a small ring per player for the rolling metrics.
+    An update only applies the history rows that arrived since the player's
+    previous update, plus the previous last row again, since the match in
+    progress keeps changing until the gameweek is finished. A hash of the
+    earlier rows is kept per player, and a correction to any of them, e.g.
+    bonus points awarded late, recomputes the player from scratch.
+
+    Safe to share between threads.
+
+    Attributes:
+        window (int): Number of matches the rolling metrics cover
+        version (int): Changes whenever the aggregates change
+    """
+
+    MAGIC = b"FPLMS001"
+    # magic, window, version, header length
+    HEADER = struct.Struct("<8sIQI")
+
+    def __init__(self, window: int = 5) -> None:
+        """
+        Initialize the PlayerMetricsStore.
+
+        Args:
+            window (int): Number of matches the rolling metrics cover
+        """
+        self.window = window
+        # One spare ring entry so the last match can be re-applied without
+        # losing the match that fell out of the window
+        self._depth = window + 1
+        self.version = 0
+        self._lock = threading.RLock()
+        self._slots: Dict[int, int] = {}
+        self._elements = array("l")
+        self._rows_seen = array("l")
+        # Hash of the player's history rows before the last one
+        self._rows_hash = array("q")
+        self._ring_count = array("l")
+        self._difficulty = array("d")
+        self._season = {field: array("d") for field in SEASON_FIELDS}
+        self._last = {field: array("d") for field in SEASON_FIELDS}
+        self._ring = {field: array("d") for field in ROLLING_FIELDS}
+        # Players updated since the store was loaded or last saved
+        self._updated = set()
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __contains__(self, element: int) -> bool:
+        return element in self._slots
+
+    def _arrays(self) -> Dict[str, array]:
+        arrays = {
+            "elements": self._elements,
+            "rows_seen": self._rows_seen,
+            "rows_hash": self._rows_hash,
+            "ring_count": self._ring_count,
+            "difficulty": self._difficulty,
+        }
+        arrays.update({f"season.{k}": v for k, v in self._season.items()})
+        arrays.update({f"last.{k}": v for k, v in self._last.items()})
+        arrays.update({f"ring.{k}": v for k, v in self._ring.items()})
+        return arrays
+
+    def _slot(self, element: int) -> int:
+        slot = self._slots.get(element)
+        if slot is None:
+            slot = len(self._elements)
+            self._slots[element] = slot
+            self._elements.append(element)
+            self._rows_seen.append(0)
+            self._rows_hash.append(0)
+            self._ring_count.append(0)
+            self._difficulty.append(0.0)
+            for column in (*self._season.values(), *self._last.values()):
+                column.append(0.0)
+            for column in self._ring.values():
+                column.extend([0.0] * self._depth)
+        return slot
+
+    @staticmethod
+    def _row_values(row: Dict[str, Any]) -> Dict[str, float]:
+        # Expected stats are served as strings, e.g. "0.32"
+        return {field: float(row.get(field) or 0) for field in SEASON_FIELDS}
+
+    @staticmethod
+    def _rows_digest(rows_hash: Any) -> int:
+        return int.from_bytes(rows_hash.digest(), "little", signed=True)
+
+    def _push(self, slot: int, values: Dict[str, float]) -> None:
+        for field in SEASON_FIELDS:
+            self._season[field][slot] += values[field]
+            self._last[field][slot] = values[field]
+        position = slot * self._depth + self._ring_count[slot] % self._depth
+        for field in ROLLING_FIELDS:
+            self._ring[field][position] = values[field]
+        self._ring_count[slot] += 1
+
+    def _pop(self, slot: int) -> None:
+        for field in SEASON_FIELDS:
+            self._season[field][slot] -= self._last[field][slot]
+        self._ring_count[slot] -= 1
+
+    def _reset(self, slot: int) -> None:
+        for field in SEASON_FIELDS:
+            self._season[field][slot] = 0.0
+        self._ring_count[slot] = 0
+        self._rows_seen[slot] = 0
+
+    def apply_history(self,
+                      element: int,
+                      rows: List[Dict[str, Any]]
+                      ) -> None:
+        """
+        Update a player's aggregates from their full history so far.
+
+        Args:
+            element (int): The player's ID
+            rows (List[Dict[str, Any]]): The player's history rows in match
+                order, as served by the element-summary endpoint
+        """
+        values = [self._row_values(row) for row in rows]
+        with self._lock:
+            slot = self._slot(element)
+            seen = self._rows_seen[slot]
+            rows_hash = hashlib.blake2b(digest_size=8)
+            for row in values[:seen - 1]:
+                rows_hash.update(repr(list(row.values())).encode())
+            # Fewer rows than before means a new season, and changed earlier
+            # rows a correction
+            if len(rows) < seen or seen and \
+                    self._rows_digest(rows_hash) != self._rows_hash[slot]:
+                self._reset(slot)
+                rows_hash = hashlib.blake2b(digest_size=8)
+                seen = 0
+            start = 0
+            if seen:
+                self._pop(slot)
+                start = seen - 1
+            for position, row in enumerate(values[start:], start):
+                self._push(slot, row)
+                if position < len(values) - 1:
+                    rows_hash.update(repr(list(row.values())).encode())
+            self._rows_seen[slot] = len(rows)
+            self._rows_hash[slot] = self._rows_digest(rows_hash)
+            self._updated.add(element)
+
+    def apply_fixtures(self,
+                       element: int,
+                       fixtures: List[Dict[str, Any]],
+                       upcoming: int = 3
+                       ) -> None:
+        """
+        Update a player's difficulty of their next fixtures.
+
+        Args:
+            element (int): The player's ID
+            fixtures (List[Dict[str, Any]]): The player's upcoming fixtures
+                in kickoff order
+            upcoming (int): Number of fixtures averaged
+        """
+        difficulties = [f.get("difficulty") or 0 for f in fixtures[:upcoming]]
+        with self._lock:
+            slot = self._slot(element)
+            self._difficulty[slot] = \
+                sum(difficulties) / len(difficulties) if difficulties else 0.0
+            self._updated.add(element)
+
+    def apply_results(self, data: Dict[str, List[Any]]) -> int:
+        """
+        Update the aggregates from a fetcher's flattened results.
+
+        Args:
+            data (Dict[str, List[Any]]): Output of
+                ElementSummaryFetcher.flatten_results, whose history and
+                fixtures rows are {"element": id, "data": row}
+
+        Returns:
+            int: Number of players updated
+        """
+        history = defaultdict(list)
+        for row in data.get("history", []):
+            history[row["element"]].append(row["data"])
+        fixtures = defaultdict(list)
+        for row in data.get("fixtures", []):
+            fixtures[row["element"]].append(row["data"])
+
+        with self._lock:
+            for element, rows in history.items():
+                self.apply_history(element, rows)
+            for element, rows in fixtures.items():
+                self.apply_fixtures(element, rows)
+            updated = len(history.keys() | fixtures.keys())
+            if updated:
+                self.version = time.time_ns()
+        return updated
+
+    def _rolling(self, slot: int, field: str) -> float:
+        count = self._ring_count[slot]
+        base = slot * self._depth
+        column = self._ring[field]
+        return sum(column[base + (count - 1 - i) % self._depth]
+                   for i in range(min(self.window, count)))
+
+    def _metric(self, slot: int, metric: str) -> float:
+        if metric in self._season:
+            return self._season[metric][slot]
+        if metric == "points_per_90":
+            minutes = self._season["minutes"][slot]
+            return self._season["total_points"][slot] / minutes * 90 \
+                if minutes else 0.0
+        if metric == "form":
+            matches = min(self.window, self._ring_count[slot])
+            return self._rolling(slot, "total_points") / matches \
+                if matches else 0.0
+        if metric == "rolling_minutes":
+            return self._rolling(slot, "minutes")
+        if metric == "rolling_xg":
+            return self._rolling(slot, "expected_goals")
+        if metric == "rolling_xa":
+            return self._rolling(slot, "expected_assists")
+        if metric == "fixture_difficulty":
+            return self._difficulty[slot]
+        raise ValueError(f"Unknown metric: {metric}")
+
+    def get(self,
+            element: int,
+            metrics: Optional[Iterable[str]] = None
+            ) -> Optional[Dict[str, float]]:
+        """
+        Return a player's metrics.
+
+        Args:
+            element (int): The player's ID
+            metrics (Optional[Iterable[str]]): Metrics to return, defaults
+                to all of METRICS
+
+        Returns:
+            Optional[Dict[str, float]]: The metrics, or None if the player
+                has not been seen
+        """
+        with self._lock:
+            slot = self._slots.get(element)
+            if slot is None:
+                return None
+            return {metric: round(self._metric(slot, metric), 3)
+                    for metric in (metrics or METRICS)}
+
+    def get_many(self,
+                 elements: Iterable[int],
+                 metrics: Optional[Iterable[str]] = None
+                 ) -> Dict[str, Any]:
+        """
+        Return the metrics of several players.
+
+        Args:
+            elements (Iterable[int]): The players' IDs
+            metrics (Optional[Iterable[str]]): Metrics to return, defaults
+                to all of METRICS
+
+        Returns:
+            Dict[str, Any]: The metrics of each known player under
+                "elements", keyed by ID, and the unknown IDs under "missing"
+        """
+        found = {}
+        missing = []
+        with self._lock:
+            for element in elements:
+                values = self.get(element, metrics)
+                if values is None:
+                    missing.append(element)
+                else:
+                    found[str(element)] = values
+        return {"elements": found, "missing": missing}
+
+    def top(self,
+            metric: str,
+            n: int = 10,
+            min_minutes: int = 0,
+            ascending: bool = False
+            ) -> List[Dict[str, Any]]:
+        """
+        Return the players with the highest (or lowest) value of a metric.
+
+        Args:
+            metric (str): The metric to rank by
+            n (int): Number of players returned
+            min_minutes (int): Leave out players with fewer season minutes
+            ascending (bool): Rank the lowest values first, e.g. for
+                fixture_difficulty
+
+        Returns:
+            List[Dict[str, Any]]: The element and value of each player, best
+                first
+        """
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric: {metric}")
+        with self._lock:
+            minutes = self._season["minutes"]
+            candidates = (
+                (self._metric(slot, metric), self._elements[slot])
+                for slot in range(len(self._elements))
+                if minutes[slot] >= min_minutes
+            )
+            pick = heapq.nsmallest if ascending else heapq.nlargest
+            ranked = pick(n, candidates)
+        return [{"element": element, "value": round(value, 3)}
+                for value, element in ranked]
+
+    def update_from(self,
+                    other: 'PlayerMetricsStore',
+                    elements: Iterable[int]
+                    ) -> None:
+        """
+        Copy the aggregates of some players from another store with the
+        same window.
+
+        Args:
+            other (PlayerMetricsStore): The store copied from
+            elements (Iterable[int]): The players copied
+        """
+        with self._lock, other._lock:
+            arrays = self._arrays()
+            other_arrays = other._arrays()
+            for element in elements:
+                source = other._slots.get(element)
+                if source is None:
+                    continue
+                target = self._slot(element)
+                for name, column in arrays.items():
+                    width = self._depth if name.startswith("ring.") else 1
+                    column[target * width:(target + 1) * width] = \
+                        other_arrays[name][source * width:
+                                           (source + 1) * width]
+
+    def save(self, path: str) -> None:
+        """
+        Write the store to a file, replacing it atomically.
+
+        Args:
+            path (str): Location of the file
+        """
+        with self._lock:
+            arrays = self._arrays()
+            columns = [[name, column.typecode, len(column)]
+                       for name, column in arrays.items()]
+            header = json.dumps(columns).encode("utf-8")
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(self.HEADER.pack(
+                    self.MAGIC, self.window, self.version, len(header)))
+                f.write(header)
+                for column in arrays.values():
+                    column.tofile(f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'PlayerMetricsStore':
+        """
+        Read a store written by save.
+
+        Args:
+            path (str): Location of the file
+
+        Returns:
+            PlayerMetricsStore: The loaded store
+        """
+        with open(path, "rb") as f:
+            magic, window, version, header_len = \
+                cls.HEADER.unpack(f.read(cls.HEADER.size))
+            if magic != cls.MAGIC:
+                raise ValueError(f"{path} is not a player metrics store")
+            store = cls(window=window)
+            store.version = version
+            arrays = store._arrays()
+            for name, typecode, length in json.loads(f.read(header_len)):
+                column = arrays[name]
+                if column.typecode != typecode:
+                    raise ValueError(f"Unexpected type of column {name}")
+                column.fromfile(f, length)
+        # Files written before row hashes were kept recompute each player
+        # on their next update
+        store._rows_hash.extend(
+            [0] * (len(store._elements) - len(store._rows_hash)))
+        store._slots = {element: slot
+                        for slot, element in enumerate(store._elements)}
+        return store
+
+
+_metrics_store: Optional[PlayerMetricsStore] = None
+_metrics_store_mtime = 0.0
+_metrics_store_lock = threading.Lock()
+
+
+def get_metrics_store() -> PlayerMetricsStore:
+    """
+    Return this process's player metrics store.
+
+    When METRICS_SNAPSHOT_PATH is set, the store is loaded from that file
+    and reloaded whenever another process saves a newer one, so that every
+    worker serves the aggregates of the latest pipeline run.
+
+    Returns:
+        PlayerMetricsStore: The store
+    """
+    global _metrics_store, _metrics_store_mtime
+
+    path = os.getenv("METRICS_SNAPSHOT_PATH")
+    with _metrics_store_lock:
+        if path:
+            try:
+                mtime = os.stat(path).st_mtime
+            except FileNotFoundError:
+                mtime = 0.0
+            if mtime > _metrics_store_mtime:
+                try:
+                    _metrics_store = PlayerMetricsStore.load(path)
+                    _metrics_store_mtime = mtime
+                except (OSError, ValueError) as e:
+                    logging.warning("Could not load metrics store: %s", e)
+        if _metrics_store is None:
+            _metrics_store = PlayerMetricsStore(
+                window=int(os.getenv("METRICS_WINDOW", "5")))
+        return _metrics_store
+
+
+def save_metrics_store(store: Optional[PlayerMetricsStore] = None) -> None:
+    """
+    Save a store to METRICS_SNAPSHOT_PATH, if set, and serve it from this
+    process.
+
+    Pipeline runs pass the store they applied their results to, rather than
+    looking it up again, since the lookup reloads the file whenever another
+    process saved a newer one and would drop the run's updates. Saves are
+    serialized across processes with a file lock, and when another process
+    saved since this one loaded the file, the players it updated that this
+    store did not are merged in first, so neither run's updates are lost.
+
+    Args:
+        store (Optional[PlayerMetricsStore]): The store to save, defaults
+            to this process's store
+    """
+    global _metrics_store, _metrics_store_mtime
+
+    path = os.getenv("METRICS_SNAPSHOT_PATH")
+    if not path:
+        return
+    with _metrics_store_lock:
+        if store is None:
+            store = _metrics_store
+        if store is None:
+            return
+        with open(f"{path}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                _merge_saved_store(store, path)
+                store.save(path)
+                store._updated.clear()
+                _metrics_store = store
+                _metrics_store_mtime = os.stat(path).st_mtime
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _merge_saved_store(store: PlayerMetricsStore, path: str) -> None:
+    """Merge into a store the players another process saved to path since
+    this process loaded or saved it. Called with the file lock held."""
+    try:
+        if os.stat(path).st_mtime == _metrics_store_mtime:
+            return
+        saved = PlayerMetricsStore.load(path)
+    except FileNotFoundError:
+        return
+    except (OSError, ValueError) as e:
+        logging.warning("Could not merge the saved metrics store: %s", e)
+        return
+    if saved.window != store.window:
+        return
+    with store._lock:
+        store.update_from(saved, saved._slots.keys() - store._updated)
+        store.version = time.time_ns()
@@ -0,0 +1,266 @@
+import os
+import json
+import hashlib
+import logging
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Optional, Iterable
+
+from etl.fetch.bootstrap_static import fetch_bootstrap_static
+from etl.upload.sinks import NullSink, Sink, get_sink
+from etl.upload.storage import read_bytes, write_bytes
+
+BOOTSTRAP_HISTORY_TABLES = ["elements", "teams", "events", "element_types"]
+
+# Fields that move with every fetch (ownership, transfers, chips, expected
+# points) and would otherwise make almost every row look changed. They are
+# still stored, with their value at the time another field changed.
+VOLATILE_FIELDS: Dict[str, List[str]] = {
+    "elements": [
+        "selected_by_percent",
+        "transfers_in",
+        "transfers_in_event",
+        "transfers_out",
+        "transfers_out_event",
+        "ep_this",
+        "ep_next",
+        "form",
+        "value_form",
+        "value_season",
+    ],
+    "events": [
+        "most_selected",
+        "most_transferred_in",
+        "most_captained",
+        "most_vice_captained",
+        "transfers_made",
+        "chip_plays",
+        "ranked_count",
+    ],
+}
+
+
+def row_hash(row: Dict[str, Any], volatile_fields: Iterable[str] = ()) -> str:
+    """
+    Hash the tracked fields of a bootstrap-static row.
+
+    Args:
+        row (Dict[str, Any]): A row of a bootstrap-static table
+        volatile_fields (Iterable[str]): Fields left out of the hash
+
+    Returns:
+        str: A short hash that changes when a tracked field changes
+    """
+    volatile = set(volatile_fields)
+    tracked = {k: v for k, v in row.items() if k not in volatile}
+    canonical = json.dumps(tracked, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(canonical.encode("utf-8")).hexdigest()[:16]
+
+
+class Scd2Changes:
+    """
+    The rows of one bootstrap-static fetch that differ from the last stored
+    version.
+
+    Attributes:
+        valid_from (str): ISO timestamp the new versions are valid from
+        records (Dict[str, List[Dict[str, Any]]]): SCD type 2 records of
+            each table; a record with is_deleted set closes a row that is no
+            longer in the fetch
+        hashes (Dict[str, Dict[int, str]]): Hash of every current row of
+            each table, to persist once the records are stored
+    """
+
+    def __init__(self,
+                 valid_from: str,
+                 records: Dict[str, List[Dict[str, Any]]],
+                 hashes: Dict[str, Dict[int, str]]
+                 ) -> None:
+        self.valid_from = valid_from
+        self.records = records
+        self.hashes = hashes
+
+
+class Scd2Tracker:
+    """
+    Diffs bootstrap-static tables against the row hashes of the last stored
+    version, so that only new, changed and removed rows are written.
+
+    The hashes are stored as JSON on local disk or in GCS.
+
+    Attributes:
+        state_path (str): Local path or gs://bucket/blob URI of the state
+    """
+
+    def __init__(self, state_path: str) -> None:
+        """
+        Initialize the Scd2Tracker.
+
+        Args:
+            state_path (str): Local path or gs://bucket/blob URI of the state
+        """
+        self.state_path = state_path
+
+    def load_state(self) -> Dict[str, Dict[int, str]]:
+        """Load the row hashes of the last stored version of each table."""
+        raw = read_bytes(self.state_path)
+        if raw is None:
+            return {}
+        return {table: {int(k): v for k, v in hashes.items()}
+                for table, hashes in json.loads(raw).items()}
+
+    def save_state(self, state: Dict[str, Dict[int, str]]) -> None:
+        """Persist the row hashes."""
+        raw = json.dumps(state, separators=(",", ":")).encode("utf-8")
+        write_bytes(self.state_path, raw, content_type="application/json")
+
+    def diff(self,
+             tables: Dict[str, List[Dict[str, Any]]],
+             valid_from: Optional[datetime] = None
+             ) -> Scd2Changes:
+        """
+        Find the rows that changed since the last stored version.
+
+        Args:
+            tables (Dict[str, List[Dict[str, Any]]]): Bootstrap-static tables
+                keyed by name, whose rows have an id
+            valid_from (Optional[datetime]): When the fetch was taken,
+                defaults to now
+
+        Returns:
+            Scd2Changes: The records to store
+        """
+        valid_from = (valid_from or datetime.now(timezone.utc)).isoformat()
+        state = self.load_state()
+        records: Dict[str, List[Dict[str, Any]]] = {}
+        hashes: Dict[str, Dict[int, str]] = {}
+
+        for table, rows in tables.items():
+            previous = state.get(table, {})
+            volatile = VOLATILE_FIELDS.get(table, [])
+            current = {}
+            table_records = []
+            for row in rows:
+                digest = row_hash(row, volatile)
+                current[row["id"]] = digest
+                if previous.get(row["id"]) != digest:
+                    table_records.append({
+                        "id": row["id"],
+                        "valid_from": valid_from,
+                        "is_deleted": False,
+                        "row_hash": digest,
+                        "data": row,
+                    })
+            for removed_id in previous.keys() - current.keys():
+                table_records.append({
+                    "id": removed_id,
+                    "valid_from": valid_from,
+                    "is_deleted": True,
+                    "row_hash": None,
+                    "data": None,
+                })
+            records[table] = table_records
+            hashes[table] = current
+            logging.info("%s: %d of %d rows changed", table,
+                         len(table_records), len(rows))
+
+        return Scd2Changes(valid_from, records, hashes)
+
+    def commit(self,
+               changes: Scd2Changes,
+               tables: Optional[Iterable[str]] = None
+               ) -> None:
+        """
+        Record the stored version of the diffed tables.
+
+        Args:
+            changes (Scd2Changes): Changes that have been stored
+            tables (Optional[Iterable[str]]): Tables whose changes have been
+                stored, defaults to all diffed tables
+        """
+        tables = changes.hashes.keys() if tables is None else tables
+        state = self.load_state()
+        state.update({table: changes.hashes[table] for table in tables})
+        self.save_state(state)
+
+
+def ingest_bootstrap_static_history(
+        project_id: str,
+        bucket_name: str,
+        dataset_id: str,
+        destination_folder: str = 'bootstrap_static',
+        tables: Optional[List[str]] = None,
+        sink: Optional[Sink] = None
+        ) -> Dict[str, int]:
+    """
+    Fetch the bootstrap-static tables and append their changed rows to
+    SCD type 2 history tables.
+
+    Each table's new records are written to the sink in a folder per run.
+    The gcs sink appends them to `bootstrap_<table>_history` in BigQuery,
+    and the view `bootstrap_<table>_scd2` adds the valid_to of every
+    version. The row hashes are kept at SCD2_STATE_PATH (a local path or
+    gs:// URI, defaulting to `_scd2_state.json` in the destination folder of
+    the bucket, or of SINK_DIR without a bucket), and each table's hashes
+    are committed as soon as its records are stored, so a failure part-way
+    through does not append the earlier tables again. The null sink stores
+    nothing, so it leaves the hashes alone.
+
+    Args:
+        project_id (str): GCP project ID
+        bucket_name (str): GCS bucket name
+        dataset_id (str): BigQuery dataset ID
+        destination_folder (str): Destination folder
+        tables (Optional[List[str]]): Tables to ingest, defaults to
+            BOOTSTRAP_HISTORY_TABLES
+        sink (Optional[Sink]): Destination of the records, defaults to
+            the sink selected by SINK
+
+    Returns:
+        Dict[str, int]: Number of records stored for each table
+    """
+    tables = tables or BOOTSTRAP_HISTORY_TABLES
+    if sink is None:
+        sink = get_sink(project_id=project_id, bucket_name=bucket_name,
+                        dataset_id=dataset_id)
+    default_state_path = \
+        f"gs://{bucket_name}/{destination_folder}/_scd2_state.json" \
+        if bucket_name else os.path.join(
+            os.getenv("SINK_DIR", "output"), destination_folder,
+            "_scd2_state.json")
+    tracker = Scd2Tracker(os.getenv("SCD2_STATE_PATH", default_state_path))
+
+    with sink:
+        data = fetch_bootstrap_static(force_refresh=True)
+        changes = tracker.diff(
+            {table: data.get(table, []) for table in tables})
+
+        run_id = changes.valid_from[:19].replace("-", "").replace(":", "")
+        folder = f"{destination_folder}/{run_id}"
+        for table, records in changes.records.items():
+            table_id = f"bootstrap_{table}_history"
+            if records:
+                sink.write(folder=folder, table_id=table_id, part=table,
+                           rows=records)
+                sink.load_history(folder, [table_id])
+            if not isinstance(sink, NullSink):
+                tracker.commit(changes, tables=[table])
+
+    return {table: len(records)
+            for table, records in changes.records.items()}
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s [%(levelname)s] %(message)s",
+    )
+    load_dotenv()
+
+    counts = ingest_bootstrap_static_history(
+        project_id=os.getenv("PROJECT_ID"),
+        bucket_name=os.getenv("BUCKET_ID"),
+        dataset_id=os.getenv("DATASET_ID")
+    )
+    print(counts)
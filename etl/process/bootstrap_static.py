@@ -1,5 +1,6 @@
-from typing import Dict, List
+from typing import Dict, List, Optional
 from etl.fetch.bootstrap_static import fetch_bootstrap_static
+from etl.fetch.shared_snapshot import get_shared_snapshot
 
 
 def get_elements_from_team(team_id: int) -> List[int]:
@@ -15,16 +16,23 @@ def get_elements_from_team(team_id: int) -> List[int]:
     Raises:
         ValueError: If team_id is not found in the data
     """
-    # Fetch the latest bootstrap-static data
-    raw_data: Dict[str, List[Dict[str, int]]] = fetch_bootstrap_static()
-    # Extract elements data
-    elements: List[Dict[str, int]] = raw_data.get("elements", [])
+    shared_snapshot = get_shared_snapshot()
+    if shared_snapshot is not None:
+        # Ensure the snapshot is published, then use its element index
+        # rather than decoding the elements table
+        fetch_bootstrap_static()
+        team_elements: List[int] = shared_snapshot.team_elements(team_id)
+    else:
+        # Fetch the latest bootstrap-static data
+        raw_data: Dict[str, List[Dict[str, int]]] = fetch_bootstrap_static()
+        # Extract elements data
+        elements: List[Dict[str, int]] = raw_data.get("elements", [])
 
-    # Filter elements by team ID
-    team_elements: List[int] = [
-        element['id'] for element in elements
-        if element["team"] == team_id
-    ]
+        # Filter elements by team ID
+        team_elements = [
+            element['id'] for element in elements
+            if element["team"] == team_id
+        ]
 
     if not team_elements:
         raise ValueError(f"No elements found for team_id: {team_id}")
@@ -32,6 +40,39 @@ def get_elements_from_team(team_id: int) -> List[int]:
     return team_elements
 
 
+def get_elements_from_teams(
+        team_ids: Optional[List[int]] = None
+        ) -> Dict[int, List[int]]:
+    """
+    Fetches the elements (players) of several teams in one pass.
+
+    Args:
+        team_ids (Optional[List[int]]): The IDs of the teams. Defaults to
+            every team.
+
+    Returns:
+        Dict[int, List[int]]: The player IDs of each team, in team_ids order.
+    """
+    raw_data = fetch_bootstrap_static()
+    if team_ids is None:
+        team_ids = [team['id'] for team in raw_data.get("teams", [])]
+
+    teams_elements: Dict[int, List[int]] = {
+        team_id: [] for team_id in team_ids}
+    shared_snapshot = get_shared_snapshot()
+    if shared_snapshot is not None:
+        # Read the snapshot's element index rather than decoding elements
+        for element_id, team_id in shared_snapshot.element_teams().items():
+            if team_id in teams_elements:
+                teams_elements[team_id].append(element_id)
+        return teams_elements
+
+    for element in raw_data.get("elements", []):
+        if element["team"] in teams_elements:
+            teams_elements[element["team"]].append(element['id'])
+    return teams_elements
+
+
 if __name__ == '__main__':
     try:
         elements = get_elements_from_team(1)
@@ -1,36 +1,135 @@
+import os
+import json
+import asyncio
 import logging
-from typing import Dict, List, Optional, Any
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Any, Tuple, TYPE_CHECKING
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
+from etl.archive import current_gameweek, get_archive
 from etl.fetch import ElementSummaryFetcher
 from etl.fetch.bootstrap_static import fetch_bootstrap_static
-from etl.upload.storage import upload_json_to_gcs
-from etl.upload.bigquery import upload_element_summary_from_gcs_to_bigquery
+from etl.fetch.shared_snapshot import get_shared_snapshot
+from etl.fetch.circuit_breaker import (
+    check_gameweek_settled,
+    fpl_circuit_breaker
+)
+from etl.history import update_history_store
+from etl.metrics import (
+    PlayerMetricsStore,
+    get_metrics_store,
+    save_metrics_store
+)
+from etl.process.refresh_scheduler import (
+    RefreshPlan,
+    RefreshScheduler,
+    get_refresh_scheduler
+)
+from etl.upload.sinks import SINKS, NullSink, Sink, get_sink
+from etl.utils.profiling import PipelineProfiler, profiling_enabled
+
+if TYPE_CHECKING:
+    from aiohttp import ClientSession
+
+# Teams processed at once by the threaded pipeline, each thread running its
+# own event loop
+DEFAULT_MAX_WORKERS = 5
+
+ELEMENT_SUMMARY_TABLES = [
+    'element_summary_fixtures',
+    'element_summary_history',
+    'element_summary_history_past'
+]
+
+
+def load_bootstrap_static(
+        replay_gameweek: Optional[int] = None
+        ) -> Dict[str, Any]:
+    """
+    Load bootstrap-static data from the API, or from the archive on replay.
 
+    Args:
+        replay_gameweek (Optional[int], optional): If set, the archived
+            bootstrap-static payload for this gameweek is used instead of the
+            API.
 
-def get_element_summary_for_teams(
-        team_ids: List[int],
-        element_ids: Optional[List[int]] = None
+    Returns:
+        Dict[str, Any]: Dictionary containing the extracted tables
+
+    Raises:
+        ValueError: If replaying without ARCHIVE_DIR configured
+    """
+    if replay_gameweek is None:
+        return fetch_bootstrap_static()
+
+    from etl.archive.replay import ReplayBootstrapStaticFetcher
+
+    archive = get_archive()
+    if archive is None:
+        raise ValueError("ARCHIVE_DIR must be set to replay a gameweek")
+    return ReplayBootstrapStaticFetcher(archive, replay_gameweek).run()
+
+
+def load_run_bootstrap_static(
+        replay_gameweek: Optional[int] = None
         ) -> Dict[str, Any]:
     """
-    Fetch the element summary data for all players in the given teams.
+    Load bootstrap-static data at the start of a pipeline run.
+
+    Live runs refresh the cached data and are deferred while the current
+    gameweek has finished but FPL has not checked its data yet, unless
+    DEFER_UNSETTLED_RUNS is "false".
+
+    Args:
+        replay_gameweek (Optional[int], optional): If set, the archived
+            bootstrap-static payload for this gameweek is used instead of the
+            API.
+
+    Returns:
+        Dict[str, Any]: Dictionary containing the extracted tables
+
+    Raises:
+        GameUpdatingError: If the current gameweek's data has not settled
+    """
+    if replay_gameweek is not None:
+        return load_bootstrap_static(replay_gameweek)
+
+    data = fetch_bootstrap_static(force_refresh=True)
+    if os.getenv("DEFER_UNSETTLED_RUNS", "true") == "true":
+        check_gameweek_settled(data.get("events", []))
+    return data
+
+
+def build_element_summary_fetcher(
+        team_ids: List[int],
+        element_ids: Optional[List[int]] = None,
+        replay_gameweek: Optional[int] = None
+        ) -> ElementSummaryFetcher:
+    """
+    Select the players in the given teams and build a fetcher for them.
 
     Args:
         team_ids (List[int]): List of team IDs to fetch player data for.
         element_ids (Optional[List[int]], optional): Specific player IDs to
             fetch within the specified teams.
+        replay_gameweek (Optional[int], optional): If set, archived payloads
+            for this gameweek are replayed instead of calling the API.
 
     Returns:
-        Dict[str, Any]: A dictionary containing the element summary data.
+        ElementSummaryFetcher: A fetcher for the selected players.
     """
     # Step 1: Fetch the latest bootstrap-static data
-    raw_data: Dict[str, Any] = fetch_bootstrap_static()
-
-    # Step 2: Extract elements data
-    elements: List[Dict[str, Any]] = raw_data.get("elements", [])
-
-    # Step 3: Create a mapping of player IDs to their team IDs
-    player_team_map = {element["id"]: element["team"] for element in elements}
+    raw_data: Dict[str, Any] = load_bootstrap_static(replay_gameweek)
+
+    # Step 2: Create a mapping of player IDs to their team IDs, from the
+    # shared snapshot's index rather than the decoded elements when live
+    shared_snapshot = get_shared_snapshot() \
+        if replay_gameweek is None else None
+    if shared_snapshot is not None:
+        player_team_map = shared_snapshot.element_teams()
+    else:
+        player_team_map = {element["id"]: element["team"]
+                           for element in raw_data.get("elements", [])}
 
     if element_ids is None:
         # Filter player IDs by matching team IDs
@@ -60,104 +159,383 @@ def get_element_summary_for_teams(
                 invalid_element_ids
             )
 
-    # Step 4: Fetch element summaries for the selected player IDs
-    logging.info(
-        f"Fetching element summaries for {len(filtered_player_ids)}"
-        " players...")
-    element_summary_fetcher = ElementSummaryFetcher(
-        player_ids=filtered_player_ids)
-    return element_summary_fetcher.run()
+    # Step 3: Fetch element summaries for the selected player IDs
+    logging.info("Fetching element summaries for %d players...",
+                 len(filtered_player_ids))
+    if replay_gameweek is None:
+        element_summary_fetcher = ElementSummaryFetcher(
+            player_ids=filtered_player_ids,
+            archive=get_archive(),
+            gameweek=current_gameweek(raw_data.get("events", []))
+        )
+    else:
+        from etl.archive.replay import ReplayElementSummaryFetcher
+
+        element_summary_fetcher = ReplayElementSummaryFetcher(
+            player_ids=filtered_player_ids,
+            archive=get_archive(),
+            gameweek=replay_gameweek
+        )
+    return element_summary_fetcher
+
+
+def get_element_summary_for_teams(
+        team_ids: List[int],
+        element_ids: Optional[List[int]] = None,
+        replay_gameweek: Optional[int] = None
+        ) -> Dict[str, Any]:
+    """
+    Fetch the element summary data for all players in the given teams.
+
+    Args:
+        team_ids (List[int]): List of team IDs to fetch player data for.
+        element_ids (Optional[List[int]], optional): Specific player IDs to
+            fetch within the specified teams.
+        replay_gameweek (Optional[int], optional): If set, archived payloads
+            for this gameweek are replayed instead of calling the API.
+
+    Returns:
+        Dict[str, Any]: A dictionary containing the element summary data.
+    """
+    return build_element_summary_fetcher(
+        team_ids=team_ids,
+        element_ids=element_ids,
+        replay_gameweek=replay_gameweek
+    ).run()
+
+
+def upload_team_summary(
+        team_id: int,
+        data: Dict[str, Any],
+        sink: Sink,
+        destination_folder: str = 'element_summary'
+        ) -> None:
+    """
+    Writes each non-empty element summary table of a team to the sink.
+
+    Args:
+        team_id (int): The team ID.
+        data (Dict[str, Any]): The element summary tables for the team.
+        sink (Sink): Destination of the run's tables.
+        destination_folder (str): Folder of the run's tables.
+    """
+    for table_name, table_data in data.items():
+        if table_data:
+            table_id = f"element_summary_{table_name}"
+            logging.info("Writing table %s for team %s to %s sink...",
+                         table_name, team_id, sink.name)
+            sink.write(
+                folder=destination_folder,
+                table_id=table_id,
+                part=team_id,
+                rows=table_data
+            )
+            logging.info("Wrote table %s for team %s to %s sink.",
+                         table_name, team_id, sink.name)
+
+
+def update_player_stores(
+        data: Dict[str, Any],
+        metrics_store: Optional[PlayerMetricsStore] = None
+        ) -> None:
+    """
+    Applies a team's element summaries to the player metrics and history
+    stores.
+
+    Args:
+        data (Dict[str, Any]): The team's element summary data.
+        metrics_store (Optional[PlayerMetricsStore]): Store to apply the
+            results to, defaults to this process's store.
+    """
+    if metrics_store is None:
+        metrics_store = get_metrics_store()
+    metrics_store.apply_results(data)
+    update_history_store(data)
 
 
 def fetch_and_upload_team_summary(
         team_id: int,
-        bucket_name: str,
+        sink: Sink,
         destination_folder: str = 'element_summary',
-        element_ids: Optional[List[int]] = None
-        ) -> None:
+        element_ids: Optional[List[int]] = None,
+        replay_gameweek: Optional[int] = None,
+        dry_run: bool = False,
+        metrics_store: Optional[PlayerMetricsStore] = None
+        ) -> Optional[List[int]]:
     """
-    Fetches element summaries for a single team and uploads to Cloud Storage.
+    Fetches element summaries for a single team and writes them to a sink.
 
     Args:
         team_id (int): The team ID.
-        bucket_name (str): GCS bucket name.
-        destination_folder (str): Folder path inside the bucket.
+        sink (Sink): Destination of the run's tables.
+        destination_folder (str): Folder of the run's tables.
         element_ids (Optional[List[int]], optional): Specific element IDs to
             filter players.
+        replay_gameweek (Optional[int], optional): Gameweek to replay from
+            the archive instead of calling the API.
+        dry_run (bool): Leave the player metrics and history stores
+            untouched.
+        metrics_store (Optional[PlayerMetricsStore]): Store to apply the
+            results to, defaults to this process's store.
+
+    Returns:
+        Optional[List[int]]: IDs of the players that could not be fetched,
+            or None if processing the team failed.
     """
     try:
         logging.info(f"Fetching data for team {team_id}...")
         data: Dict[str, Any] = get_element_summary_for_teams(
             team_ids=[team_id],
-            element_ids=element_ids
+            element_ids=element_ids,
+            replay_gameweek=replay_gameweek
         )
 
         if not data:
             logging.warning(f"No data found for team {team_id}."
                             " Skipping upload.")
-            return
-
-        # Define GCS object name (e.g., "element_summary/team_1.json")
-        for table_name, table_data in data.items():
-            if table_data:
-                file_name = f"element_summary_{table_name}_{team_id}.json"
-                blob_name = f"{destination_folder}/{file_name}"
-
-                # Upload to GCS
-                logging.info(
-                    f"Uploading table {table_name} for "
-                    f"team {team_id} to GCS at {blob_name}..."
-                    "team {team_id} to GCS at {blob_name}..."
-                )
-                upload_json_to_gcs(
-                    bucket_name=bucket_name,
-                    blob_name=blob_name,
-                    data=table_data
-                )
+            return []
 
-                logging.info(f"Uploaded table {table_name} for"
-                             f" team {team_id} to GCS at {blob_name}.")
+        upload_team_summary(
+            team_id=team_id,
+            data=data,
+            sink=sink,
+            destination_folder=destination_folder
+        )
+        if replay_gameweek is None and not dry_run:
+            update_player_stores(data, metrics_store)
+        return [error["player_id"] for error in data.get("errors", [])]
 
     except Exception as exc:
         logging.error(f"Error processing team {team_id}: {exc}")
+        return None
 
 
 def fetch_and_upload_multiple_teams(
     team_ids: List[int],
-    bucket_name: str,
+    sink: Sink,
     destination_folder: str = 'element_summary',
     element_ids: Optional[List[int]] = None,
-    max_workers: int = 5
-) -> None:
+    max_workers: Optional[int] = None,
+    replay_gameweek: Optional[int] = None,
+    dry_run: bool = False,
+    team_element_ids: Optional[Dict[int, List[int]]] = None,
+    metrics_store: Optional[PlayerMetricsStore] = None
+) -> Dict[int, Optional[List[int]]]:
     """
     Fetch and upload element summaries for multiple teams in parallel.
 
     Args:
         team_ids (List[int]): List of team IDs to process.
-        bucket_name (str): GCS bucket name.
-        destination_folder (str): Folder path inside the bucket.
+        sink (Sink): Destination of the run's tables.
+        destination_folder (str): Folder of the run's tables.
         element_ids (Optional[List[int]], optional): Specific element IDs to
             filter players.
-        max_workers (int): Number of threads to use.
+        max_workers (Optional[int]): Number of teams to process at once,
+            each on its own thread, defaults to DEFAULT_MAX_WORKERS. The
+            requests in flight are limited by fpl_request_limiter either way.
+        replay_gameweek (Optional[int], optional): Gameweek to replay from
+            the archive instead of calling the API.
+        dry_run (bool): Leave the player metrics and history stores
+            untouched.
+        team_element_ids (Optional[Dict[int, List[int]]]): Element IDs of
+            each team, passed to that team instead of element_ids.
+        metrics_store (Optional[PlayerMetricsStore]): Store to apply the
+            results to, defaults to this process's store.
+
+    Returns:
+        Dict[int, Optional[List[int]]]: The result of each team, as returned
+            by fetch_and_upload_team_summary.
     """
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+    team_results: Dict[int, Optional[List[int]]] = {}
+    with ThreadPoolExecutor(
+            max_workers=max_workers or DEFAULT_MAX_WORKERS) as executor:
         future_to_team = {
             executor.submit(
                 fetch_and_upload_team_summary,
                 team_id=team_id,
-                bucket_name=bucket_name,
+                sink=sink,
                 destination_folder=destination_folder,
-                element_ids=element_ids
+                element_ids=element_ids if team_element_ids is None
+                else team_element_ids[team_id],
+                replay_gameweek=replay_gameweek,
+                dry_run=dry_run,
+                metrics_store=metrics_store
             ): team_id for team_id in team_ids
         }
 
         for future in as_completed(future_to_team):
             team_id = future_to_team[future]
             try:
-                future.result()
+                team_results[team_id] = future.result()
                 logging.info(f"Finished processing team {team_id}.")
             except Exception as exc:
+                team_results[team_id] = None
                 logging.error(f"Team {team_id} generated an exception: {exc}")
+    return team_results
+
+
+def plan_changed_only_refresh(
+        elements: List[Dict[str, Any]],
+        team_ids: List[int],
+        element_ids: Optional[List[int]],
+        bucket_name: str,
+        destination_folder: str
+        ) -> Tuple[RefreshScheduler, RefreshPlan, Dict[int, List[int]], str]:
+    """
+    Select the players whose bootstrap-static signals moved, plus a rotating
+    sweep of the rest, among the requested teams and elements.
+
+    Args:
+        elements (List[Dict[str, Any]]): The bootstrap-static elements table
+        team_ids (List[int]): Team IDs to consider
+        element_ids (Optional[List[int]]): Element IDs to consider within the
+            teams, defaults to all of their players
+        bucket_name (str): GCS bucket name
+        destination_folder (str): GCS destination folder of full refreshes
+
+    Returns:
+        Tuple[RefreshScheduler, RefreshPlan, Dict[int, List[int]], str]: The
+            scheduler and its plan, the planned players of each team with
+            any, and the run's own GCS folder
+    """
+    candidates = [
+        element for element in elements
+        if element["team"] in team_ids
+        and (element_ids is None or element["id"] in element_ids)
+    ]
+    scheduler = get_refresh_scheduler(bucket_name, destination_folder)
+    plan = scheduler.plan(candidates)
+
+    planned = set(plan.element_ids)
+    team_element_ids: Dict[int, List[int]] = {}
+    for element in candidates:
+        if element["id"] in planned:
+            team_element_ids.setdefault(element["team"], []).append(
+                element["id"])
+    run_id = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+    run_folder = f"{destination_folder}/incremental/{run_id}"
+    return scheduler, plan, dict(sorted(team_element_ids.items())), run_folder
+
+
+def failed_element_ids(
+        plan: RefreshPlan,
+        elements: List[Dict[str, Any]],
+        team_results: Dict[int, Optional[List[int]]]
+        ) -> List[int]:
+    """
+    Collect the planned players that were not refreshed.
+
+    Args:
+        plan (RefreshPlan): The executed plan
+        elements (List[Dict[str, Any]]): The bootstrap-static elements table
+        team_results (Dict[int, Optional[List[int]]]): The result of each
+            team, as returned by fetch_and_upload_team_summary
+
+    Returns:
+        List[int]: Players that failed, including every planned player of a
+            team whose processing failed
+    """
+    player_team_map = {element["id"]: element["team"] for element in elements}
+    failed = []
+    for element_id in plan.element_ids:
+        team_result = team_results.get(player_team_map.get(element_id))
+        if team_result is None or element_id in team_result:
+            failed.append(element_id)
+    return failed
+
+
+def refreshed_element_ids(
+        plan: Optional[RefreshPlan],
+        failed: List[int]
+        ) -> Optional[List[int]]:
+    """
+    Collect the planned players that were refreshed, whose old rows an
+    incremental load replaces.
+
+    Args:
+        plan (Optional[RefreshPlan]): The executed plan, None for full runs
+        failed (List[int]): Players that failed, as returned by
+            failed_element_ids
+
+    Returns:
+        Optional[List[int]]: The refreshed players, or None for full runs
+    """
+    if plan is None:
+        return None
+    return sorted(set(plan.element_ids) - set(failed))
+
+
+class IncompleteRunError(Exception):
+    """Raised when a full run could not process every team."""
+
+
+def check_full_run_complete(
+        team_results: Dict[int, Optional[List[int]]]
+        ) -> None:
+    """
+    Make sure every team of a full run was processed before its tables
+    replace the loaded ones, which would drop the players of a failed team.
+
+    Args:
+        team_results (Dict[int, Optional[List[int]]]): The result of each
+            team, as returned by fetch_and_upload_team_summary
+
+    Raises:
+        IncompleteRunError: If processing any team failed
+    """
+    failed = sorted(team_id for team_id, result in team_results.items()
+                    if result is None)
+    if failed:
+        raise IncompleteRunError(
+            f"Teams {failed} failed, keeping the previous full load")
+
+
+def write_profile(profiler: PipelineProfiler,
+                  bucket_name: Optional[str]
+                  ) -> None:
+    """
+    Write a run's profile to PROFILE_OUTPUT, defaulting to the profiles
+    folder of the bucket, or of SINK_DIR when there is no bucket. Failures
+    are logged rather than raised, so that they neither fail the run nor
+    hide the error it raised.
+
+    Args:
+        profiler (PipelineProfiler): The run's profiler
+        bucket_name (Optional[str]): GCS bucket name
+    """
+    if bucket_name:
+        default_output = f"gs://{bucket_name}/profiles"
+    else:
+        default_output = os.path.join(
+            os.getenv("SINK_DIR", "output"), "profiles")
+    try:
+        profiler.write(os.getenv("PROFILE_OUTPUT", default_output))
+    except Exception as e:
+        logging.warning("Could not write the run's profile: %s", e)
+
+
+def build_run_report(
+        profiler: PipelineProfiler,
+        sink: Sink
+        ) -> Dict[str, Any]:
+    """
+    Summarise a pipeline run.
+
+    Args:
+        profiler (PipelineProfiler): The run's profiler, which times every
+            stage even when profiling is disabled
+        sink (Sink): The run's sink
+
+    Returns:
+        Dict[str, Any]: The sink name, the seconds of each stage with the
+            rows and bytes written during the fetch stage, and the rows,
+            bytes and parts written to each table
+    """
+    stages = {name: {"seconds": seconds}
+              for name, seconds in profiler.durations.items()}
+    if "fetch_and_upload_teams" in stages:
+        stages["fetch_and_upload_teams"].update(sink.totals())
+    return {"sink": sink.name, "stages": stages, "tables": sink.stats}
 
 
 def fetch_and_upload_element_summary(
@@ -167,11 +545,45 @@ def fetch_and_upload_element_summary(
         destination_folder: str = 'element_summary',
         team_ids: Optional[List[int]] = None,
         element_ids: Optional[List[int]] = None,
-        max_workers: int = 5
-        ) -> None:
+        max_workers: Optional[int] = None,
+        replay_gameweek: Optional[int] = None,
+        profile: bool = False,
+        changed_only: bool = False,
+        sink: Optional[Sink] = None,
+        dry_run: bool = False
+        ) -> Dict[str, Any]:
     """
     Fetch data from the element_summary endpoint and upload to BigQuery
 
+    The tables are written to and loaded by the sink, which defaults to the
+    one selected by SINK (see get_sink). A dry run discards them instead
+    and has no other side effects either: it loads nothing, leaves the
+    player metrics and history stores alone, and fetches the requested
+    players in full rather than reading or recording the changed-only
+    refresh state, so that it measures fetch and transform throughput only.
+
+    When changed_only is set, only players whose bootstrap-static change
+    signals moved since the last changed-only run are fetched, plus a
+    rotating sweep of the others (see RefreshScheduler). Their rows replace
+    the existing rows of those players in BigQuery, so the tables must have
+    been loaded by a full run first. A full run replaces the tables
+    instead, so it is aborted before the load if any team failed, rather
+    than dropping that team's players.
+
+    When replay_gameweek is set, the payloads archived for that gameweek are
+    fed through the same process and upload stages instead of the API.
+
+    Live runs also update the in-memory player metrics (see
+    PlayerMetricsStore) and the embedded player history store (see
+    PlayerHistoryStore). They are deferred while the current gameweek's
+    data is being checked, and are aborted before the BigQuery load if the
+    API started returning 503s during the run and did not recover (see
+    CircuitBreaker).
+
+    When profiling is enabled, each stage is CPU-sampled and memory-traced,
+    and the report and folded stacks are written to PROFILE_OUTPUT (a local
+    directory or gs:// URI, defaulting to the profiles folder of the bucket).
+
     Args:
         project_id (str): GCP project ID
         bucket_name (str): GCS bucket name
@@ -180,45 +592,338 @@ def fetch_and_upload_element_summary(
         team_ids (Optional[List[int]], optional): Specific team IDs to process
         element_ids (Optional[List[int]], optional): Specific element IDs to
             filter players
-        max_workers (int): Number of threads to use for parallel processing
+        max_workers (Optional[int]): Number of teams to process at once,
+            defaults to DEFAULT_MAX_WORKERS
+        replay_gameweek (Optional[int], optional): Gameweek to replay from
+            the archive instead of calling the API
+        profile (bool): Profile the run, also enabled by PROFILE_PIPELINE
+        changed_only (bool): Only fetch players whose stats moved
+        sink (Optional[Sink], optional): Destination of the tables,
+            closed when the run ends
+        dry_run (bool): Discard the tables and only report the run
+
+    Returns:
+        Dict[str, Any]: The run report, see build_run_report
     """
+    if dry_run:
+        sink = NullSink()
+    elif sink is None:
+        sink = get_sink(project_id=project_id, bucket_name=bucket_name,
+                        dataset_id=dataset_id)
+    profiler = PipelineProfiler(enabled=profiling_enabled(profile))
+    try:
+        with profiler.stage("bootstrap_static"):
+            bootstrap_static_data: Dict[str, Any] = \
+                load_run_bootstrap_static(replay_gameweek)
+        if not team_ids:
+            teams: List[Dict[str, Any]] = bootstrap_static_data['teams']
+            team_ids = [t['id'] for t in teams]
+
+        plan = None
+        team_element_ids = None
+        if changed_only and dry_run:
+            logging.info("Dry runs fetch every requested player.")
+        elif changed_only:
+            elements = bootstrap_static_data['elements']
+            scheduler, plan, team_element_ids, destination_folder = \
+                plan_changed_only_refresh(
+                    elements=elements,
+                    team_ids=team_ids,
+                    element_ids=element_ids,
+                    bucket_name=bucket_name,
+                    destination_folder=destination_folder
+                )
+            if not plan.element_ids:
+                logging.info("No players to refresh.")
+                return build_run_report(profiler, sink)
+            team_ids = list(team_element_ids)
+
+        logging.info(
+            f"Fetching element summary data for teams: {team_ids} "
+            f"and writing to the {sink.name} sink in folder: "
+            f"{destination_folder}"
+        )
+        # Looked up once, as a lookup may reload a store saved elsewhere
+        metrics_store = get_metrics_store() \
+            if replay_gameweek is None and not dry_run else None
+        with profiler.stage("fetch_and_upload_teams"):
+            team_results = fetch_and_upload_multiple_teams(
+                team_ids=team_ids,
+                sink=sink,
+                destination_folder=destination_folder,
+                element_ids=element_ids,
+                max_workers=max_workers,
+                replay_gameweek=replay_gameweek,
+                dry_run=dry_run,
+                team_element_ids=team_element_ids,
+                metrics_store=metrics_store
+            )
+        if replay_gameweek is None:
+            if not dry_run:
+                save_metrics_store(metrics_store)
+            # Keep the previous load if the game started updating mid-run
+            fpl_circuit_breaker.raise_if_open()
+        if plan is None and not dry_run:
+            check_full_run_complete(team_results)
+
+        failed = failed_element_ids(plan, elements, team_results) \
+            if plan is not None else []
+        with profiler.stage("load_tables"):
+            sink.load(destination_folder, ELEMENT_SUMMARY_TABLES,
+                      incremental=plan is not None,
+                      element_ids=refreshed_element_ids(plan, failed))
+
+        if plan is not None:
+            scheduler.commit(plan, failed)
+        report = build_run_report(profiler, sink)
+        logging.info("Element summary run report: %s", report)
+        return report
+    finally:
+        sink.close()
+        write_profile(profiler, bucket_name)
+
+
+async def fetch_and_upload_team_summary_async(
+        session: 'ClientSession',
+        team_id: int,
+        sink: Sink,
+        destination_folder: str = 'element_summary',
+        element_ids: Optional[List[int]] = None,
+        replay_gameweek: Optional[int] = None,
+        dry_run: bool = False,
+        metrics_store: Optional[PlayerMetricsStore] = None
+        ) -> Optional[List[int]]:
+    """
+    Fetches element summaries for a single team on the running event loop
+    and writes them to a sink.
+
+    The HTTP requests share the caller's session. Selecting players, the
+    sink writes and the store updates are blocking, so they run in the
+    loop's default executor.
+
+    Args:
+        session (ClientSession): Long-lived aiohttp session to fetch with.
+        team_id (int): The team ID.
+        sink (Sink): Destination of the run's tables.
+        destination_folder (str): Folder of the run's tables.
+        element_ids (Optional[List[int]], optional): Specific element IDs to
+            filter players.
+        replay_gameweek (Optional[int], optional): Gameweek to replay from
+            the archive instead of calling the API.
+        dry_run (bool): Leave the player metrics and history stores
+            untouched.
+        metrics_store (Optional[PlayerMetricsStore]): Store to apply the
+            results to, defaults to this process's store.
+
+    Returns:
+        Optional[List[int]]: IDs of the players that could not be fetched,
+            or None if processing the team failed.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        logging.info(f"Fetching data for team {team_id}...")
+        fetcher = await loop.run_in_executor(
+            None,
+            build_element_summary_fetcher,
+            [team_id],
+            element_ids,
+            replay_gameweek
+        )
+        if replay_gameweek is None:
+            data = await fetcher.run_async(session)
+        else:
+            data = await loop.run_in_executor(None, fetcher.run)
+
+        await loop.run_in_executor(
+            None,
+            upload_team_summary,
+            team_id,
+            data,
+            sink,
+            destination_folder
+        )
+        if replay_gameweek is None and not dry_run:
+            # The history write can wait up to 30s on SQLite's write lock
+            await loop.run_in_executor(
+                None, update_player_stores, data, metrics_store)
+        logging.info(f"Finished processing team {team_id}.")
+        return [error["player_id"] for error in data.get("errors", [])]
+
+    except Exception as exc:
+        logging.error(f"Error processing team {team_id}: {exc}")
+        return None
+
+
+async def fetch_and_upload_element_summary_async(
+        session: 'ClientSession',
+        project_id: str,
+        bucket_name: str,
+        dataset_id: str,
+        destination_folder: str = 'element_summary',
+        team_ids: Optional[List[int]] = None,
+        element_ids: Optional[List[int]] = None,
+        max_workers: Optional[int] = None,
+        replay_gameweek: Optional[int] = None,
+        profile: bool = False,
+        changed_only: bool = False,
+        sink: Optional[Sink] = None,
+        dry_run: bool = False
+        ) -> Dict[str, Any]:
+    """
+    Async counterpart of fetch_and_upload_element_summary for callers that
+    already own an event loop and aiohttp session, such as the async web
+    app.
+
+    Args:
+        session (ClientSession): Long-lived aiohttp session to fetch with
+        project_id (str): GCP project ID
+        bucket_name (str): GCS bucket name
+        dataset_id (str): BigQuery dataset ID
+        destination_folder (str): GCS destination folder
+        team_ids (Optional[List[int]], optional): Specific team IDs to process
+        element_ids (Optional[List[int]], optional): Specific element IDs to
+            filter players
+        max_workers (Optional[int]): Number of teams to process at once,
+            defaults to all of them
+        replay_gameweek (Optional[int], optional): Gameweek to replay from
+            the archive instead of calling the API
+        profile (bool): Profile the run, also enabled by PROFILE_PIPELINE
+        changed_only (bool): Only fetch players whose stats moved
+        sink (Optional[Sink], optional): Destination of the tables,
+            closed when the run ends
+        dry_run (bool): Discard the tables and only report the run
+
+    Returns:
+        Dict[str, Any]: The run report, see build_run_report
+    """
+    if dry_run:
+        sink = NullSink()
+    elif sink is None:
+        sink = get_sink(project_id=project_id, bucket_name=bucket_name,
+                        dataset_id=dataset_id)
+    loop = asyncio.get_running_loop()
+    profiler = PipelineProfiler(enabled=profiling_enabled(profile))
+    try:
+        await _fetch_and_upload_element_summary_async(
+            loop=loop,
+            profiler=profiler,
+            session=session,
+            sink=sink,
+            bucket_name=bucket_name,
+            destination_folder=destination_folder,
+            team_ids=team_ids,
+            element_ids=element_ids,
+            max_workers=max_workers,
+            replay_gameweek=replay_gameweek,
+            changed_only=changed_only,
+            dry_run=dry_run
+        )
+        report = build_run_report(profiler, sink)
+        logging.info("Element summary run report: %s", report)
+        return report
+    finally:
+        await loop.run_in_executor(None, sink.close)
+        await loop.run_in_executor(
+            None, write_profile, profiler, bucket_name)
+
+
+async def _fetch_and_upload_element_summary_async(
+        loop: asyncio.AbstractEventLoop,
+        profiler: PipelineProfiler,
+        session: 'ClientSession',
+        sink: Sink,
+        bucket_name: str,
+        destination_folder: str,
+        team_ids: Optional[List[int]],
+        element_ids: Optional[List[int]],
+        max_workers: Optional[int],
+        replay_gameweek: Optional[int],
+        changed_only: bool,
+        dry_run: bool
+        ) -> None:
+    with profiler.stage("bootstrap_static"):
+        bootstrap_static_data: Dict[str, Any] = await loop.run_in_executor(
+            None, load_run_bootstrap_static, replay_gameweek)
     if not team_ids:
-        bootstrap_static_data: Dict[str, Any] = fetch_bootstrap_static()
         teams: List[Dict[str, Any]] = bootstrap_static_data['teams']
         team_ids = [t['id'] for t in teams]
 
+    plan = None
+    team_element_ids = None
+    if changed_only and dry_run:
+        logging.info("Dry runs fetch every requested player.")
+    elif changed_only:
+        elements = bootstrap_static_data['elements']
+        scheduler, plan, team_element_ids, destination_folder = \
+            await loop.run_in_executor(
+                None,
+                plan_changed_only_refresh,
+                elements,
+                team_ids,
+                element_ids,
+                bucket_name,
+                destination_folder
+            )
+        if not plan.element_ids:
+            logging.info("No players to refresh.")
+            return
+        team_ids = list(team_element_ids)
+
     logging.info(
         f"Fetching element summary data for teams: {team_ids} "
-        "and uploading to GCS bucket: "
-        f"{bucket_name} in folder: {destination_folder}"
+        f"and writing to the {sink.name} sink in folder: "
+        f"{destination_folder}"
     )
-    fetch_and_upload_multiple_teams(
-        team_ids=team_ids,
-        bucket_name=bucket_name,
-        destination_folder=destination_folder,
-        element_ids=element_ids,
-        max_workers=max_workers
-    )
-
-    tables = [
-        'element_summary_fixtures',
-        'element_summary_history',
-        'element_summary_history_past'
-    ]
+    # Looked up once, as a lookup may reload a store saved elsewhere
+    metrics_store = await loop.run_in_executor(None, get_metrics_store) \
+        if replay_gameweek is None and not dry_run else None
+    # The requests in flight are limited by fpl_request_limiter
+    semaphore = asyncio.Semaphore(max_workers or len(team_ids))
+
+    async def process_team(team_id: int) -> Optional[List[int]]:
+        async with semaphore:
+            return await fetch_and_upload_team_summary_async(
+                session=session,
+                team_id=team_id,
+                sink=sink,
+                destination_folder=destination_folder,
+                element_ids=element_ids if team_element_ids is None
+                else team_element_ids[team_id],
+                replay_gameweek=replay_gameweek,
+                dry_run=dry_run,
+                metrics_store=metrics_store
+            )
 
-    for table_id in tables:
-        logging.info(f"Uploading table {table_id} to BigQuery...")
-        upload_element_summary_from_gcs_to_bigquery(
-            project_id=project_id,
-            dataset_id=dataset_id,
-            bucket_name=bucket_name,
-            source_folder=destination_folder,
-            table_id=table_id
+    with profiler.stage("fetch_and_upload_teams"):
+        results = await asyncio.gather(
+            *(process_team(team_id) for team_id in team_ids))
+    team_results = dict(zip(team_ids, results))
+    if replay_gameweek is None:
+        if not dry_run:
+            await loop.run_in_executor(
+                None, save_metrics_store, metrics_store)
+        # Keep the previous load if the game started updating mid-run
+        fpl_circuit_breaker.raise_if_open()
+    if plan is None and not dry_run:
+        check_full_run_complete(team_results)
+
+    failed = failed_element_ids(plan, elements, team_results) \
+        if plan is not None else []
+    with profiler.stage("load_tables"):
+        await loop.run_in_executor(
+            None,
+            sink.load,
+            destination_folder,
+            ELEMENT_SUMMARY_TABLES,
+            plan is not None,
+            refreshed_element_ids(plan, failed)
         )
 
+    if plan is not None:
+        await loop.run_in_executor(None, scheduler.commit, plan, failed)
+
 
 if __name__ == "__main__":
-    import os
     import argparse
     from dotenv import load_dotenv
     from etl.utils.string_manipulation import list_of_ints
@@ -243,6 +948,37 @@ if __name__ == "__main__":
         default="1,2,28,29",
         help="The ID's of the players (elements) from the teams to ingest"
     )
+    parser.add_argument(
+        "--replay_gameweek",
+        type=int,
+        default=None,
+        help="Replay the payloads archived in ARCHIVE_DIR for this gameweek"
+             " instead of calling the API"
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Profile CPU and memory of each stage, writing the artefacts to"
+             " PROFILE_OUTPUT"
+    )
+    parser.add_argument(
+        "--changed_only",
+        action="store_true",
+        help="Only fetch players whose stats moved since the last"
+             " changed-only run, plus a rotating sweep of the rest"
+    )
+    parser.add_argument(
+        "--sink",
+        choices=SINKS,
+        default=None,
+        help="Where to write the tables, defaults to SINK or gcs. The local"
+             " sink writes to SINK_DIR in SINK_FORMAT"
+    )
+    parser.add_argument(
+        "--dry_run", "--dry-run",
+        action="store_true",
+        help="Fetch and transform only, discarding the tables"
+    )
     args = parser.parse_args()
 
     # team_ids = [1, 2]
@@ -252,12 +988,18 @@ if __name__ == "__main__":
     PROJECT = os.getenv("PROJECT_ID")
     DATASET = os.getenv("DATASET_ID")
 
-    fetch_and_upload_element_summary(
+    report = fetch_and_upload_element_summary(
         project_id=PROJECT,
         bucket_name=BUCKET,
         dataset_id=DATASET,
         team_ids=args.team_ids,
         element_ids=args.element_ids,
         destination_folder='element_summary',
-        max_workers=5
+        replay_gameweek=args.replay_gameweek,
+        profile=args.profile,
+        changed_only=args.changed_only,
+        sink=None if args.dry_run else get_sink(
+            args.sink, PROJECT, BUCKET, DATASET),
+        dry_run=args.dry_run
     )
+    print(json.dumps(report, indent=2))
@@ -0,0 +1,182 @@
+import os
+import json
+import hashlib
+import logging
+from typing import List, Dict, Any, Iterable
+
+from etl.upload.storage import read_bytes, write_bytes
+
+# bootstrap-static element fields that change when a player's
+# element-summary is likely to have changed
+SIGNAL_FIELDS = [
+    "total_points",
+    "event_points",
+    "minutes",
+    "now_cost",
+    "news",
+    "status",
+    "chance_of_playing_next_round",
+]
+
+
+def element_signature(element: Dict[str, Any]) -> str:
+    """
+    Summarise the change signals of a bootstrap-static element.
+
+    Args:
+        element (Dict[str, Any]): A row of the bootstrap-static elements table
+
+    Returns:
+        str: A short hash of the element's signal fields
+    """
+    signals = json.dumps([element.get(field) for field in SIGNAL_FIELDS])
+    return hashlib.sha1(signals.encode("utf-8")).hexdigest()[:16]
+
+
+class RefreshPlan:
+    """
+    The players selected for one change-aware refresh.
+
+    Attributes:
+        element_ids (List[int]): Players to fetch, changed players first
+        changed_ids (List[int]): Players whose signals moved since the last
+            committed refresh, including new players
+        sweep_ids (List[int]): Unchanged players included by the rotating
+            sweep
+        signatures (Dict[int, str]): Current signature of every candidate
+        sweep_cursor (int): Sweep position to persist once the run succeeds
+    """
+
+    def __init__(self,
+                 changed_ids: List[int],
+                 sweep_ids: List[int],
+                 signatures: Dict[int, str],
+                 sweep_cursor: int
+                 ) -> None:
+        self.changed_ids = changed_ids
+        self.sweep_ids = sweep_ids
+        self.element_ids = changed_ids + sweep_ids
+        self.signatures = signatures
+        self.sweep_cursor = sweep_cursor
+
+
+class RefreshScheduler:
+    """
+    Chooses which players' element-summaries to fetch by diffing the
+    bootstrap-static elements table against the last committed refresh.
+
+    Players whose change signals moved are always fetched. A rotating sweep
+    also fetches `sweep_size` unchanged players per run, so every player is
+    eventually refreshed even if a change is not visible in the signals.
+    The state is stored as JSON on local disk or in GCS.
+
+    Attributes:
+        state_path (str): Local path or gs://bucket/blob URI of the state
+        sweep_size (int): Unchanged players refreshed per run
+    """
+
+    def __init__(self, state_path: str, sweep_size: int = 25) -> None:
+        """
+        Initialize the RefreshScheduler.
+
+        Args:
+            state_path (str): Local path or gs://bucket/blob URI of the state
+            sweep_size (int): Unchanged players refreshed per run
+        """
+        self.state_path = state_path
+        self.sweep_size = sweep_size
+
+    def load_state(self) -> Dict[str, Any]:
+        """Load the last committed state, or an empty state."""
+        raw = read_bytes(self.state_path)
+        if raw is None:
+            return {"signatures": {}, "sweep_cursor": 0}
+        state = json.loads(raw)
+        state["signatures"] = {
+            int(k): v for k, v in state["signatures"].items()}
+        return state
+
+    def save_state(self, state: Dict[str, Any]) -> None:
+        """Persist the state."""
+        raw = json.dumps(state, separators=(",", ":")).encode("utf-8")
+        write_bytes(self.state_path, raw, content_type="application/json")
+
+    def plan(self, elements: Iterable[Dict[str, Any]]) -> RefreshPlan:
+        """
+        Select the players to fetch from the current elements table.
+
+        Args:
+            elements (Iterable[Dict[str, Any]]): Candidate rows of the
+                bootstrap-static elements table
+
+        Returns:
+            RefreshPlan: The players to fetch
+        """
+        state = self.load_state()
+        previous = state["signatures"]
+        signatures = {e["id"]: element_signature(e) for e in elements}
+
+        changed_ids = [element_id for element_id, signature
+                       in signatures.items()
+                       if previous.get(element_id) != signature]
+        unchanged_ids = sorted(set(signatures) - set(changed_ids))
+
+        sweep_ids: List[int] = []
+        cursor = state.get("sweep_cursor", 0)
+        if unchanged_ids and self.sweep_size > 0:
+            # Continue from the first unchanged player after the cursor
+            start = next((i for i, element_id in enumerate(unchanged_ids)
+                          if element_id > cursor), 0)
+            count = min(self.sweep_size, len(unchanged_ids))
+            sweep_ids = [unchanged_ids[(start + i) % len(unchanged_ids)]
+                         for i in range(count)]
+            cursor = sweep_ids[-1]
+
+        logging.info(
+            "Refresh plan: %d changed and %d swept of %d players",
+            len(changed_ids), len(sweep_ids), len(signatures))
+        return RefreshPlan(changed_ids, sweep_ids, signatures, cursor)
+
+    def commit(self,
+               plan: RefreshPlan,
+               failed_ids: Iterable[int] = ()
+               ) -> None:
+        """
+        Record a successful refresh so its players are not fetched again
+        until their signals move.
+
+        Args:
+            plan (RefreshPlan): The plan that was executed
+            failed_ids (Iterable[int]): Players that could not be fetched;
+                they keep their previous signature and are retried next run
+        """
+        state = self.load_state()
+        failed = set(failed_ids)
+        for element_id, signature in plan.signatures.items():
+            if element_id not in failed:
+                state["signatures"][element_id] = signature
+        state["sweep_cursor"] = plan.sweep_cursor
+        self.save_state(state)
+
+
+def get_refresh_scheduler(bucket_name: str,
+                          destination_folder: str
+                          ) -> RefreshScheduler:
+    """
+    Build the scheduler configured by the environment.
+
+    Args:
+        bucket_name (str): GCS bucket name
+        destination_folder (str): GCS folder the element summaries go to
+
+    Returns:
+        RefreshScheduler: Scheduler storing its state at REFRESH_STATE_PATH,
+            defaulting to the destination folder of the bucket, and
+            sweeping REFRESH_SWEEP_SIZE players per run (default 25)
+    """
+    return RefreshScheduler(
+        state_path=os.getenv(
+            "REFRESH_STATE_PATH",
+            f"gs://{bucket_name}/{destination_folder}/_refresh_state.json"),
+        sweep_size=int(os.getenv("REFRESH_SWEEP_SIZE", "25"))
+    )
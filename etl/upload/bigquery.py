@@ -1,63 +1,299 @@
+import os
+import uuid
 import logging
 import argparse
-from google.cloud import bigquery
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import List, Optional, Union, TYPE_CHECKING
 
+from etl.upload.bigquery_layout import aggregate_refresh_sql, get_table_layout
 
-def upload_element_summary_from_gcs_to_bigquery(
-        project_id: str,
-        dataset_id: str,
-        bucket_name: str,
-        source_folder: str = 'element_summary',
-        table_id: str = 'element_summary_history'
-        ):
+if TYPE_CHECKING:
+    from google.cloud import bigquery
+
+
+@lru_cache(maxsize=None)
+def get_bigquery_client(project_id: str) -> 'bigquery.Client':
+    """
+    Return this process's BigQuery client for a project, creating it on first
+    use.
+
+    The google.cloud.bigquery import is deferred to here so that importing
+    the upload modules does not slow down application start up.
+    """
+    from google.cloud import bigquery
 
-    client = bigquery.Client(project=project_id)
+    return bigquery.Client(project=project_id)
 
-    bucket_uri = f"gs://{bucket_name}/{source_folder}/{table_id}_*.json"
 
-    # Create the full table reference
-    table_ref = client.dataset(dataset_id).table(table_id)
+# Clients hold connection pools that must not be shared with forked workers
+os.register_at_fork(after_in_child=get_bigquery_client.cache_clear)
+
+# Staging tables are dropped after each load, and expire after this long if
+# a run dies before it can drop them
+STAGING_TABLE_TTL = timedelta(days=1)
+
+
+def load_gcs_to_staging_table(
+        client: 'bigquery.Client',
+        bucket_uri: Union[str, List[str]],
+        staging: str
+        ) -> 'bigquery.LoadJob':
+    """
+    Create a staging table that expires after STAGING_TABLE_TTL and load
+    newline-delimited element and data rows from GCS into it.
+
+    Args:
+        client (bigquery.Client): BigQuery client
+        bucket_uri (Union[str, List[str]]): GCS URI of the files, which may
+            contain a wildcard, or the URIs of each file
+        staging (str): Fully qualified staging table
+
+    Returns:
+        bigquery.LoadJob: The completed load job
+    """
+    from google.cloud import bigquery
 
     schema = [
         bigquery.SchemaField("element", "INTEGER", mode="REQUIRED"),
-        # Store raw JSON in a STRING field
+        # Store raw JSON in a JSON field
         bigquery.SchemaField("data", "JSON", mode="REQUIRED"),
     ]
+    staging_table = bigquery.Table(staging, schema=schema)
+    staging_table.expires = datetime.now(timezone.utc) + STAGING_TABLE_TTL
+    client.create_table(staging_table, exists_ok=True)
 
-    # Define the Load Job Configuration
+    # Appending keeps the expiration of the new, empty table
     job_config = bigquery.LoadJobConfig(
         source_format=bigquery.SourceFormat.NEWLINE_DELIMITED_JSON,
-        # or WRITE_TRUNCATE if overwriting
-        write_disposition=bigquery.WriteDisposition.WRITE_TRUNCATE,
+        write_disposition=bigquery.WriteDisposition.WRITE_APPEND,
         schema=schema
     )
+    load_job = client.load_table_from_uri(
+        bucket_uri, staging, job_config=job_config)
+    load_job.result()  # Wait for the job to complete
+    return load_job
 
-    # Partitioning and Clustering
-    job_config.range_partitioning = bigquery.RangePartitioning(
-        field="element",
-        range_=bigquery.PartitionRange(
-            start=1,
-            end=2000,   # Example: upper bound above max player_id
-            interval=1,
-        )
-    )
-    # job_config.clustering_fields = ["gameweek"]
 
-    # Start the load job
-    load_job = client.load_table_from_uri(
-        bucket_uri,
-        table_ref,
-        job_config=job_config,
-    )
+def staging_table_id(target: str) -> str:
+    """
+    Name a staging table for one load of a table, so that overlapping runs
+    never share staging data.
+    """
+    return f"{target}_staging_{uuid.uuid4().hex[:12]}"
 
-    load_job.result()  # Wait for the job to complete
+
+def upload_element_summary_from_gcs_to_bigquery(
+        project_id: str,
+        dataset_id: str,
+        bucket_name: str,
+        source_folder: str = 'element_summary',
+        table_id: str = 'element_summary_history',
+        source_uris: Optional[List[str]] = None
+        ) -> None:
+    """
+    Replace a table with the rows found in GCS.
+
+    The files are loaded into a staging table of this load, then the table
+    is rebuilt from it with its typed columns, partitioning and clustering
+    (see TABLE_LAYOUTS), and the staging table is dropped.
+
+    Args:
+        project_id (str): GCP project ID
+        dataset_id (str): BigQuery dataset ID
+        bucket_name (str): GCS bucket name
+        source_folder (str): GCS folder holding the files
+        table_id (str): The table to replace
+        source_uris (Optional[List[str]]): The files to load, as listed in
+            the run's manifest, instead of every file of the table in the
+            folder
+    """
+    client = get_bigquery_client(project_id)
+    target = f"{project_id}.{dataset_id}.{table_id}"
+    staging = staging_table_id(target)
+    bucket_uri = source_uris or \
+        f"gs://{bucket_name}/{source_folder}/{table_id}_*.json"
+
+    try:
+        load_job = load_gcs_to_staging_table(client, bucket_uri, staging)
+        client.query(
+            get_table_layout(table_id).create_sql(target, staging)).result()
+    finally:
+        client.delete_table(staging, not_found_ok=True)
     logging.info(
         f"Loaded {load_job.output_rows} rows into"
         f" {dataset_id}:{table_id}.")
 
 
+def merge_element_summary_from_gcs_to_bigquery(
+        project_id: str,
+        dataset_id: str,
+        bucket_name: str,
+        source_folder: str,
+        table_id: str = 'element_summary_history',
+        source_uris: Optional[List[str]] = None,
+        element_ids: Optional[List[int]] = None
+        ) -> None:
+    """
+    Replace the rows of the refreshed players, keeping all other players.
+
+    Used by incremental refreshes that only fetched some players. The files
+    are loaded into a staging table of this run, then every row of those
+    players in the target table is replaced with the staged rows in one
+    transaction, and the staging table is dropped. The target is clustered
+    by element, so the delete only rewrites the blocks of those players.
+    Refreshed players without rows in this run lose their old rows too, and
+    if the run wrote no rows at all, only the delete runs.
+
+    Args:
+        project_id (str): GCP project ID
+        dataset_id (str): BigQuery dataset ID
+        bucket_name (str): GCS bucket name
+        source_folder (str): GCS folder holding this run's files
+        table_id (str): The target table, which must already exist
+        source_uris (Optional[List[str]]): The files to load, as listed in
+            the run's manifest, instead of every file of the table in the
+            folder
+        element_ids (Optional[List[int]]): The refreshed players, defaults
+            to the players in the files
+    """
+    from google.api_core.exceptions import NotFound
+
+    client = get_bigquery_client(project_id)
+    target = f"{project_id}.{dataset_id}.{table_id}"
+    layout = get_table_layout(table_id)
+    if source_uris is not None and not source_uris:
+        if element_ids:
+            client.query(layout.delete_sql(target, element_ids)).result()
+            logging.info(f"Deleted the {table_id} rows of {len(element_ids)}"
+                         f" players without rows in {source_folder}.")
+        return
+
+    staging = staging_table_id(target)
+    bucket_uri = source_uris or \
+        f"gs://{bucket_name}/{source_folder}/{table_id}_*.json"
+
+    try:
+        try:
+            load_job = load_gcs_to_staging_table(client, bucket_uri, staging)
+        except NotFound:
+            logging.info(f"No {table_id} files in {source_folder}, skipping "
+                         "merge.")
+            return
+        client.query(
+            layout.merge_sql(target, staging, element_ids)).result()
+    finally:
+        client.delete_table(staging, not_found_ok=True)
+    logging.info(
+        f"Merged {load_job.output_rows} rows into"
+        f" {dataset_id}:{table_id}.")
+
+
+def refresh_gameweek_aggregates(project_id: str,
+                                dataset_id: str,
+                                element_ids: Optional[List[int]] = None
+                                ) -> None:
+    """
+    Bring the per-gameweek aggregate tables up to date with the history
+    table.
+
+    They only read typed columns, so a refresh does not scan the JSON
+    payloads.
+
+    Args:
+        project_id (str): GCP project ID
+        dataset_id (str): BigQuery dataset ID
+        element_ids (Optional[List[int]]): Only re-aggregate these players,
+            after an incremental load. Every aggregate is rebuilt if unset.
+    """
+    client = get_bigquery_client(project_id)
+    dataset = f"{project_id}.{dataset_id}"
+    statements = aggregate_refresh_sql(dataset, element_ids)
+    for table_id, sql in statements.items():
+        client.query(sql).result()
+        logging.info(f"Refreshed aggregate table {dataset_id}:{table_id}.")
+
+
+def append_scd2_rows_from_gcs_to_bigquery(
+        project_id: str,
+        dataset_id: str,
+        source_uris: List[str],
+        table_id: str
+        ) -> None:
+    """
+    Append SCD type 2 records from GCS to a history table.
+
+    The table is created on first load, partitioned by day of valid_from
+    and clustered by id.
+
+    Args:
+        project_id (str): GCP project ID
+        dataset_id (str): BigQuery dataset ID
+        source_uris (List[str]): GCS URIs of the newline-delimited records
+        table_id (str): The history table
+    """
+    from google.cloud import bigquery
+
+    client = get_bigquery_client(project_id)
+    job_config = bigquery.LoadJobConfig(
+        source_format=bigquery.SourceFormat.NEWLINE_DELIMITED_JSON,
+        write_disposition=bigquery.WriteDisposition.WRITE_APPEND,
+        schema=[
+            bigquery.SchemaField("id", "INTEGER", mode="REQUIRED"),
+            bigquery.SchemaField("valid_from", "TIMESTAMP", mode="REQUIRED"),
+            bigquery.SchemaField("is_deleted", "BOOLEAN", mode="REQUIRED"),
+            bigquery.SchemaField("row_hash", "STRING"),
+            bigquery.SchemaField("data", "JSON"),
+        ],
+        time_partitioning=bigquery.TimePartitioning(field="valid_from"),
+        clustering_fields=["id"]
+    )
+    load_job = client.load_table_from_uri(
+        source_uris,
+        f"{project_id}.{dataset_id}.{table_id}",
+        job_config=job_config
+    )
+    load_job.result()
+    logging.info(
+        f"Appended {load_job.output_rows} rows to"
+        f" {dataset_id}:{table_id}.")
+
+
+def create_scd2_view(project_id: str, dataset_id: str, table_id: str) -> None:
+    """
+    Create or replace the view adding validity ranges to a history table.
+
+    The view is named after the table with its `_history` suffix replaced
+    by `_scd2`. Each version is valid until the next version of the same id,
+    and the current versions have a NULL valid_to. Deletions close the
+    previous version and are not listed themselves.
+
+    Args:
+        project_id (str): GCP project ID
+        dataset_id (str): BigQuery dataset ID
+        table_id (str): The history table
+    """
+    client = get_bigquery_client(project_id)
+    dataset = f"{project_id}.{dataset_id}"
+    view_id = f"{table_id.removesuffix('_history')}_scd2"
+    client.query(f"""
+        CREATE OR REPLACE VIEW `{dataset}.{view_id}` AS
+        SELECT id, valid_from, valid_to, valid_to IS NULL AS is_current, data
+        FROM (
+            SELECT
+                id,
+                valid_from,
+                LEAD(valid_from) OVER (
+                    PARTITION BY id ORDER BY valid_from) AS valid_to,
+                is_deleted,
+                data
+            FROM `{dataset}.{table_id}`
+        )
+        WHERE NOT is_deleted
+    """).result()
+
+
 if __name__ == "__main__":
-    import os
     from dotenv import load_dotenv
 
     logging.basicConfig(
@@ -0,0 +1,447 @@
+import os
+import uuid
+import logging
+import argparse
+from typing import List, Dict, Optional, Tuple
+
+
+class TableLayout:
+    """
+    Physical layout of an element summary table in BigQuery.
+
+    The raw payload of each row is kept in the `data` JSON column, and the
+    fields that queries filter and aggregate on are extracted next to it as
+    typed columns, so that those queries neither parse nor scan the JSON.
+
+    Attributes:
+        columns (List[Tuple[str, str, str]]): Typed columns as (name,
+            BigQuery type, key in the JSON payload)
+        partition_by (Optional[str]): PARTITION BY expression, if any
+        cluster_by (List[str]): Clustering columns
+    """
+
+    def __init__(self,
+                 columns: List[Tuple[str, str, str]],
+                 partition_by: Optional[str] = None,
+                 cluster_by: Optional[List[str]] = None
+                 ) -> None:
+        self.columns = columns
+        self.partition_by = partition_by
+        self.cluster_by = cluster_by or []
+
+    @property
+    def column_names(self) -> List[str]:
+        """Names of all columns of the table, in order."""
+        return ["element"] + [name for name, _, _ in self.columns] + ["data"]
+
+    def select_sql(self, source: str) -> str:
+        """
+        SELECT that extracts the typed columns from a staging table.
+
+        Args:
+            source (str): Fully qualified staging table holding the element
+                and data columns
+
+        Returns:
+            str: The SELECT statement
+        """
+        extracted = "".join(
+            f",\n    SAFE_CAST(JSON_VALUE(data, '$.{key}') AS {type_})"
+            f" AS {name}"
+            for name, type_, key in self.columns
+        )
+        return f"SELECT\n    element{extracted},\n    data\nFROM `{source}`"
+
+    def create_sql(self, target: str, source: str) -> str:
+        """
+        Statement that rebuilds a table from a staging table.
+
+        Args:
+            target (str): Fully qualified table to create or replace
+            source (str): Fully qualified staging table
+
+        Returns:
+            str: The CREATE OR REPLACE TABLE statement
+        """
+        options = ""
+        if self.partition_by:
+            options += f"\nPARTITION BY {self.partition_by}"
+        if self.cluster_by:
+            options += f"\nCLUSTER BY {', '.join(self.cluster_by)}"
+        return (f"CREATE OR REPLACE TABLE `{target}`{options}\n"
+                f"AS\n{self.select_sql(source)}")
+
+    @staticmethod
+    def delete_sql(target: str, element_ids: List[int]) -> str:
+        """
+        Statement that deletes the target rows of the given players.
+
+        Args:
+            target (str): Fully qualified table to update
+            element_ids (List[int]): The players, at least one
+
+        Returns:
+            str: The DELETE statement
+        """
+        elements = ", ".join(str(int(e)) for e in sorted(set(element_ids)))
+        return f"DELETE FROM `{target}`\nWHERE element IN ({elements})"
+
+    def merge_sql(self,
+                  target: str,
+                  source: str,
+                  element_ids: Optional[List[int]] = None
+                  ) -> str:
+        """
+        Script that replaces the target rows of the refreshed players with
+        the rows of a staging table.
+
+        The delete and insert run in one transaction, so a failed insert
+        rolls the delete back rather than leaving those players without
+        rows.
+
+        Args:
+            target (str): Fully qualified table to update
+            source (str): Fully qualified staging table
+            element_ids (Optional[List[int]]): The refreshed players, whose
+                rows are deleted along with those of the players in the
+                staging table even if they have no staged rows
+
+        Returns:
+            str: The DELETE and INSERT transaction
+        """
+        delete = (f"DELETE FROM `{target}`\n"
+                  f"WHERE element IN (SELECT DISTINCT element FROM "
+                  f"`{source}`)")
+        if element_ids:
+            elements = ", ".join(
+                str(int(e)) for e in sorted(set(element_ids)))
+            delete += f"\nOR element IN ({elements})"
+        return (
+            "BEGIN TRANSACTION;\n"
+            f"{delete};\n"
+            f"INSERT INTO `{target}` ({', '.join(self.column_names)})\n"
+            f"{self.select_sql(source)};\n"
+            "COMMIT TRANSACTION;"
+        )
+
+
+# Monthly partitions keep every partition well populated, while clustering
+# on round and element lets gameweek and player queries skip blocks
+TABLE_LAYOUTS: Dict[str, TableLayout] = {
+    "element_summary_fixtures": TableLayout(
+        columns=[
+            ("fixture", "INT64", "id"),
+            ("round", "INT64", "event"),
+            ("kickoff_time", "TIMESTAMP", "kickoff_time"),
+            ("was_home", "BOOL", "is_home"),
+            ("team_h", "INT64", "team_h"),
+            ("team_a", "INT64", "team_a"),
+            ("difficulty", "INT64", "difficulty"),
+            ("finished", "BOOL", "finished"),
+        ],
+        partition_by="TIMESTAMP_TRUNC(kickoff_time, MONTH)",
+        cluster_by=["round", "element"]
+    ),
+    "element_summary_history": TableLayout(
+        columns=[
+            ("fixture", "INT64", "fixture"),
+            ("round", "INT64", "round"),
+            ("kickoff_time", "TIMESTAMP", "kickoff_time"),
+            ("was_home", "BOOL", "was_home"),
+            ("opponent_team", "INT64", "opponent_team"),
+            ("minutes", "INT64", "minutes"),
+            ("total_points", "INT64", "total_points"),
+            ("goals_scored", "INT64", "goals_scored"),
+            ("assists", "INT64", "assists"),
+            ("clean_sheets", "INT64", "clean_sheets"),
+            ("bonus", "INT64", "bonus"),
+            ("bps", "INT64", "bps"),
+            ("value", "INT64", "value"),
+            ("selected", "INT64", "selected"),
+        ],
+        partition_by="TIMESTAMP_TRUNC(kickoff_time, MONTH)",
+        cluster_by=["round", "element"]
+    ),
+    "element_summary_history_past": TableLayout(
+        columns=[
+            ("season_name", "STRING", "season_name"),
+            ("element_code", "INT64", "element_code"),
+            ("start_cost", "INT64", "start_cost"),
+            ("end_cost", "INT64", "end_cost"),
+            ("total_points", "INT64", "total_points"),
+            ("minutes", "INT64", "minutes"),
+        ],
+        cluster_by=["season_name", "element"]
+    ),
+}
+
+
+def get_table_layout(table_id: str) -> TableLayout:
+    """
+    Return the layout of a table, defaulting to element and data only,
+    clustered by element.
+    """
+    return TABLE_LAYOUTS.get(
+        table_id, TableLayout(columns=[], cluster_by=["element"]))
+
+
+# Per-player, per-gameweek sums of the history table. {filter} narrows the
+# rows aggregated, e.g. to the players of an incremental load
+ELEMENT_GAMEWEEK_STATS_SELECT = """
+        SELECT
+            round,
+            element,
+            COUNT(*) AS matches,
+            SUM(minutes) AS minutes,
+            SUM(total_points) AS total_points,
+            SUM(goals_scored) AS goals_scored,
+            SUM(assists) AS assists,
+            SUM(clean_sheets) AS clean_sheets,
+            SUM(bonus) AS bonus,
+            MAX(value) AS value,
+            MAX(selected) AS selected
+        FROM `{dataset}.element_summary_history`
+        WHERE round IS NOT NULL{filter}
+        GROUP BY round, element
+"""
+
+# Per-gameweek aggregates rebuilt from the history table after full loads
+AGGREGATE_TABLES: Dict[str, str] = {
+    "element_gameweek_stats": """
+        CREATE OR REPLACE TABLE `{dataset}.element_gameweek_stats`
+        CLUSTER BY round, element
+        AS""" + ELEMENT_GAMEWEEK_STATS_SELECT,
+    "gameweek_summary": """
+        CREATE OR REPLACE TABLE `{dataset}.gameweek_summary`
+        CLUSTER BY round
+        AS
+        SELECT
+            round,
+            COUNT(*) AS players,
+            COUNTIF(minutes > 0) AS players_played,
+            SUM(total_points) AS total_points,
+            AVG(total_points) AS average_points,
+            MAX(total_points) AS highest_points
+        FROM `{dataset}.element_gameweek_stats`
+        GROUP BY round
+    """,
+}
+
+
+def aggregate_refresh_sql(dataset: str,
+                          element_ids: Optional[List[int]] = None
+                          ) -> Dict[str, str]:
+    """
+    Statements that bring the aggregate tables up to date with the history
+    table.
+
+    Without element_ids every aggregate table is rebuilt. With them, only
+    those players' rows of element_gameweek_stats are replaced, in one
+    transaction, so an incremental load does not aggregate the whole
+    history table again. gameweek_summary is still rebuilt, from
+    element_gameweek_stats only.
+
+    Args:
+        dataset (str): Fully qualified dataset, "project.dataset"
+        element_ids (Optional[List[int]]): Players whose history changed
+
+    Returns:
+        Dict[str, str]: Statement per aggregate table, in the order they
+            must run
+    """
+    statements = {table_id: sql.format(dataset=dataset, filter="")
+                  for table_id, sql in AGGREGATE_TABLES.items()}
+    if element_ids:
+        elements = ", ".join(str(int(e)) for e in sorted(set(element_ids)))
+        select = ELEMENT_GAMEWEEK_STATS_SELECT.format(
+            dataset=dataset, filter=f" AND element IN ({elements})")
+        statements["element_gameweek_stats"] = (
+            f"BEGIN TRANSACTION;\n"
+            f"DELETE FROM `{dataset}.element_gameweek_stats`\n"
+            f"WHERE element IN ({elements});\n"
+            f"INSERT INTO `{dataset}.element_gameweek_stats`"
+            f"{select.rstrip()};\n"
+            f"COMMIT TRANSACTION;"
+        )
+    return statements
+
+
+# How the element summary tables were laid out before the typed columns:
+# element and the JSON payload, range-partitioned one player per partition
+OLD_LAYOUT_SQL = """
+        CREATE TABLE `{target}`
+        PARTITION BY RANGE_BUCKET(element, GENERATE_ARRAY(1, 2000, 1))
+        OPTIONS (expiration_timestamp =
+            TIMESTAMP_ADD(CURRENT_TIMESTAMP(), INTERVAL 1 DAY))
+        AS
+        SELECT element, data
+        FROM `{source}`
+"""
+
+# Standard dashboard queries, as written against the old layout ({history}
+# and {fixtures}) and against the typed columns and aggregates
+DASHBOARD_QUERIES: Dict[str, Tuple[str, str]] = {
+    "gameweek_points": (
+        """
+        SELECT element,
+            SUM(CAST(JSON_VALUE(data, '$.total_points') AS INT64)) AS points
+        FROM `{history}`
+        WHERE CAST(JSON_VALUE(data, '$.round') AS INT64) = {gameweek}
+        GROUP BY element
+        """,
+        """
+        SELECT element, total_points AS points
+        FROM `{dataset}.element_gameweek_stats`
+        WHERE round = {gameweek}
+        """,
+    ),
+    "player_form": (
+        """
+        SELECT CAST(JSON_VALUE(data, '$.round') AS INT64) AS round,
+            CAST(JSON_VALUE(data, '$.total_points') AS INT64) AS points,
+            CAST(JSON_VALUE(data, '$.minutes') AS INT64) AS minutes
+        FROM `{history}`
+        WHERE element = {element}
+            AND CAST(JSON_VALUE(data, '$.round') AS INT64)
+                BETWEEN {gameweek} - 4 AND {gameweek}
+        """,
+        """
+        SELECT round, total_points AS points, minutes
+        FROM `{dataset}.element_summary_history`
+        WHERE element = {element}
+            AND round BETWEEN {gameweek} - 4 AND {gameweek}
+        """,
+    ),
+    "upcoming_fixtures": (
+        """
+        SELECT element,
+            CAST(JSON_VALUE(data, '$.difficulty') AS INT64) AS difficulty,
+            CAST(JSON_VALUE(data, '$.is_home') AS BOOL) AS is_home
+        FROM `{fixtures}`
+        WHERE CAST(JSON_VALUE(data, '$.event') AS INT64) = {gameweek} + 1
+        """,
+        """
+        SELECT element, difficulty, was_home AS is_home
+        FROM `{dataset}.element_summary_fixtures`
+        WHERE round = {gameweek} + 1
+        """,
+    ),
+    "gameweek_overview": (
+        """
+        SELECT CAST(JSON_VALUE(data, '$.round') AS INT64) AS round,
+            SUM(CAST(JSON_VALUE(data, '$.total_points') AS INT64)) AS points
+        FROM `{history}`
+        GROUP BY round
+        """,
+        """
+        SELECT round, total_points AS points
+        FROM `{dataset}.gameweek_summary`
+        """,
+    ),
+}
+
+
+def benchmark_dashboard_queries(
+        project_id: str,
+        dataset_id: str,
+        gameweek: int,
+        element: int = 1
+        ) -> Dict[str, Dict[str, int]]:
+    """
+    Report the bytes each dashboard query scans on the old layout and on
+    the current one.
+
+    The history and fixtures tables are first copied into the old layout,
+    element and JSON payload range-partitioned by player, so that the
+    "before" queries get the partition pruning they had then, e.g. the
+    player-scoped ones read a single partition. Creating the copies scans
+    both tables once, and they are dropped afterwards (or expire after a
+    day). The queries themselves are only dry-run. Dry runs account for
+    partition pruning but not cluster pruning, so the "after" figures are
+    an upper bound.
+
+    Args:
+        project_id (str): GCP project ID
+        dataset_id (str): BigQuery dataset ID
+        gameweek (int): Gameweek the queries are scoped to
+        element (int): Player the player-scoped queries are run for
+
+    Returns:
+        Dict[str, Dict[str, int]]: Bytes processed "before" and "after" for
+            each query
+    """
+    from google.cloud import bigquery
+    from etl.upload.bigquery import get_bigquery_client
+
+    client = get_bigquery_client(project_id)
+    job_config = bigquery.QueryJobConfig(dry_run=True, use_query_cache=False)
+    dataset = f"{project_id}.{dataset_id}"
+    suffix = f"_old_layout_{uuid.uuid4().hex[:12]}"
+    copies = {
+        "history": f"{dataset}.element_summary_history{suffix}",
+        "fixtures": f"{dataset}.element_summary_fixtures{suffix}",
+    }
+
+    results = {}
+    try:
+        for name, copy in copies.items():
+            client.query(OLD_LAYOUT_SQL.format(
+                target=copy,
+                source=f"{dataset}.element_summary_{name}")).result()
+        for name, queries in DASHBOARD_QUERIES.items():
+            scanned = {}
+            for label, sql in zip(("before", "after"), queries):
+                job = client.query(
+                    sql.format(dataset=dataset, gameweek=gameweek,
+                               element=element, **copies),
+                    job_config=job_config
+                )
+                scanned[label] = job.total_bytes_processed
+            results[name] = scanned
+            logging.info(
+                "%s: %d bytes before, %d bytes after", name,
+                scanned["before"], scanned["after"])
+    finally:
+        for copy in copies.values():
+            client.delete_table(copy, not_found_ok=True)
+    return results
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s [%(levelname)s] %(message)s",
+    )
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(
+        description="Report bytes scanned by the dashboard queries on the"
+                    " old and the current table layout.")
+    parser.add_argument(
+        "--gameweek",
+        type=int,
+        required=True,
+        help="The gameweek the dashboard queries are scoped to"
+    )
+    parser.add_argument(
+        "--element",
+        type=int,
+        default=1,
+        help="The player the player-scoped queries are run for"
+    )
+    args = parser.parse_args()
+
+    results = benchmark_dashboard_queries(
+        project_id=os.getenv("PROJECT_ID"),
+        dataset_id=os.getenv("DATASET_ID"),
+        gameweek=args.gameweek,
+        element=args.element
+    )
+    print(f"{'query':<20}{'old layout':>15}{'new layout':>15}{'saved':>8}")
+    for name, scanned in results.items():
+        saved = 1 - scanned["after"] / scanned["before"] \
+            if scanned["before"] else 0
+        print(f"{name:<20}{scanned['before']:>15,}{scanned['after']:>15,}"
+              f"{saved:>8.0%}")
@@ -0,0 +1,446 @@
+import os
+import json
+import logging
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import Future, ThreadPoolExecutor
+from importlib.util import find_spec
+from typing import List, Dict, Set, Any, Optional
+
+from etl.upload.storage import (
+    delete_folder_from_gcs,
+    encode_ndjson,
+    upload_bytes_to_gcs
+)
+from etl.upload.bigquery import (
+    append_scd2_rows_from_gcs_to_bigquery,
+    create_scd2_view,
+    merge_element_summary_from_gcs_to_bigquery,
+    refresh_gameweek_aggregates,
+    upload_element_summary_from_gcs_to_bigquery
+)
+from etl.utils.concurrency import (
+    AdaptiveConcurrencyLimiter,
+    gcs_upload_limiter
+)
+
+SINKS = ["gcs", "local", "null"]
+
+
+class Sink(ABC):
+    """
+    Destination of the tables produced by a pipeline run.
+
+    A sink is created per run: write() stores one part of a table, e.g. the
+    rows of one team, and load() makes the parts written to a folder
+    queryable once all of them are written. load_history() instead appends
+    SCD type 2 records to history tables. close() releases the sink once
+    the run ends, whether or not it loaded anything, and a sink can be
+    used as a context manager to that end. Rows, bytes and parts written
+    are counted per table for the run report.
+
+    Attributes:
+        name (str): Name the sink is selected by
+        stats (Dict[str, Dict[str, int]]): Rows, bytes and parts written to
+            each table
+    """
+
+    name = "sink"
+
+    def __init__(self) -> None:
+        self.stats: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def write(self,
+              folder: str,
+              table_id: str,
+              part: Any,
+              rows: List[Dict[str, Any]]
+              ) -> None:
+        """
+        Store one part of a table.
+
+        Args:
+            folder (str): Folder of the run's tables
+            table_id (str): The table
+            part (Any): Identifies the part within the table, e.g. a team ID
+            rows (List[Dict[str, Any]]): The rows of the part
+        """
+        size = self._write(folder, table_id, part, rows)
+        with self._lock:
+            table_stats = self.stats.setdefault(
+                table_id, {"rows": 0, "bytes": 0, "parts": 0})
+            table_stats["rows"] += len(rows)
+            table_stats["bytes"] += size
+            table_stats["parts"] += 1
+
+    @abstractmethod
+    def _write(self,
+               folder: str,
+               table_id: str,
+               part: Any,
+               rows: List[Dict[str, Any]]
+               ) -> int:
+        """Store the rows and return the number of bytes written."""
+
+    def load(self,
+             folder: str,
+             table_ids: List[str],
+             incremental: bool = False,
+             element_ids: Optional[List[int]] = None
+             ) -> None:
+        """
+        Make the tables written to a folder queryable.
+
+        Args:
+            folder (str): Folder of the run's tables
+            table_ids (List[str]): The tables to load
+            incremental (bool): Replace only the rows of the refreshed
+                players instead of the whole tables
+            element_ids (Optional[List[int]]): The players an incremental
+                load refreshed, whose old rows are replaced even in tables
+                they wrote no rows to. Defaults to the players written.
+        """
+
+    def load_history(self, folder: str, table_ids: List[str]) -> None:
+        """
+        Append the SCD type 2 records written to a folder to their history
+        tables. The sink can still be written to afterwards.
+
+        Args:
+            folder (str): Folder of the run's records
+            table_ids (List[str]): The history tables to append to
+        """
+
+    def close(self) -> None:
+        """Release the resources of the sink. Safe to call more than once."""
+
+    def __enter__(self) -> 'Sink':
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def totals(self) -> Dict[str, int]:
+        """Return the rows and bytes written to all tables."""
+        with self._lock:
+            return {
+                "rows": sum(t["rows"] for t in self.stats.values()),
+                "bytes": sum(t["bytes"] for t in self.stats.values()),
+            }
+
+
+class GcsBigQuerySink(Sink):
+    """
+    Uploads the tables as newline-delimited JSON to GCS and loads them from
+    GCS into BigQuery.
+
+    The parts of each table are batched into objects of about object_bytes
+    rather than uploaded one by one. A full batch is handed to a pool of
+    upload threads, so uploads overlap with fetching, and the limiter tunes
+    how many of them upload at once. load()
+    uploads the remaining batches, writes the objects of every table to
+    `_manifest.json` in the run folder, and loads each table from exactly
+    those objects. The aggregate tables are rebuilt after a full load, and
+    only the rows of the written players are re-aggregated after an
+    incremental one. The folder of an incremental load is deleted once it
+    is merged, as every incremental run writes to a folder of its own.
+
+    Attributes:
+        project_id (str): GCP project ID
+        bucket_name (str): GCS bucket name
+        dataset_id (str): BigQuery dataset ID
+        object_bytes (int): Size at which a batch is uploaded as an object
+        manifest (Dict[str, List[Dict[str, Any]]]): URI, rows and bytes of
+            every uploaded object of each table
+    """
+
+    name = "gcs"
+
+    def __init__(self,
+                 project_id: str,
+                 bucket_name: str,
+                 dataset_id: str,
+                 object_bytes: int = 16 * 1024 * 1024,
+                 limiter: Optional[AdaptiveConcurrencyLimiter] = None
+                 ) -> None:
+        super().__init__()
+        self.project_id = project_id
+        self.bucket_name = bucket_name
+        self.dataset_id = dataset_id
+        self.object_bytes = object_bytes
+        self.manifest: Dict[str, List[Dict[str, Any]]] = {}
+        self._batches: Dict[str, List[bytes]] = {}
+        self._batch_rows: Dict[str, int] = {}
+        self._batch_bytes: Dict[str, int] = {}
+        self._objects: Dict[str, int] = {}
+        self._uploads: List[Future] = []
+        self._history_elements: Set[int] = set()
+        self._batch_lock = threading.Lock()
+        self.limiter = limiter or gcs_upload_limiter
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.limiter.max_limit,
+            thread_name_prefix="gcs-upload")
+
+    def _write(self,
+               folder: str,
+               table_id: str,
+               part: Any,
+               rows: List[Dict[str, Any]]
+               ) -> int:
+        data = encode_ndjson(rows)
+        with self._batch_lock:
+            if table_id == "element_summary_history":
+                self._history_elements.update(row["element"] for row in rows)
+            self._batches.setdefault(table_id, []).append(data)
+            self._batch_rows[table_id] = \
+                self._batch_rows.get(table_id, 0) + len(rows)
+            self._batch_bytes[table_id] = \
+                self._batch_bytes.get(table_id, 0) + len(data) + 1
+            if self._batch_bytes[table_id] >= self.object_bytes:
+                self._submit_batch(folder, table_id)
+        return len(data)
+
+    def _submit_batch(self, folder: str, table_id: str) -> None:
+        """Start uploading a table's batch. Called with the lock held."""
+        chunks = self._batches.pop(table_id, [])
+        rows = self._batch_rows.pop(table_id, 0)
+        self._batch_bytes.pop(table_id, None)
+        if not chunks:
+            return
+        number = self._objects.get(table_id, 0)
+        self._objects[table_id] = number + 1
+        blob_name = f"{folder}/{table_id}_{number:03d}.json"
+        self._uploads.append(self._executor.submit(
+            self._upload, table_id, blob_name, b"\n".join(chunks), rows))
+
+    def _upload(self,
+                table_id: str,
+                blob_name: str,
+                data: bytes,
+                rows: int
+                ) -> None:
+        with self.limiter.slot():
+            upload_bytes_to_gcs(
+                bucket_name=self.bucket_name,
+                blob_name=blob_name,
+                data=data,
+                content_type="application/json"
+            )
+        with self._batch_lock:
+            self.manifest.setdefault(table_id, []).append({
+                "uri": f"gs://{self.bucket_name}/{blob_name}",
+                "rows": rows,
+                "bytes": len(data),
+            })
+
+    def flush(self, folder: str) -> None:
+        """
+        Upload the remaining batches, wait for every upload, and write the
+        manifest of the run folder.
+
+        Args:
+            folder (str): Folder of the run's tables
+
+        Raises:
+            Exception: The first upload error, if any upload failed
+        """
+        with self._batch_lock:
+            for table_id in list(self._batches):
+                self._submit_batch(folder, table_id)
+            uploads, self._uploads = self._uploads, []
+        for upload in uploads:
+            upload.result()
+        for objects in self.manifest.values():
+            objects.sort(key=lambda o: o["uri"])
+        manifest = json.dumps({"tables": self.manifest}, indent=2)
+        upload_bytes_to_gcs(
+            bucket_name=self.bucket_name,
+            blob_name=f"{folder}/_manifest.json",
+            data=manifest.encode("utf-8"),
+            content_type="application/json"
+        )
+
+    def load(self,
+             folder: str,
+             table_ids: List[str],
+             incremental: bool = False,
+             element_ids: Optional[List[int]] = None
+             ) -> None:
+        try:
+            self.flush(folder)
+        finally:
+            self.close()
+        if incremental and element_ids is None:
+            element_ids = sorted(self._history_elements)
+        loaded = []
+        for table_id in table_ids:
+            source_uris = [o["uri"] for o in self.manifest.get(table_id, [])]
+            if incremental and (source_uris or element_ids):
+                logging.info(f"Merging {len(source_uris)} objects of table "
+                             f"{table_id} into BigQuery...")
+                merge_element_summary_from_gcs_to_bigquery(
+                    project_id=self.project_id,
+                    dataset_id=self.dataset_id,
+                    bucket_name=self.bucket_name,
+                    source_folder=folder,
+                    table_id=table_id,
+                    source_uris=source_uris,
+                    element_ids=element_ids
+                )
+            elif source_uris:
+                logging.info(f"Loading {len(source_uris)} objects of table "
+                             f"{table_id} into BigQuery...")
+                upload_element_summary_from_gcs_to_bigquery(
+                    project_id=self.project_id,
+                    dataset_id=self.dataset_id,
+                    bucket_name=self.bucket_name,
+                    source_folder=folder,
+                    table_id=table_id,
+                    source_uris=source_uris
+                )
+            else:
+                logging.info(f"No {table_id} objects in {folder}, skipping.")
+                continue
+            loaded.append(table_id)
+        if incremental:
+            self._delete_folder(folder)
+        if "element_summary_history" not in loaded:
+            return
+        refresh_gameweek_aggregates(
+            self.project_id, self.dataset_id,
+            element_ids=sorted(set(element_ids) | self._history_elements)
+            if incremental else None)
+
+    def load_history(self, folder: str, table_ids: List[str]) -> None:
+        self.flush(folder)
+        for table_id in table_ids:
+            source_uris = [o["uri"] for o in self.manifest.get(table_id, [])]
+            if not source_uris:
+                continue
+            append_scd2_rows_from_gcs_to_bigquery(
+                project_id=self.project_id,
+                dataset_id=self.dataset_id,
+                source_uris=source_uris,
+                table_id=table_id
+            )
+            create_scd2_view(self.project_id, self.dataset_id, table_id)
+
+    def close(self) -> None:
+        """Stop the upload threads, cancelling uploads not yet started."""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def _delete_folder(self, folder: str) -> None:
+        """Delete a merged folder, logging rather than raising on failure."""
+        try:
+            deleted = delete_folder_from_gcs(self.bucket_name, folder)
+            logging.info(f"Deleted {deleted} merged objects in {folder}.")
+        except Exception as e:
+            logging.warning(f"Could not delete merged folder {folder}: {e}")
+
+
+class LocalSink(Sink):
+    """
+    Writes each part to a local directory as newline-delimited JSON, or as
+    Parquet if pyarrow is installed. Nothing is loaded anywhere.
+
+    Attributes:
+        root_dir (str): Directory the run folders are created in
+        file_format (str): "ndjson" or "parquet"
+    """
+
+    name = "local"
+
+    def __init__(self, root_dir: str, file_format: str = "ndjson") -> None:
+        super().__init__()
+        if file_format not in ("ndjson", "parquet"):
+            raise ValueError(f"Unsupported file format: {file_format}")
+        if file_format == "parquet" and find_spec("pyarrow") is None:
+            raise ValueError("Writing Parquet requires pyarrow")
+        self.root_dir = root_dir
+        self.file_format = file_format
+
+    def _write(self,
+               folder: str,
+               table_id: str,
+               part: Any,
+               rows: List[Dict[str, Any]]
+               ) -> int:
+        directory = os.path.join(self.root_dir, folder)
+        os.makedirs(directory, exist_ok=True)
+        if self.file_format == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            path = os.path.join(directory, f"{table_id}_{part}.parquet")
+            # Nested payloads are kept as JSON strings, like BigQuery's JSON
+            # columns, as their keys differ between rows
+            pq.write_table(pa.Table.from_pylist([
+                {k: json.dumps(v) if isinstance(v, (dict, list)) else v
+                 for k, v in row.items()}
+                for row in rows
+            ]), path)
+        else:
+            path = os.path.join(directory, f"{table_id}_{part}.json")
+            with open(path, "wb") as f:
+                f.write(encode_ndjson(rows))
+        return os.path.getsize(path)
+
+
+class NullSink(Sink):
+    """
+    Encodes the rows to measure their size, then discards them.
+    """
+
+    name = "null"
+
+    def _write(self,
+               folder: str,
+               table_id: str,
+               part: Any,
+               rows: List[Dict[str, Any]]
+               ) -> int:
+        return len(encode_ndjson(rows))
+
+
+def get_sink(name: Optional[str] = None,
+             project_id: Optional[str] = None,
+             bucket_name: Optional[str] = None,
+             dataset_id: Optional[str] = None
+             ) -> Sink:
+    """
+    Build a sink for one pipeline run.
+
+    Args:
+        name (Optional[str]): One of SINKS, defaults to SINK or "gcs"
+        project_id (Optional[str]): GCP project ID of the gcs sink
+        bucket_name (Optional[str]): GCS bucket name of the gcs sink
+        dataset_id (Optional[str]): BigQuery dataset ID of the gcs sink
+
+    Returns:
+        Sink: The sink. The gcs sink batches objects of SINK_OBJECT_BYTES
+            (default 16 MiB). The local sink writes to SINK_DIR (default
+            "output") in SINK_FORMAT (default "ndjson").
+
+    Raises:
+        ValueError: If the sink is unknown, or the gcs sink is missing its
+            GCP settings
+    """
+    name = name or os.getenv("SINK", "gcs")
+    if name == "gcs":
+        if not (project_id and bucket_name and dataset_id):
+            raise ValueError(
+                "The gcs sink needs a project, bucket and dataset")
+        return GcsBigQuerySink(
+            project_id, bucket_name, dataset_id,
+            object_bytes=int(os.getenv(
+                "SINK_OBJECT_BYTES", str(16 * 1024 * 1024)))
+        )
+    if name == "local":
+        return LocalSink(
+            root_dir=os.getenv("SINK_DIR", "output"),
+            file_format=os.getenv("SINK_FORMAT", "ndjson")
+        )
+    if name == "null":
+        return NullSink()
+    raise ValueError(f"Unknown sink: {name}, expected one of {SINKS}")
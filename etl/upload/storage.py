@@ -1,11 +1,105 @@
-from google.cloud import storage
+import os
 import json
+from functools import lru_cache
+from typing import Any, Iterable, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from google.cloud import storage
+
+
+@lru_cache(maxsize=None)
+def get_storage_client() -> 'storage.Client':
+    """
+    Return this process's Cloud Storage client, creating it on first use.
+
+    The google.cloud.storage import is deferred to here so that importing the
+    upload modules does not slow down application start up.
+    """
+    from google.cloud import storage
+
+    return storage.Client()
+
+
+# Clients hold connection pools that must not be shared with forked workers
+os.register_at_fork(after_in_child=get_storage_client.cache_clear)
+
+
+def encode_ndjson(records: Iterable[Any]) -> bytes:
+    """Encodes records as newline-delimited JSON."""
+    return "\n".join(json.dumps(record) for record in records).encode("utf-8")
 
 
 def upload_json_to_gcs(bucket_name: str, blob_name: str, data: dict) -> None:
     """Uploads a JSON object to a specified GCS bucket."""
-    client = storage.Client()
+    client = get_storage_client()
+    bucket = client.bucket(bucket_name)
+    blob = bucket.blob(blob_name)
+    blob.upload_from_string(encode_ndjson(data),
+                            content_type="application/json")
+
+
+def upload_bytes_to_gcs(
+        bucket_name: str,
+        blob_name: str,
+        data: bytes,
+        content_type: str = "application/octet-stream"
+        ) -> None:
+    """Uploads raw bytes to a specified GCS bucket."""
+    client = get_storage_client()
     bucket = client.bucket(bucket_name)
     blob = bucket.blob(blob_name)
-    ndjson_content = "\n".join(json.dumps(record) for record in data)
-    blob.upload_from_string(ndjson_content, content_type="application/json")
+    blob.upload_from_string(data, content_type=content_type)
+
+
+def download_bytes_from_gcs(
+        bucket_name: str,
+        blob_name: str
+        ) -> Optional[bytes]:
+    """Downloads an object from GCS, returning None if it does not exist."""
+    from google.api_core.exceptions import NotFound
+
+    client = get_storage_client()
+    blob = client.bucket(bucket_name).blob(blob_name)
+    try:
+        return blob.download_as_bytes()
+    except NotFound:
+        return None
+
+
+def delete_folder_from_gcs(bucket_name: str, folder: str) -> int:
+    """Deletes every object under a folder, returning how many there were."""
+    client = get_storage_client()
+    blobs = list(client.list_blobs(bucket_name, prefix=f"{folder}/"))
+    if blobs:
+        client.bucket(bucket_name).delete_blobs(blobs)
+    return len(blobs)
+
+
+def read_bytes(path: str) -> Optional[bytes]:
+    """Reads a local file or gs:// object, returning None if missing."""
+    if path.startswith("gs://"):
+        bucket_name, _, blob_name = path[len("gs://"):].partition("/")
+        return download_bytes_from_gcs(bucket_name, blob_name)
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def write_bytes(
+        path: str,
+        data: bytes,
+        content_type: str = "application/octet-stream"
+        ) -> None:
+    """Writes a local file atomically, or a gs:// object."""
+    if path.startswith("gs://"):
+        bucket_name, _, blob_name = path[len("gs://"):].partition("/")
+        upload_bytes_to_gcs(bucket_name, blob_name, data, content_type)
+        return
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
@@ -0,0 +1,325 @@
+import os
+import math
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Deque, Iterator, List, Optional
+
+
+def process_cpu_usage() -> Callable[[], Optional[float]]:
+    """
+    Return a function that reports the share of the available CPUs this
+    process used since it was last called.
+    """
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") \
+        else os.cpu_count() or 1
+    last = [time.monotonic(), time.process_time()]
+
+    def usage() -> Optional[float]:
+        now, cpu = time.monotonic(), time.process_time()
+        elapsed = now - last[0]
+        used = (cpu - last[1]) / (elapsed * cpus) if elapsed > 0 else None
+        last[0], last[1] = now, cpu
+        return used
+
+    return usage
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Limits the number of requests in flight and tunes the limit from the
+    latency, errors and CPU usage it observes.
+
+    Completed requests are collected in windows of at least `min_window`
+    requests (and at least the current limit). A window carries over from
+    one run to the next, so limiters that see few requests per run, such
+    as the upload limiter, still adjust every few runs. Throughput is
+    measured over the time requests were in flight, so the idle time
+    between runs does not count. At the end of each window
+    the limit moves by the gradient between the latency target and the
+    window's average latency, plus a growth allowance of sqrt(limit):
+
+        new limit = limit * min(1, max(0.5, target / latency)) + sqrt(limit)
+
+    so it keeps growing while latency stays under the target and shrinks
+    by up to half once requests start queueing upstream. The target is
+    `latency_target`, or `tolerance` times a slowly moving baseline of the
+    window latencies if not set. Besides the gradient:
+
+    - an error rate above `max_error_rate` halves the limit,
+    - CPU usage above `max_cpu` stops the limit from growing, since more
+      requests in flight would only queue locally,
+    - the limit does not grow while the requests in flight, by Little's law
+      throughput times latency, stay under half the limit, as it is not
+      what holds the throughput back.
+
+    Changes are smoothed and logged with the figures that led to them.
+    Safe to share between threads and event loops.
+
+    Attributes:
+        name (str): Name the decisions are logged under
+        limit (int): Current number of requests allowed in flight
+        min_limit (int): Lowest limit
+        max_limit (int): Highest limit
+        latency_target (Optional[float]): Target latency in seconds
+    """
+
+    def __init__(self,
+                 name: str,
+                 initial_limit: int = 8,
+                 min_limit: int = 1,
+                 max_limit: int = 64,
+                 latency_target: Optional[float] = None,
+                 tolerance: float = 1.5,
+                 max_error_rate: float = 0.05,
+                 max_cpu: float = 0.9,
+                 min_window: int = 10,
+                 smoothing: float = 0.2,
+                 cpu_usage: Optional[Callable[[], Optional[float]]] = None
+                 ) -> None:
+        """
+        Initialize the AdaptiveConcurrencyLimiter.
+
+        Args:
+            name (str): Name the decisions are logged under
+            initial_limit (int): Limit before any request completed
+            min_limit (int): Lowest limit
+            max_limit (int): Highest limit
+            latency_target (Optional[float]): Target latency in seconds,
+                derived from the observed latency if not set
+            tolerance (float): Latency increase over the baseline tolerated
+                when no target is set
+            max_error_rate (float): Error rate above which the limit halves
+            max_cpu (float): CPU usage above which the limit stops growing
+            min_window (int): Fewest requests per adjustment
+            smoothing (float): Weight of each new limit in the smoothed one
+            cpu_usage (Optional[Callable[[], Optional[float]]]): Reports the
+                CPU usage since its previous call, defaults to this
+                process's usage
+        """
+        self.name = name
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.tolerance = tolerance
+        self.max_error_rate = max_error_rate
+        self.max_cpu = max_cpu
+        self.min_window = min_window
+        self.smoothing = smoothing
+        self.cpu_usage = cpu_usage or process_cpu_usage()
+        self._initial_limit = initial_limit
+        self._lock = threading.Lock()
+        self._waiters: Deque[Callable[[], None]] = deque()
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget the observations and return to the initial limit."""
+        with self._lock:
+            self._estimate = float(min(max(
+                self._initial_limit, self.min_limit), self.max_limit))
+            self.limit = int(self._estimate)
+            self.in_flight = 0
+            self._baseline: Optional[float] = None
+            self._start_window(time.monotonic())
+            grants = self._wake()
+        self._grant(grants)
+
+    def _start_window(self, now: float) -> None:
+        self._busy = 0.0
+        self._busy_since = now
+        self._samples = 0
+        self._errors = 0
+        self._latency_sum = 0.0
+
+    def _occupy(self) -> None:
+        """Take a slot. Called with the lock held."""
+        if self.in_flight == 0:
+            self._busy_since = time.monotonic()
+        self.in_flight += 1
+
+    def _vacate(self) -> None:
+        """Give a slot back. Called with the lock held."""
+        self.in_flight -= 1
+        if self.in_flight == 0:
+            self._busy += time.monotonic() - self._busy_since
+
+    def _wake(self) -> List[Callable[[], None]]:
+        """
+        Take the free slots for waiters. Called with the lock held.
+
+        Returns:
+            List[Callable[[], None]]: The waiters' grants, to be called by
+                _grant once the lock is released
+        """
+        grants = []
+        while self._waiters and self.in_flight < self.limit:
+            self._occupy()
+            grants.append(self._waiters.popleft())
+        return grants
+
+    def _grant(self, grants: List[Callable[[], None]]) -> None:
+        """Hand slots taken by _wake to their waiters, giving back the slot
+        of any waiter that cannot be reached, e.g. as its loop closed."""
+        for grant in grants:
+            try:
+                grant()
+            except Exception as e:
+                logging.warning("%s could not grant a slot: %s", self.name, e)
+                self._free_slot()
+
+    def _try_acquire(self, grant: Callable[[], None]) -> bool:
+        with self._lock:
+            if self.in_flight < self.limit and not self._waiters:
+                self._occupy()
+                return True
+            self._waiters.append(grant)
+            return False
+
+    def _cancel(self, grant: Callable[[], None]) -> bool:
+        """Withdraw a waiter, returning False if it was granted a slot."""
+        with self._lock:
+            try:
+                self._waiters.remove(grant)
+                return True
+            except ValueError:
+                return False
+
+    def _free_slot(self) -> None:
+        with self._lock:
+            self._vacate()
+            grants = self._wake()
+        self._grant(grants)
+
+    def acquire(self) -> None:
+        """Wait for a slot."""
+        event = threading.Event()
+        if not self._try_acquire(event.set):
+            event.wait()
+
+    async def acquire_async(self) -> None:
+        """Wait for a slot without blocking the running event loop."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def grant_on_loop() -> None:
+            if future.cancelled():
+                self._free_slot()
+            else:
+                future.set_result(None)
+
+        def grant() -> None:
+            loop.call_soon_threadsafe(grant_on_loop)
+
+        if self._try_acquire(grant):
+            return
+        try:
+            await future
+        except asyncio.CancelledError:
+            if not self._cancel(grant) and future.done() \
+                    and not future.cancelled():
+                self._free_slot()
+            raise
+
+    def release(self, latency: float, ok: bool = True) -> None:
+        """
+        Free a slot and record how the request went.
+
+        Args:
+            latency (float): Seconds the request took
+            ok (bool): False if the request failed in a way that suggests
+                the upstream is overloaded
+        """
+        with self._lock:
+            self._vacate()
+            self._samples += 1
+            self._errors += 0 if ok else 1
+            self._latency_sum += latency
+            if self._samples >= max(self.min_window, self.limit):
+                self._adjust()
+            grants = self._wake()
+        self._grant(grants)
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """Hold a slot for the enclosed block, recording its latency."""
+        self.acquire()
+        start = time.perf_counter()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            self.release(time.perf_counter() - start, ok)
+
+    def _adjust(self) -> None:
+        """Move the limit at the end of a window. Called with the lock held."""
+        now = time.monotonic()
+        busy = self._busy
+        if self.in_flight:
+            busy += now - self._busy_since
+        elapsed = max(busy, 1e-6)
+        latency = self._latency_sum / self._samples
+        error_rate = self._errors / self._samples
+        throughput = self._samples / elapsed
+        # Little's law: average requests in flight during the window
+        concurrency = throughput * latency
+        cpu = self.cpu_usage()
+        self._start_window(now)
+
+        self._baseline = latency if self._baseline is None \
+            else min(0.9 * self._baseline + 0.1 * latency, 2 * latency)
+        target = self.latency_target or self._baseline * self.tolerance
+
+        limit = self._estimate
+        if error_rate > self.max_error_rate:
+            proposed, reason = limit / 2, "errors"
+        else:
+            gradient = min(1.0, max(0.5, target / latency))
+            proposed = limit * gradient + math.sqrt(limit)
+            reason = "latency over target" if gradient < 1 else "headroom"
+            if proposed > limit and cpu is not None and cpu > self.max_cpu:
+                proposed, reason = limit, "cpu saturated"
+            elif proposed > limit and concurrency < limit / 2:
+                proposed, reason = limit, "limit not reached"
+
+        self._estimate = min(max(
+            (1 - self.smoothing) * limit + self.smoothing * proposed,
+            self.min_limit), self.max_limit)
+        previous, self.limit = self.limit, int(self._estimate)
+
+        log = logging.info if self.limit != previous else logging.debug
+        log(
+            "%s concurrency %d -> %d (%s): latency %.0f ms, target %.0f ms,"
+            " %.1f/s, errors %.1f%%, cpu %s, in flight %.1f",
+            self.name, previous, self.limit, reason, latency * 1000,
+            target * 1000, throughput, error_rate * 100,
+            "n/a" if cpu is None else f"{cpu:.0%}", concurrency
+        )
+
+
+def _latency_target(variable: str) -> Optional[float]:
+    milliseconds = os.getenv(variable)
+    return float(milliseconds) / 1000 if milliseconds else None
+
+
+# Requests to the FPL API in flight across all fetchers of this process
+fpl_request_limiter = AdaptiveConcurrencyLimiter(
+    name="fpl_requests",
+    initial_limit=int(os.getenv("FETCH_CONCURRENCY_INITIAL", "16")),
+    min_limit=int(os.getenv("FETCH_CONCURRENCY_MIN", "2")),
+    max_limit=int(os.getenv("FETCH_CONCURRENCY_MAX", "128")),
+    latency_target=_latency_target("FETCH_LATENCY_TARGET_MS")
+)
+
+# Objects uploaded to GCS at once by the sinks of this process
+gcs_upload_limiter = AdaptiveConcurrencyLimiter(
+    name="gcs_uploads",
+    initial_limit=int(os.getenv("UPLOAD_CONCURRENCY_INITIAL", "4")),
+    min_limit=1,
+    max_limit=int(os.getenv("UPLOAD_CONCURRENCY_MAX", "16")),
+    latency_target=_latency_target("UPLOAD_LATENCY_TARGET_MS"),
+    min_window=1
+)
@@ -0,0 +1,291 @@
+import os
+import sys
+import json
+import time
+import logging
+import threading
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import List, Dict, Optional, Any, Iterator, Tuple
+
+
+# Python frames that threads idle in, waiting on a lock, queue, selector or
+# socket rather than running, as (module, function)
+IDLE_FRAMES = {
+    ("threading", "wait"),
+    ("threading", "_wait_for_tstate_lock"),
+    ("queue", "get"),
+    ("selectors", "select"),
+    ("socket", "accept"),
+    # A thread pool worker waiting for its next task
+    ("thread", "_worker"),
+}
+
+# Profiled stages running in the process, and whether tracemalloc was
+# started by them rather than already running
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+_tracing_owned = False
+
+
+def _start_tracing() -> None:
+    """Start tracemalloc unless it is already running."""
+    global _tracing_users, _tracing_owned
+
+    with _tracing_lock:
+        if _tracing_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracing_owned = True
+        _tracing_users += 1
+
+
+def _stop_tracing() -> None:
+    """Stop tracemalloc once the last stage that started it ends."""
+    global _tracing_users, _tracing_owned
+
+    with _tracing_lock:
+        _tracing_users -= 1
+        if _tracing_users == 0 and _tracing_owned:
+            tracemalloc.stop()
+            _tracing_owned = False
+
+
+class StackSampler:
+    """
+    Sampling wall-clock profiler of the threads of the process.
+
+    A background thread captures every other thread's stack at a fixed
+    interval and counts them in folded-stack format ("root;caller;leaf"),
+    which flamegraph.pl, speedscope and similar tools read directly.
+
+    Stacks whose innermost Python frame is in IDLE_FRAMES are skipped, so
+    idle pool threads and event loops waiting on their selector do not
+    drown the samples. Threads blocked in C code, e.g. on a socket read or
+    in time.sleep(), are still sampled, and so are the threads of anything
+    else the process runs at the same time, such as concurrent requests:
+    the samples show where the process spent wall-clock time, not CPU time.
+
+    Attributes:
+        interval (float): Seconds between samples
+        stacks (Counter): Sample count of each folded stack
+    """
+
+    def __init__(self, interval: float = 0.01) -> None:
+        """
+        Initialize the StackSampler.
+
+        Args:
+            interval (float): Seconds between samples
+        """
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.label = ""
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def _frame_name(frame) -> str:
+        code = frame.f_code
+        module = os.path.splitext(os.path.basename(code.co_filename))[0]
+        return f"{module}:{code.co_name}:{code.co_firstlineno}"
+
+    @staticmethod
+    def _frame_key(frame) -> Tuple[str, str]:
+        code = frame.f_code
+        module = os.path.splitext(os.path.basename(code.co_filename))[0]
+        return module, code.co_name
+
+    def _sample(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id or (
+                        self._frame_key(frame) in IDLE_FRAMES):
+                    continue
+                names = []
+                while frame is not None:
+                    names.append(self._frame_name(frame))
+                    frame = frame.f_back
+                if self.label:
+                    names.append(self.label)
+                self.stacks[";".join(reversed(names))] += 1
+
+    def start(self) -> None:
+        """Start sampling in a background thread."""
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._sample, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop sampling."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def folded(self) -> str:
+        """Return the samples in folded-stack format."""
+        return "\n".join(f"{stack} {count}"
+                         for stack, count in self.stacks.most_common())
+
+
+class PipelineProfiler:
+    """
+    Opt-in CPU and memory profiler for the stages of a pipeline run.
+
+    Each stage is sampled by a StackSampler, with the stage name as the root
+    frame of its stacks, and bracketed by tracemalloc snapshots to find the
+    lines that allocated the most memory and the peak traced memory. When
+    disabled, stage() only times the stage.
+
+    tracemalloc traces the whole process, so it is started by the first
+    profiled stage and stopped by the last one still running. Stages of
+    concurrent runs reset each other's peak and share their allocations.
+
+    Attributes:
+        enabled (bool): Whether profiling is enabled
+        top_n (int): Number of top allocators reported per stage
+        stages (List[Dict[str, Any]]): Report of each completed stage
+        durations (Dict[str, float]): Seconds taken by each completed stage
+    """
+
+    def __init__(self,
+                 enabled: bool = False,
+                 interval: float = 0.01,
+                 top_n: int = 10
+                 ) -> None:
+        """
+        Initialize the PipelineProfiler.
+
+        Args:
+            enabled (bool): Whether profiling is enabled
+            interval (float): Seconds between CPU samples
+            top_n (int): Number of top allocators reported per stage
+        """
+        self.enabled = enabled
+        self.top_n = top_n
+        self.stages: List[Dict[str, Any]] = []
+        self.durations: Dict[str, float] = {}
+        self.sampler = StackSampler(interval)
+        self.started_at = datetime.now(timezone.utc)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """
+        Profile the enclosed block as a named stage.
+
+        Args:
+            name (str): The stage name
+        """
+        if not self.enabled:
+            start = time.perf_counter()
+            try:
+                yield
+            finally:
+                self.durations[name] = round(time.perf_counter() - start, 3)
+            return
+
+        _start_tracing()
+        tracemalloc.reset_peak()
+        before = tracemalloc.take_snapshot()
+        self.sampler.label = name
+        self.sampler.start()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            self.durations[name] = round(duration, 3)
+            self.sampler.stop()
+            after = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            _stop_tracing()
+
+            top = after.compare_to(before, "lineno")[:self.top_n]
+            report = {
+                "stage": name,
+                "seconds": round(duration, 3),
+                "peak_bytes": peak,
+                "retained_bytes": current,
+                "top_allocators": [
+                    {
+                        "location": str(stat.traceback[0]),
+                        "size_diff_bytes": stat.size_diff,
+                        "count_diff": stat.count_diff,
+                    }
+                    for stat in top
+                ],
+            }
+            self.stages.append(report)
+            logging.info(
+                "Profiled stage %s: %.2fs, peak %.1f MiB, top allocator %s",
+                name, duration, peak / 2**20,
+                report["top_allocators"][0]["location"] if top else None)
+
+    def report(self) -> Dict[str, Any]:
+        """Return the report of all stages profiled so far."""
+        return {
+            "started_at": self.started_at.isoformat(),
+            "sampling": "wall-clock, all threads of the process",
+            "stages": self.stages,
+        }
+
+    def write(self, output: str) -> List[str]:
+        """
+        Write the stage report and folded stacks of the run.
+
+        Args:
+            output (str): A local directory, or a gs://bucket/folder URI
+
+        Returns:
+            List[str]: Locations of the written artefacts
+        """
+        if not self.enabled:
+            return []
+
+        prefix = f"profile_{self.started_at.strftime('%Y%m%dT%H%M%S')}"
+        artefacts = {
+            f"{prefix}.json": json.dumps(self.report(), indent=2),
+            f"{prefix}.folded": self.sampler.folded(),
+        }
+
+        locations = []
+        if output.startswith("gs://"):
+            from etl.upload.storage import upload_bytes_to_gcs
+
+            bucket_name, _, folder = output[len("gs://"):].partition("/")
+            for file_name, content in artefacts.items():
+                blob_name = f"{folder.rstrip('/')}/{file_name}".lstrip("/")
+                upload_bytes_to_gcs(
+                    bucket_name=bucket_name,
+                    blob_name=blob_name,
+                    data=content.encode("utf-8"),
+                    content_type="text/plain"
+                )
+                locations.append(f"gs://{bucket_name}/{blob_name}")
+        else:
+            os.makedirs(output, exist_ok=True)
+            for file_name, content in artefacts.items():
+                path = os.path.join(output, file_name)
+                with open(path, "w") as f:
+                    f.write(content)
+                locations.append(path)
+
+        logging.info("Wrote profile artefacts to %s", locations)
+        return locations
+
+
+def profiling_enabled(requested: bool = False) -> bool:
+    """
+    Whether a run should be profiled.
+
+    Args:
+        requested (bool): Whether the caller asked for profiling
+
+    Returns:
+        bool: True if requested or PROFILE_PIPELINE is "true"
+    """
+    return requested or os.getenv("PROFILE_PIPELINE", "false") == "true"
@@ -0,0 +1,58 @@
+import os
+import logging
+
+# Gunicorn configuration used by the Dockerfile entrypoint.
+#
+# The app is imported once in the master (preload_app) so every worker
+# forks with modules, configuration and the bootstrap-static cache already
+# loaded. Network clients are not fork-safe, so they are created in each
+# worker after the fork instead.
+#
+# SERVING_MODE=async serves async_app.py with aiohttp workers, each running
+# a single event loop and aiohttp session shared by all of its requests.
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8080')}"
+workers = int(os.getenv("GUNICORN_WORKERS", "1"))
+preload_app = True
+
+if os.getenv("SERVING_MODE", "sync") == "async":
+    worker_class = "aiohttp.GunicornWebWorker"
+    wsgi_app = "async_app:app"
+else:
+    wsgi_app = "app:app"
+
+
+def when_ready(server):
+    """
+    Warm the bootstrap-static cache in the master before forking.
+
+    Best effort: the request times out after BootstrapStaticFetcher's
+    timeout, and any failure is logged and left to the workers, which fetch
+    on first use.
+    """
+    from etl.fetch.bootstrap_static import fetch_bootstrap_static
+
+    try:
+        fetch_bootstrap_static()
+        server.log.info("Warmed bootstrap-static cache.")
+    except Exception as e:
+        server.log.warning(f"Failed to warm bootstrap-static cache: {e}")
+
+
+def post_fork(server, worker):
+    """
+    Create this worker's Cloud Storage and BigQuery clients, which only the
+    gcs sink uses.
+    """
+    from config import Config
+    from etl.upload.storage import get_storage_client
+    from etl.upload.bigquery import get_bigquery_client
+
+    try:
+        config = Config.from_env()
+        if config.sink != "gcs":
+            return
+        get_storage_client()
+        get_bigquery_client(config.project_id)
+    except Exception as e:
+        logging.warning(f"Failed to warm clients in worker {worker.pid}: {e}")
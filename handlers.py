@@ -0,0 +1,389 @@
+import os
+import json
+import logging
+from typing import (
+    Any, Callable, Dict, List, Mapping, NamedTuple, Optional, Tuple, Type,
+    Union, get_args, get_origin
+)
+
+from pydantic import BaseModel
+
+from models import (
+    ElementSummaryRequest,
+    ElementFromTeamRequest,
+    ElementsFromTeamsRequest,
+    BootstrapStaticHistoryRequest,
+    PlayerMetricsRequest,
+    PlayerHistoryRequest,
+    PlayerTotalsRequest,
+    TopPlayersRequest
+)
+from config import Config
+from response_cache import CachedResponse, ResponseCache
+
+from etl.fetch.bootstrap_static import bootstrap_static_version
+from etl.fetch.circuit_breaker import (
+    FplUnavailableError,
+    fpl_circuit_breaker
+)
+from etl.history import get_history_store
+from etl.metrics import get_metrics_store
+from etl.process.bootstrap_static import (
+    get_elements_from_team,
+    get_elements_from_teams
+)
+from etl.process.bootstrap_history import ingest_bootstrap_static_history
+from etl.process.element_summary import (
+    fetch_and_upload_element_summary,
+    fetch_and_upload_element_summary_async
+)
+from etl.upload.sinks import NullSink, get_sink
+from log.logger import setup_logging
+
+
+# The API's request handlers, shared by the Flask app (app.py) and the
+# aiohttp app (async_app.py). Each handler takes an ApiRequest and returns
+# the status, body and headers to send, so the apps only adapt requests and
+# responses. Handlers block, so the aiohttp app runs them in an executor.
+
+# Initialize logging
+setup_logging()
+
+# Load and validate configuration early
+try:
+    config = Config.from_env()
+except ValueError as e:
+    logging.error(f"Failed to load configuration: {e}")
+    raise
+
+# Pre-encoded responses of the read endpoints
+response_cache = ResponseCache(
+    maxsize=int(os.getenv('RESPONSE_CACHE_SIZE', '256')))
+
+HandlerResult = Tuple[int, bytes, Dict[str, str]]
+
+
+class ApiRequest(NamedTuple):
+    """The parts of an HTTP request the handlers read."""
+    body: bytes
+    headers: Mapping[str, str]
+    method: str = "POST"
+    query: Mapping[str, List[str]] = {}
+
+    def json(self) -> Dict[str, Any]:
+        """Parse the JSON body, treating an empty body as {}."""
+        return json.loads(self.body) if self.body else {}
+
+    def params(self, model: Type[BaseModel]) -> BaseModel:
+        """
+        Validate the request's parameters: the query string of GET and HEAD
+        requests and the JSON body of any other.
+
+        List fields accept repeated and comma-separated query values, e.g.
+        ?element_ids=1,2&element_ids=3.
+
+        Args:
+            model (Type[BaseModel]): The request model
+
+        Returns:
+            BaseModel: The validated request
+        """
+        if self.method.upper() not in ("GET", "HEAD"):
+            return model(**self.json())
+        params = {}
+        for name, values in self.query.items():
+            field = model.model_fields.get(name)
+            if field is not None and _is_list_field(field.annotation):
+                params[name] = [item for value in values
+                                for item in value.split(",") if item]
+            elif values:
+                params[name] = values[-1]
+        return model(**params)
+
+
+def _is_list_field(annotation: Any) -> bool:
+    """Whether a model field holds a list, optional or not."""
+    if get_origin(annotation) is Union:
+        return any(_is_list_field(arg) for arg in get_args(annotation))
+    return get_origin(annotation) is list
+
+
+def json_result(body: Any,
+                status: int = 200,
+                headers: Optional[Dict[str, str]] = None
+                ) -> HandlerResult:
+    """Encode a JSON response."""
+    return status, json.dumps(body).encode("utf-8"), {
+        "Content-Type": "application/json", **(headers or {})}
+
+
+def error_result(endpoint: str, error: Exception) -> HandlerResult:
+    """
+    Map an exception raised by a handler to its error response.
+
+    Args:
+        endpoint (str): Name of the handler, for the log message
+        error (Exception): The exception raised
+
+    Returns:
+        HandlerResult: 503 with Retry-After when the FPL API is unavailable,
+            400 for invalid requests and 500 for anything else
+    """
+    if isinstance(error, FplUnavailableError):
+        logging.warning(f"Deferred {endpoint}: {error}")
+        return json_result({"status": "deferred", "message": str(error)},
+                           503, {"Retry-After": str(error.retry_after)})
+    if isinstance(error, ValueError):
+        logging.error(f"Validation error in {endpoint}: {error}")
+        return json_result({"status": "error", "message": str(error)}, 400)
+    logging.error(f"Error in {endpoint}: {error}")
+    return json_result({"status": "error", "message": str(error)}, 500)
+
+
+def cached_result(request: ApiRequest,
+                  cached: CachedResponse
+                  ) -> HandlerResult:
+    """Send a cached response, honouring If-None-Match and gzip."""
+    return response_cache.negotiate(
+        cached,
+        if_none_match=request.headers.get('If-None-Match', ''),
+        accept_encoding=request.headers.get('Accept-Encoding', ''),
+        method=request.method
+    )
+
+
+def defer_if_fpl_unavailable() -> None:
+    """
+    Defer a run that fetches from the FPL API while the circuit breaker is
+    open, rather than holding the request open while the run pauses.
+
+    Raises:
+        CircuitOpenError: If the circuit breaker is open
+    """
+    fpl_circuit_breaker.raise_if_open(
+        "FPL API is unavailable, the game may be updating")
+
+
+def _element_summary_kwargs(data: ElementSummaryRequest) -> Dict[str, Any]:
+    """Arguments of both element-summary pipelines for a request."""
+    return dict(
+        project_id=config.project_id,
+        bucket_name=config.bucket_name,
+        dataset_id=config.dataset_id,
+        destination_folder=data.destination_folder,
+        team_ids=data.team_ids,
+        element_ids=data.element_ids,
+        max_workers=data.max_workers,
+        replay_gameweek=data.replay_gameweek,
+        profile=data.profile,
+        changed_only=data.changed_only,
+        # Dry runs must not need the GCP settings or clients
+        sink=NullSink() if data.dry_run else get_sink(
+            config.sink, config.project_id, config.bucket_name,
+            config.dataset_id),
+        dry_run=data.dry_run
+    )
+
+
+def _element_summary_result(data: ElementSummaryRequest,
+                            report: Dict[str, Any]
+                            ) -> HandlerResult:
+    """Response of a finished element-summary run."""
+    body = {"status": "success"}
+    if data.dry_run:
+        body["report"] = report
+    return json_result(body)
+
+
+def fetch_and_upload_element_summary_endpoint(
+        request: ApiRequest
+        ) -> HandlerResult:
+    try:
+        data = ElementSummaryRequest(**request.json())
+        defer_if_fpl_unavailable()
+        report = fetch_and_upload_element_summary(
+            **_element_summary_kwargs(data))
+        return _element_summary_result(data, report)
+
+    except Exception as e:
+        return error_result("fetch_and_upload_element_summary_endpoint", e)
+
+
+async def fetch_and_upload_element_summary_endpoint_async(
+        request: ApiRequest,
+        session
+        ) -> HandlerResult:
+    """The element-summary handler of the aiohttp app, which runs the
+    pipeline on the worker's event loop and shared session."""
+    try:
+        data = ElementSummaryRequest(**request.json())
+        defer_if_fpl_unavailable()
+        report = await fetch_and_upload_element_summary_async(
+            session=session, **_element_summary_kwargs(data))
+        return _element_summary_result(data, report)
+
+    except Exception as e:
+        return error_result("fetch_and_upload_element_summary_endpoint", e)
+
+
+def get_elements_from_team_endpoint(request: ApiRequest) -> HandlerResult:
+    try:
+        # Validate input using Pydantic model
+        data = request.params(ElementFromTeamRequest)
+
+        logging.info(f"Retrieveing elements for team_id: {data.team_id}")
+        cached = response_cache.get_or_build(
+            endpoint='get-elements-from-team',
+            payload=data.model_dump(),
+            version=bootstrap_static_version(),
+            build=lambda: {"elements": get_elements_from_team(data.team_id)}
+        )
+        return cached_result(request, cached)
+
+    except Exception as e:
+        return error_result("get_elements_from_team_endpoint", e)
+
+
+def get_elements_from_teams_endpoint(request: ApiRequest) -> HandlerResult:
+    try:
+        data = request.params(ElementsFromTeamsRequest)
+
+        logging.info(f"Retrieveing elements for team_ids: {data.team_ids}")
+        cached = response_cache.get_or_build(
+            endpoint='get-elements-from-teams',
+            payload=data.model_dump(),
+            version=bootstrap_static_version(),
+            build=lambda: {"teams": get_elements_from_teams(data.team_ids)}
+        )
+        return cached_result(request, cached)
+
+    except Exception as e:
+        return error_result("get_elements_from_teams_endpoint", e)
+
+
+def get_player_metrics_endpoint(request: ApiRequest) -> HandlerResult:
+    try:
+        data = request.params(PlayerMetricsRequest)
+
+        store = get_metrics_store()
+        cached = response_cache.get_or_build(
+            endpoint='get-player-metrics',
+            payload=data.model_dump(),
+            version=store.version,
+            build=lambda: store.get_many(data.element_ids, data.metrics)
+        )
+        return cached_result(request, cached)
+
+    except Exception as e:
+        return error_result("get_player_metrics_endpoint", e)
+
+
+def get_top_players_endpoint(request: ApiRequest) -> HandlerResult:
+    try:
+        data = request.params(TopPlayersRequest)
+
+        store = get_metrics_store()
+        cached = response_cache.get_or_build(
+            endpoint='get-top-players',
+            payload=data.model_dump(),
+            version=store.version,
+            build=lambda: {"players": store.top(
+                data.metric, data.n, data.min_minutes, data.ascending)}
+        )
+        return cached_result(request, cached)
+
+    except Exception as e:
+        return error_result("get_top_players_endpoint", e)
+
+
+def get_player_history_endpoint(request: ApiRequest) -> HandlerResult:
+    try:
+        data = request.params(PlayerHistoryRequest)
+
+        store = get_history_store()
+        cached = response_cache.get_or_build(
+            endpoint='get-player-history',
+            payload=data.model_dump(mode='json'),
+            version=store.version,
+            build=lambda: store.history(
+                element=data.element_id,
+                columns=data.columns,
+                round_from=data.round_from,
+                round_to=data.round_to,
+                page=data.page,
+                page_size=data.page_size
+            )
+        )
+        return cached_result(request, cached)
+
+    except Exception as e:
+        return error_result("get_player_history_endpoint", e)
+
+
+def get_player_totals_endpoint(request: ApiRequest) -> HandlerResult:
+    try:
+        data = request.params(PlayerTotalsRequest)
+
+        store = get_history_store()
+        cached = response_cache.get_or_build(
+            endpoint='get-player-totals',
+            payload=data.model_dump(mode='json'),
+            version=store.version,
+            build=lambda: store.totals(
+                columns=data.columns,
+                order_by=data.order_by,
+                ascending=data.ascending,
+                element_ids=data.element_ids,
+                round_from=data.round_from,
+                round_to=data.round_to,
+                since=data.since and data.since.isoformat(),
+                until=data.until and data.until.isoformat(),
+                min_minutes=data.min_minutes,
+                page=data.page,
+                page_size=data.page_size
+            )
+        )
+        return cached_result(request, cached)
+
+    except Exception as e:
+        return error_result("get_player_totals_endpoint", e)
+
+
+def ingest_bootstrap_static_history_endpoint(
+        request: ApiRequest
+        ) -> HandlerResult:
+    try:
+        data = BootstrapStaticHistoryRequest(**request.json())
+        defer_if_fpl_unavailable()
+
+        counts = ingest_bootstrap_static_history(
+            project_id=config.project_id,
+            bucket_name=config.bucket_name,
+            dataset_id=config.dataset_id,
+            destination_folder=data.destination_folder,
+            tables=data.tables,
+            sink=get_sink(config.sink, config.project_id,
+                          config.bucket_name, config.dataset_id)
+        )
+        return json_result({"status": "success", "changed_rows": counts})
+
+    except Exception as e:
+        return error_result("ingest_bootstrap_static_history_endpoint", e)
+
+
+# Routes served by both apps with a blocking handler. The element-summary
+# route is registered by each app, as they run different pipelines. Read
+# routes take GET with query-string parameters, which can be conditional,
+# or POST with a JSON body.
+READ_ROUTES: Dict[str, Callable[[ApiRequest], HandlerResult]] = {
+    '/get-elements-from-team': get_elements_from_team_endpoint,
+    '/get-elements-from-teams': get_elements_from_teams_endpoint,
+    '/get-player-metrics': get_player_metrics_endpoint,
+    '/get-top-players': get_top_players_endpoint,
+    '/get-player-history': get_player_history_endpoint,
+    '/get-player-totals': get_player_totals_endpoint,
+}
+WRITE_ROUTES: Dict[str, Callable[[ApiRequest], HandlerResult]] = {
+    '/ingest-bootstrap-static-history':
+        ingest_bootstrap_static_history_endpoint,
+}
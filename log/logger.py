@@ -1,11 +1,130 @@
 import os
+import time
+import queue
+import atexit
 import logging
+import threading
+import logging.handlers
 from functools import wraps
-from typing import Callable, Any
+from typing import Callable, Any, Dict, Optional, Tuple
 from dotenv import load_dotenv
 
-# Cloud Logging imports
-from google.cloud.logging_v2.handlers import StructuredLogHandler
+LOCAL_FORMAT = "%(asctime)s [%(levelname)s] %(message)s"
+
+# The listener draining the log queue when queue logging is enabled
+_queue_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that enqueues records untouched.
+
+    The standard QueueHandler formats each record on the calling thread so
+    it can be pickled. The queue here never leaves the process, so message
+    formatting is left to the listener thread instead. Arguments passed to
+    a log call should therefore not be mutated afterwards.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Rate-limits repetitive low-level records.
+
+    Records are grouped by logger, level and unformatted message template,
+    and only the first `burst` records of each group are let through per
+    `interval` seconds. Records above `max_level` and records whose message
+    is not a string (such as structured dict payloads, which may not be
+    hashable) are never dropped. Hot paths should log with %-style arguments
+    rather than f-strings so that repeated messages share a template. Safe
+    to share between threads.
+
+    Attributes:
+        burst (int): Records let through per group and interval
+        interval (float): Length of a sampling window in seconds
+        max_level (int): Highest level that is sampled
+        suppressed (int): Total number of records dropped
+    """
+
+    MAX_GROUPS = 10000
+
+    def __init__(self,
+                 burst: int = 10,
+                 interval: float = 60.0,
+                 max_level: int = logging.INFO
+                 ) -> None:
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self.max_level = max_level
+        self.suppressed = 0
+        self._windows: Dict[Tuple[str, int, str], Tuple[float, int]] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > self.max_level or not isinstance(record.msg, str):
+            return True
+
+        key = (record.name, record.levelno, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            window_start, count = self._windows.get(key, (now, 0))
+            if now - window_start >= self.interval:
+                window_start, count = now, 0
+            if len(self._windows) >= self.MAX_GROUPS \
+                    and key not in self._windows:
+                self._windows.clear()
+            self._windows[key] = (window_start, count + 1)
+
+            if count < self.burst:
+                return True
+            self.suppressed += 1
+            return False
+
+
+def _start_queue_logging(handler: logging.Handler, level: int) -> None:
+    """
+    Route root logger records through a queue to a background thread.
+
+    Args:
+        handler (logging.Handler): The handler that writes the records
+        level (int): Level of the root logger
+    """
+    global _queue_listener
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = DeferredQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(
+        burst=int(os.getenv("LOG_SAMPLE_BURST", "10")),
+        interval=float(os.getenv("LOG_SAMPLE_INTERVAL", "60"))
+    ))
+
+    logger = logging.getLogger()
+    logger.setLevel(level)
+    logger.addHandler(queue_handler)
+
+    _queue_listener = logging.handlers.QueueListener(
+        log_queue, handler, respect_handler_level=True)
+    _queue_listener.start()
+
+    def restart_after_fork() -> None:
+        # The listener thread does not survive a fork, e.g. into gunicorn
+        # workers, so each child drains a fresh queue with its own thread
+        global _queue_listener
+
+        child_queue: queue.SimpleQueue = queue.SimpleQueue()
+        queue_handler.queue = child_queue
+        _queue_listener = logging.handlers.QueueListener(
+            child_queue, handler, respect_handler_level=True)
+        _queue_listener.start()
+        atexit.register(_queue_listener.stop)
+
+    os.register_at_fork(after_in_child=restart_after_fork)
+    # Flush queued records before the handler is closed on shutdown
+    atexit.register(handler.close)
+    atexit.register(_queue_listener.stop)
 
 
 def setup_logging() -> None:
@@ -22,18 +141,40 @@ def setup_logging() -> None:
     Environment Variables:
         LOCAL_ENV: If set to "true", configures local logging. Otherwise,
                    sets up Google Cloud structured logging.
+        QUEUE_LOGGING: If set to "true", records are handed to a background
+                   thread through a queue, formatted there, and repetitive
+                   DEBUG/INFO records are sampled (LOG_SAMPLE_BURST per
+                   LOG_SAMPLE_INTERVAL seconds).
     """
     # Load env vars from .env in local dev
     load_dotenv()
 
+    local = os.getenv("LOCAL_ENV", "false") == "true"
+    if os.getenv("QUEUE_LOGGING", "false") == "true":
+        if _queue_listener is not None:
+            return
+        if local:
+            handler = logging.StreamHandler()
+            handler.setFormatter(logging.Formatter(LOCAL_FORMAT))
+        else:
+            from google.cloud.logging_v2.handlers import StructuredLogHandler
+            handler = StructuredLogHandler()
+        _start_queue_logging(
+            handler, logging.DEBUG if local else logging.INFO)
+        logging.info("Queue-backed logging initialized.")
+        return
+
     # Choose logging mode
-    if os.getenv("LOCAL_ENV", "false") == "true":
+    if local:
         logging.basicConfig(
             level=logging.DEBUG,
-            format="%(asctime)s [%(levelname)s] %(message)s",
+            format=LOCAL_FORMAT,
         )
         logging.info("Local logging initialized.")
     else:
+        # Imported here so local runs never pay for google.cloud.logging
+        from google.cloud.logging_v2.handlers import StructuredLogHandler
+
         # Use StructuredLogHandler to avoid threading shutdown issues
         handler = StructuredLogHandler()
         logger = logging.getLogger()
@@ -41,7 +182,6 @@ def setup_logging() -> None:
         logger.addHandler(handler)
 
         # Ensure log handler is flushed and closed on shutdown
-        import atexit
         atexit.register(handler.flush)
         atexit.register(handler.close)
         logging.info("Google Cloud structured logging initialized.")
@@ -1,6 +1,10 @@
+from datetime import date
 from pydantic import BaseModel, Field, field_validator
 from typing import Optional, List
 
+from etl.history import HISTORY_COLUMNS, TOTAL_COLUMNS
+from etl.metrics import METRICS
+
 
 class ElementSummaryRequest(BaseModel):
     destination_folder: Optional[str] = Field(
@@ -10,7 +14,20 @@ class ElementSummaryRequest(BaseModel):
     element_ids: Optional[List[int]] = Field(
         None, description="List of element IDs to filter elements")
     max_workers: Optional[int] = Field(
-        5, description="Number of workers for parallel processing")
+        None, description="Number of teams to process at once, defaults to "
+                          "5 in the Flask app and all teams in the async "
+                          "app. Requests in flight are tuned automatically")
+    replay_gameweek: Optional[int] = Field(
+        None, description="Replay archived payloads for this gameweek "
+                          "instead of calling the API")
+    profile: Optional[bool] = Field(
+        False, description="Profile CPU and memory of each pipeline stage")
+    changed_only: Optional[bool] = Field(
+        False, description="Only fetch players whose stats moved since the "
+                           "last changed-only run")
+    dry_run: Optional[bool] = Field(
+        False, description="Fetch and transform only, discarding the tables, "
+                           "and return the run report")
 
     @field_validator('destination_folder')
     def validate_destination_folder(cls, v):
@@ -20,10 +37,14 @@ class ElementSummaryRequest(BaseModel):
 
     @field_validator('max_workers')
     def validate_max_workers(cls, v):
-        if v < 1:
-            raise ValueError("max_workers must be at least 1")
-        if v > 20:
-            raise ValueError("max_workers cannot exceed 100")
+        if v is not None and (v < 1 or v > 20):
+            raise ValueError("max_workers must be in the range 1-20")
+        return v
+
+    @field_validator('replay_gameweek')
+    def validate_replay_gameweek(cls, v):
+        if v is not None and (v < 0 or v > 38):
+            raise ValueError("replay_gameweek must be in the range 0-38")
         return v
 
 
@@ -32,6 +53,189 @@ class ElementFromTeamRequest(BaseModel):
 
     @field_validator('team_id')
     def validate_team_id(cls, v):
-        if v < 1 or v > 19:
-            raise ValueError("team_id must be in the range 1-19")
+        if v < 1 or v > 20:
+            raise ValueError("team_id must be in the range 1-20")
+        return v
+
+
+class ElementsFromTeamsRequest(BaseModel):
+    team_ids: Optional[List[int]] = Field(
+        None, description="Team IDs to filter elements, defaults to all "
+                          "teams")
+
+    @field_validator('team_ids')
+    def validate_team_ids(cls, v):
+        if v is not None:
+            if not v:
+                raise ValueError("team_ids must not be empty")
+            if any(team_id < 1 or team_id > 20 for team_id in v):
+                raise ValueError("team_ids must be in the range 1-20")
+        return v
+
+
+class BootstrapStaticHistoryRequest(BaseModel):
+    destination_folder: Optional[str] = Field(
+        "bootstrap_static", description="Destination folder in the bucket")
+    tables: Optional[List[str]] = Field(
+        None, description="Bootstrap-static tables to ingest, defaults to "
+                          "elements, teams, events and element_types")
+
+    @field_validator('destination_folder')
+    def validate_destination_folder(cls, v):
+        if not v or not isinstance(v, str):
+            raise ValueError("destination_folder must be a non-empty string")
+        return v
+
+    @field_validator('tables')
+    def validate_tables(cls, v):
+        allowed = {"elements", "teams", "events", "element_types"}
+        if v is not None and (not v or not set(v) <= allowed):
+            raise ValueError(
+                f"tables must be a non-empty subset of {sorted(allowed)}")
+        return v
+
+
+class PlayerMetricsRequest(BaseModel):
+    element_ids: List[int] = Field(
+        description="Element IDs to return the metrics of")
+    metrics: Optional[List[str]] = Field(
+        None, description="Metrics to return, defaults to all metrics")
+
+    @field_validator('element_ids')
+    def validate_element_ids(cls, v):
+        if not v:
+            raise ValueError("element_ids must not be empty")
+        if len(v) > 1000:
+            raise ValueError("element_ids cannot contain more than 1000 IDs")
+        return v
+
+    @field_validator('metrics')
+    def validate_metrics(cls, v):
+        if v is not None and (not v or not set(v) <= set(METRICS)):
+            raise ValueError(
+                f"metrics must be a non-empty subset of {METRICS}")
+        return v
+
+
+class TopPlayersRequest(BaseModel):
+    metric: str = Field(description="Metric to rank players by")
+    n: Optional[int] = Field(10, description="Number of players to return")
+    min_minutes: Optional[int] = Field(
+        0, description="Leave out players with fewer minutes this season")
+    ascending: Optional[bool] = Field(
+        False, description="Rank the lowest values first")
+
+    @field_validator('metric')
+    def validate_metric(cls, v):
+        if v not in METRICS:
+            raise ValueError(f"metric must be one of {METRICS}")
+        return v
+
+    @field_validator('n')
+    def validate_n(cls, v):
+        if v < 1 or v > 100:
+            raise ValueError("n must be in the range 1-100")
+        return v
+
+    @field_validator('min_minutes')
+    def validate_min_minutes(cls, v):
+        if v < 0:
+            raise ValueError("min_minutes must not be negative")
+        return v
+
+
+class PlayerHistoryRequest(BaseModel):
+    element_id: int = Field(description="Element ID to return the matches of")
+    columns: Optional[List[str]] = Field(
+        None, description="Columns to return, defaults to all columns")
+    round_from: Optional[int] = Field(
+        None, description="First gameweek to include")
+    round_to: Optional[int] = Field(
+        None, description="Last gameweek to include")
+    page: Optional[int] = Field(1, description="Page to return")
+    page_size: Optional[int] = Field(38, description="Matches per page")
+
+    @field_validator('columns')
+    def validate_columns(cls, v):
+        if v is not None and (not v or not set(v) <= set(HISTORY_COLUMNS)):
+            raise ValueError(
+                f"columns must be a non-empty subset of {HISTORY_COLUMNS}")
+        return v
+
+    @field_validator('round_from', 'round_to')
+    def validate_round(cls, v):
+        if v is not None and (v < 1 or v > 38):
+            raise ValueError("rounds must be in the range 1-38")
+        return v
+
+    @field_validator('page')
+    def validate_page(cls, v):
+        if v < 1:
+            raise ValueError("page must be at least 1")
+        return v
+
+    @field_validator('page_size')
+    def validate_page_size(cls, v):
+        if v < 1 or v > 100:
+            raise ValueError("page_size must be in the range 1-100")
+        return v
+
+
+class PlayerTotalsRequest(BaseModel):
+    columns: Optional[List[str]] = Field(
+        None, description="Totals to return, defaults to all totals")
+    order_by: Optional[str] = Field(
+        "total_points", description="Total to rank players by")
+    ascending: Optional[bool] = Field(
+        False, description="Rank the lowest totals first")
+    element_ids: Optional[List[int]] = Field(
+        None, description="Element IDs to include, defaults to all players")
+    round_from: Optional[int] = Field(
+        None, description="First gameweek to include")
+    round_to: Optional[int] = Field(
+        None, description="Last gameweek to include")
+    since: Optional[date] = Field(
+        None, description="Include matches kicking off on or after this date")
+    until: Optional[date] = Field(
+        None, description="Include matches kicking off before this date")
+    min_minutes: Optional[int] = Field(
+        0, description="Leave out players with fewer minutes in the range")
+    page: Optional[int] = Field(1, description="Page to return")
+    page_size: Optional[int] = Field(20, description="Players per page")
+
+    @field_validator('columns')
+    def validate_columns(cls, v):
+        if v is not None and (not v or not set(v) <= set(TOTAL_COLUMNS)):
+            raise ValueError(
+                f"columns must be a non-empty subset of {TOTAL_COLUMNS}")
+        return v
+
+    @field_validator('order_by')
+    def validate_order_by(cls, v):
+        if v not in TOTAL_COLUMNS:
+            raise ValueError(f"order_by must be one of {TOTAL_COLUMNS}")
+        return v
+
+    @field_validator('round_from', 'round_to')
+    def validate_round(cls, v):
+        if v is not None and (v < 1 or v > 38):
+            raise ValueError("rounds must be in the range 1-38")
+        return v
+
+    @field_validator('min_minutes')
+    def validate_min_minutes(cls, v):
+        if v < 0:
+            raise ValueError("min_minutes must not be negative")
+        return v
+
+    @field_validator('page')
+    def validate_page(cls, v):
+        if v < 1:
+            raise ValueError("page must be at least 1")
+        return v
+
+    @field_validator('page_size')
+    def validate_page_size(cls, v):
+        if v < 1 or v > 100:
+            raise ValueError("page_size must be in the range 1-100")
         return v
@@ -0,0 +1,123 @@
+import gzip
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, NamedTuple, Tuple
+
+
+class CachedResponse(NamedTuple):
+    """A pre-encoded JSON response body and its gzip-compressed form."""
+    body: bytes
+    gzip_body: bytes
+    etag: str
+
+
+class ResponseCache:
+    """
+    Bounded LRU cache of pre-encoded JSON responses for read endpoints.
+
+    Entries are keyed on the endpoint, the request payload and the version
+    of the data the response was built from, so a data refresh naturally
+    misses the cache. Each entry keeps the encoded body, a gzip copy and a
+    strong ETag so hits cost no serialisation or compression.
+
+    Attributes:
+        maxsize (int): Maximum number of responses kept
+        min_gzip_size (int): Bodies smaller than this are never compressed
+    """
+
+    CACHE_CONTROL = "no-cache"
+
+    def __init__(self, maxsize: int = 256, min_gzip_size: int = 512) -> None:
+        """
+        Initialize the ResponseCache.
+
+        Args:
+            maxsize (int): Maximum number of responses kept
+            min_gzip_size (int): Bodies smaller than this are never
+                compressed
+        """
+        self.maxsize = maxsize
+        self.min_gzip_size = min_gzip_size
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def encode(self, payload: Any) -> CachedResponse:
+        """Encode a JSON payload into a cacheable response."""
+        body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        gzip_body = gzip.compress(body, compresslevel=6, mtime=0) \
+            if len(body) >= self.min_gzip_size else b""
+        etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        return CachedResponse(body, gzip_body, etag)
+
+    def get_or_build(self,
+                     endpoint: str,
+                     payload: Dict[str, Any],
+                     version: int,
+                     build: Callable[[], Any]
+                     ) -> CachedResponse:
+        """
+        Return the cached response for a request, building it on a miss.
+
+        Args:
+            endpoint (str): Name of the endpoint
+            payload (Dict[str, Any]): The validated request payload
+            version (int): Version of the data the response is built from
+            build (Callable[[], Any]): Returns the JSON payload to cache.
+                Exceptions propagate and nothing is cached.
+
+        Returns:
+            CachedResponse: The encoded response
+        """
+        key = (endpoint, json.dumps(payload, sort_keys=True), version)
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+                return cached
+
+        cached = self.encode(build())
+        with self._lock:
+            self._entries[key] = cached
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return cached
+
+    def negotiate(self,
+                  cached: CachedResponse,
+                  if_none_match: str = "",
+                  accept_encoding: str = "",
+                  method: str = "GET"
+                  ) -> Tuple[int, bytes, Dict[str, str]]:
+        """
+        Choose the status, body and headers to send for a cached response.
+
+        Args:
+            cached (CachedResponse): The cached response
+            if_none_match (str): The request's If-None-Match header
+            accept_encoding (str): The request's Accept-Encoding header
+            method (str): The request's HTTP method. Only GET and HEAD
+                requests are conditional.
+
+        Returns:
+            Tuple[int, bytes, Dict[str, str]]: 304 with an empty body when
+                a GET or HEAD client's ETag matches, otherwise 200 with the
+                gzip body if the client accepts it and the plain body if not
+        """
+        headers = {
+            "ETag": cached.etag,
+            "Cache-Control": self.CACHE_CONTROL,
+            "Vary": "Accept-Encoding",
+        }
+        if method.upper() in ("GET", "HEAD"):
+            client_etags = [tag.strip() for tag in if_none_match.split(",")]
+            if cached.etag in client_etags or "*" in client_etags:
+                return 304, b"", headers
+
+        headers["Content-Type"] = "application/json"
+        if cached.gzip_body and "gzip" in accept_encoding.lower():
+            headers["Content-Encoding"] = "gzip"
+            return 200, cached.gzip_body, headers
+        return 200, cached.body, headers
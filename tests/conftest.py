@@ -23,3 +23,23 @@ def element_summary_data():
         "history": [{"history_data": "example"}],
         "history_past": [{"past_data": "example"}]
     }
+
+
+@pytest.fixture(autouse=True)
+def reset_circuit_breaker():
+    """Start every test with the shared FPL circuit breaker closed."""
+    from etl.fetch.circuit_breaker import fpl_circuit_breaker
+
+    fpl_circuit_breaker.reset()
+    yield
+    fpl_circuit_breaker.reset()
+
+
+@pytest.fixture(autouse=True)
+def reset_concurrency_limiters():
+    """Start every test with the shared limiters at their initial limits."""
+    from etl.utils.concurrency import fpl_request_limiter, gcs_upload_limiter
+
+    fpl_request_limiter.reset()
+    gcs_upload_limiter.reset()
+    yield
@@ -0,0 +1,129 @@
+import asyncio
+import importlib
+import threading
+from unittest.mock import patch, AsyncMock, MagicMock
+
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+
+from response_cache import ResponseCache
+
+
+@pytest.fixture
+def async_app(monkeypatch):
+    monkeypatch.setenv("PROJECT_ID", "project")
+    monkeypatch.setenv("BUCKET_ID", "bucket")
+    monkeypatch.setenv("DATASET_ID", "dataset")
+    monkeypatch.setenv("LOCAL_ENV", "true")
+    app_module = importlib.import_module("async_app")
+    importlib.import_module("handlers").response_cache = ResponseCache()
+    return app_module
+
+
+async def _post_twice(application, path, payload):
+    async with TestClient(TestServer(application)) as client:
+        responses = []
+        for _ in range(2):
+            response = await client.post(path, json=payload)
+            responses.append((response.status, await response.json()))
+        return responses
+
+
+@patch("handlers.fetch_and_upload_element_summary_async",
+       new_callable=AsyncMock)
+def test_requests_share_one_session(mock_pipeline, async_app):
+    responses = asyncio.run(_post_twice(
+        async_app.create_app(),
+        "/fetch-and-upload-element-summary",
+        {"team_ids": [1]}
+    ))
+
+    assert responses == [(200, {"status": "success"})] * 2
+    sessions = [call.kwargs["session"]
+                for call in mock_pipeline.await_args_list]
+    assert sessions[0] is sessions[1]
+    assert mock_pipeline.await_args.kwargs["team_ids"] == [1]
+
+
+@patch("handlers.bootstrap_static_version", return_value=1)
+@patch("handlers.get_elements_from_team", return_value=[1, 2])
+def test_get_elements_from_team(mock_get_elements, mock_version, async_app):
+    responses = asyncio.run(_post_twice(
+        async_app.create_app(),
+        "/get-elements-from-team",
+        {"team_id": 1}
+    ))
+
+    assert responses == [(200, {"elements": [1, 2]})] * 2
+    # The second response is served from the response cache
+    mock_get_elements.assert_called_once_with(1)
+
+
+def test_store_lookups_run_off_the_event_loop(async_app):
+    threads = []
+
+    def get_metrics_store():
+        threads.append(threading.get_ident())
+        return MagicMock(version=1, get_many=lambda ids, metrics: {"1": {}})
+
+    with patch("handlers.get_metrics_store", side_effect=get_metrics_store):
+        responses = asyncio.run(_post_twice(
+            async_app.create_app(),
+            "/get-player-metrics",
+            {"element_ids": [1]}
+        ))
+
+    assert responses == [(200, {"1": {}})] * 2
+    assert threads and threading.get_ident() not in threads
+
+
+def test_missing_body_is_a_bad_request(async_app):
+    responses = asyncio.run(_post_twice(
+        async_app.create_app(),
+        "/get-player-metrics",
+        None
+    ))
+
+    assert [status for status, _ in responses] == [400, 400]
+
+
+async def _get_conditionally(application, path):
+    async with TestClient(TestServer(application)) as client:
+        response = await client.get(path)
+        etag = response.headers["ETag"]
+        conditional = await client.get(path, headers={"If-None-Match": etag})
+        return response.status, await response.json(), conditional.status
+
+
+@patch("handlers.bootstrap_static_version", return_value=1)
+@patch("handlers.get_elements_from_teams", return_value={1: [1, 5]})
+def test_get_elements_from_teams_is_conditional(mock_get, mock_version,
+                                                async_app):
+    status, body, conditional_status = asyncio.run(_get_conditionally(
+        async_app.create_app(), "/get-elements-from-teams?team_ids=1"))
+
+    assert (status, body, conditional_status) == \
+        (200, {"teams": {"1": [1, 5]}}, 304)
+    mock_get.assert_called_once_with([1])
+
+
+@patch("handlers.fetch_and_upload_element_summary_async",
+       new_callable=AsyncMock)
+def test_runs_are_deferred_while_the_breaker_is_open(mock_pipeline,
+                                                     async_app):
+    from etl.fetch.circuit_breaker import fpl_circuit_breaker
+    for _ in range(fpl_circuit_breaker.failure_threshold):
+        fpl_circuit_breaker.record_failure()
+
+    async def post():
+        async with TestClient(TestServer(async_app.create_app())) as client:
+            response = await client.post(
+                "/fetch-and-upload-element-summary", json={"team_ids": [1]})
+            return response.status, response.headers, await response.json()
+
+    status, headers, body = asyncio.run(post())
+
+    assert status == 503
+    assert headers["Retry-After"] == str(int(fpl_circuit_breaker.cooldown))
+    assert body["status"] == "deferred"
+    mock_pipeline.assert_not_awaited()
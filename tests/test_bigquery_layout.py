@@ -0,0 +1,138 @@
+from datetime import datetime, timezone
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from etl.upload.bigquery_layout import (
+    DASHBOARD_QUERIES,
+    aggregate_refresh_sql,
+    benchmark_dashboard_queries,
+    get_table_layout
+)
+
+
+def test_history_is_rebuilt_with_typed_columns():
+    sql = get_table_layout("element_summary_history").create_sql(
+        "p.d.element_summary_history", "p.d.element_summary_history_staging")
+
+    assert "PARTITION BY TIMESTAMP_TRUNC(kickoff_time, MONTH)" in sql
+    assert "CLUSTER BY round, element" in sql
+    assert "SAFE_CAST(JSON_VALUE(data, '$.round') AS INT64) AS round" in sql
+    assert "SAFE_CAST(JSON_VALUE(data, '$.was_home') AS BOOL) AS was_home" \
+        in sql
+    assert "FROM `p.d.element_summary_history_staging`" in sql
+
+
+def test_merge_inserts_every_column():
+    layout = get_table_layout("element_summary_fixtures")
+    sql = layout.merge_sql("p.d.fixtures", "p.d.fixtures_staging")
+
+    assert sql.startswith("BEGIN TRANSACTION;\nDELETE FROM `p.d.fixtures`")
+    assert sql.endswith("COMMIT TRANSACTION;")
+    assert f"INSERT INTO `p.d.fixtures` ({', '.join(layout.column_names)})" \
+        in sql
+    assert layout.column_names[0] == "element"
+    assert layout.column_names[-1] == "data"
+
+
+def test_merge_deletes_refreshed_players_without_staged_rows():
+    layout = get_table_layout("element_summary_fixtures")
+    sql = layout.merge_sql("p.d.fixtures", "p.d.fixtures_staging",
+                           element_ids=[7, 3])
+
+    delete = sql.split(";")[1]
+    assert "SELECT DISTINCT element FROM `p.d.fixtures_staging`" in delete
+    assert "OR element IN (3, 7)" in delete
+
+
+@patch("etl.upload.bigquery.get_bigquery_client")
+def test_merge_without_rows_only_deletes_the_refreshed_players(
+        mock_get_client):
+    from etl.upload.bigquery import merge_element_summary_from_gcs_to_bigquery
+
+    client = mock_get_client.return_value
+    merge_element_summary_from_gcs_to_bigquery(
+        "p", "d", "bucket", "run", "element_summary_fixtures",
+        source_uris=[], element_ids=[3])
+
+    [query] = client.query.call_args_list
+    assert query.args[0] == ("DELETE FROM `p.d.element_summary_fixtures`\n"
+                             "WHERE element IN (3)")
+    client.load_table_from_uri.assert_not_called()
+
+
+def test_staging_tables_expire():
+    from etl.upload.bigquery import (
+        STAGING_TABLE_TTL,
+        load_gcs_to_staging_table
+    )
+
+    client = MagicMock()
+    load_gcs_to_staging_table(client, "gs://bucket/run/*.json", "p.d.s")
+
+    staging_table = client.create_table.call_args.args[0]
+    assert staging_table.expires is not None
+    assert staging_table.expires - datetime.now(timezone.utc) <= \
+        STAGING_TABLE_TTL
+    assert client.load_table_from_uri.call_args.args[1] == "p.d.s"
+
+
+@patch("etl.upload.bigquery.get_bigquery_client")
+def test_benchmark_compares_against_a_copy_of_the_old_layout(
+        mock_get_client):
+    client = MagicMock()
+    client.query.side_effect = lambda sql, job_config=None: MagicMock(
+        total_bytes_processed=1000 if "JSON_VALUE" in sql else 10)
+    mock_get_client.return_value = client
+
+    results = benchmark_dashboard_queries("p", "d", gameweek=5)
+
+    assert set(results) == set(DASHBOARD_QUERIES)
+    assert results["gameweek_points"] == {"before": 1000, "after": 10}
+    copies = [call.args[0] for call in client.query.call_args_list
+              if "RANGE_BUCKET(element" in call.args[0]]
+    assert len(copies) == 2
+    befores = [call.args[0] for call in client.query.call_args_list
+               if "JSON_VALUE" in call.args[0]]
+    assert all("_old_layout_" in sql for sql in befores)
+    assert all(call.kwargs["job_config"].dry_run
+               for call in client.query.call_args_list
+               if "job_config" in call.kwargs)
+    assert len(client.delete_table.call_args_list) == 2
+
+
+def test_incremental_refresh_only_reaggregates_the_loaded_players():
+    full = aggregate_refresh_sql("p.d")
+    incremental = aggregate_refresh_sql("p.d", element_ids=[7, 3, 7])
+
+    assert full["element_gameweek_stats"].lstrip().startswith(
+        "CREATE OR REPLACE TABLE `p.d.element_gameweek_stats`")
+    sql = incremental["element_gameweek_stats"]
+    assert sql.startswith("BEGIN TRANSACTION;")
+    assert "WHERE element IN (3, 7);" in sql
+    assert "WHERE round IS NOT NULL AND element IN (3, 7)" in sql
+    assert incremental["gameweek_summary"] == full["gameweek_summary"]
+
+
+@patch("etl.upload.bigquery.load_gcs_to_staging_table")
+@patch("etl.upload.bigquery.get_bigquery_client")
+def test_merge_uses_its_own_staging_table_and_drops_it(mock_get_client,
+                                                       mock_load):
+    from etl.upload.bigquery import merge_element_summary_from_gcs_to_bigquery
+
+    client = MagicMock()
+    client.query.return_value.result.side_effect = RuntimeError("timeout")
+    mock_get_client.return_value = client
+
+    stagings = []
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            merge_element_summary_from_gcs_to_bigquery(
+                "p", "d", "bucket", "run", "element_summary_history")
+        stagings.append(mock_load.call_args.args[2])
+
+    assert stagings[0] != stagings[1]
+    assert all(s.startswith("p.d.element_summary_history_staging_")
+               for s in stagings)
+    assert [c.args[0] for c in client.delete_table.call_args_list] == \
+        stagings
@@ -0,0 +1,139 @@
+import json
+from unittest.mock import patch
+
+import pytest
+
+from etl.process.bootstrap_history import (
+    Scd2Tracker,
+    ingest_bootstrap_static_history
+)
+from etl.upload.sinks import NullSink
+
+
+def _elements(**overrides):
+    rows = {
+        1: {"id": 1, "now_cost": 50, "news": "", "selected_by_percent": "1.0"},
+        2: {"id": 2, "now_cost": 60, "news": "", "selected_by_percent": "2.0"},
+    }
+    for element_id, changes in overrides.items():
+        rows[int(element_id[1:])].update(changes)
+    return list(rows.values())
+
+
+def test_first_fetch_stores_every_row(tmp_path):
+    tracker = Scd2Tracker(str(tmp_path / "state.json"))
+
+    changes = tracker.diff({"elements": _elements()})
+
+    assert [r["id"] for r in changes.records["elements"]] == [1, 2]
+    assert not any(r["is_deleted"] for r in changes.records["elements"])
+
+
+def test_only_changed_rows_are_stored(tmp_path):
+    tracker = Scd2Tracker(str(tmp_path / "state.json"))
+    tracker.commit(tracker.diff({"elements": _elements()}))
+
+    changes = tracker.diff({"elements": _elements(
+        e1={"now_cost": 51},
+        e2={"selected_by_percent": "9.9"}
+    )})
+
+    records = changes.records["elements"]
+    assert [(r["id"], r["data"]["now_cost"]) for r in records] == [(1, 51)]
+
+
+def test_removed_rows_are_closed_with_a_tombstone(tmp_path):
+    tracker = Scd2Tracker(str(tmp_path / "state.json"))
+    tracker.commit(tracker.diff({"elements": _elements()}))
+
+    changes = tracker.diff({"elements": _elements()[:1]})
+
+    assert changes.records["elements"] == [{
+        "id": 2,
+        "valid_from": changes.valid_from,
+        "is_deleted": True,
+        "row_hash": None,
+        "data": None,
+    }]
+
+
+def test_uncommitted_changes_are_diffed_again(tmp_path):
+    tracker = Scd2Tracker(str(tmp_path / "state.json"))
+    tracker.commit(tracker.diff({"elements": _elements()}))
+
+    tracker.diff({"elements": _elements(e1={"news": "Knock"})})
+    changes = tracker.diff({"elements": _elements(e1={"news": "Knock"})})
+
+    assert [r["id"] for r in changes.records["elements"]] == [1]
+
+
+def test_event_selection_stats_do_not_count_as_changes(tmp_path):
+    tracker = Scd2Tracker(str(tmp_path / "state.json"))
+    event = {"id": 1, "finished": False, "most_selected": 10,
+             "transfers_made": 100, "chip_plays": []}
+    tracker.commit(tracker.diff({"events": [event]}))
+
+    changes = tracker.diff({"events": [dict(
+        event, most_selected=11, transfers_made=250,
+        chip_plays=[{"chip_name": "bboost", "num_played": 5}])]})
+    assert changes.records["events"] == []
+
+    changes = tracker.diff({"events": [dict(event, finished=True)]})
+    assert [r["id"] for r in changes.records["events"]] == [1]
+
+
+@patch("etl.upload.sinks.create_scd2_view")
+@patch("etl.upload.sinks.append_scd2_rows_from_gcs_to_bigquery")
+@patch("etl.upload.sinks.upload_bytes_to_gcs")
+@patch("etl.process.bootstrap_history.fetch_bootstrap_static")
+def test_tables_appended_before_a_failure_are_committed(
+        mock_fetch, mock_upload, mock_append, mock_view, tmp_path,
+        monkeypatch):
+    state_path = str(tmp_path / "state.json")
+    monkeypatch.setenv("SCD2_STATE_PATH", state_path)
+    monkeypatch.delenv("SINK", raising=False)
+    mock_fetch.return_value = {"elements": _elements(),
+                               "teams": [{"id": 1, "name": "ARS"}]}
+    mock_append.side_effect = [None, RuntimeError("load failed")]
+
+    with pytest.raises(RuntimeError):
+        ingest_bootstrap_static_history(
+            "project", "bucket", "dataset", tables=["elements", "teams"])
+
+    state = Scd2Tracker(state_path).load_state()
+    assert set(state) == {"elements"}
+    assert mock_append.call_args_list[0].kwargs["table_id"] == \
+        "bootstrap_elements_history"
+
+
+@patch("etl.process.bootstrap_history.fetch_bootstrap_static")
+def test_local_sink_stores_records_and_state_under_sink_dir(
+        mock_fetch, tmp_path, monkeypatch):
+    monkeypatch.setenv("SINK", "local")
+    monkeypatch.setenv("SINK_DIR", str(tmp_path))
+    monkeypatch.delenv("SCD2_STATE_PATH", raising=False)
+    mock_fetch.return_value = {"teams": [{"id": 1, "name": "ARS"}]}
+
+    counts = ingest_bootstrap_static_history(
+        None, None, None, tables=["teams"])
+
+    assert counts == {"teams": 1}
+    [records] = (tmp_path / "bootstrap_static").glob(
+        "*/bootstrap_teams_history_teams.json")
+    assert json.loads(records.read_text())["data"] == {"id": 1, "name": "ARS"}
+    state = Scd2Tracker(str(
+        tmp_path / "bootstrap_static" / "_scd2_state.json")).load_state()
+    assert set(state) == {"teams"}
+
+
+@patch("etl.process.bootstrap_history.fetch_bootstrap_static")
+def test_null_sink_leaves_the_state_alone(mock_fetch, tmp_path, monkeypatch):
+    state_path = str(tmp_path / "state.json")
+    monkeypatch.setenv("SCD2_STATE_PATH", state_path)
+    mock_fetch.return_value = {"teams": [{"id": 1, "name": "ARS"}]}
+
+    counts = ingest_bootstrap_static_history(
+        None, None, None, tables=["teams"], sink=NullSink())
+
+    assert counts == {"teams": 1}
+    assert Scd2Tracker(state_path).load_state() == {}
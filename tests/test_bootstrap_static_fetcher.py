@@ -1,3 +1,6 @@
+import os
+import runpy
+
 import requests
 from unittest.mock import patch, MagicMock
 import pytest
@@ -20,7 +23,7 @@ def test_fetch_success(mock_get, sample_bootstrap_data):
     data = fetcher.run()
 
     assert data == sample_bootstrap_data
-    mock_get.assert_called_once_with(fetcher.URL)
+    mock_get.assert_called_once_with(fetcher.URL, timeout=fetcher.timeout)
     assert isinstance(data, dict)
     assert "elements" in data
     assert "teams" in data
@@ -71,3 +74,31 @@ def test_fetch_bootstrap_static(mock_internal_fetch):
 
     fetch_bootstrap_static(force_refresh=True)
     mock_internal_fetch.cache_clear.assert_called_once()
+
+
+@patch("etl.fetch.bootstrap_static.fetch_bootstrap_static",
+       side_effect=requests.exceptions.Timeout("timed out"))
+def test_gunicorn_warm_up_continues_after_a_failed_fetch(mock_fetch):
+    conf = runpy.run_path(os.path.join(
+        os.path.dirname(os.path.dirname(__file__)), "gunicorn.conf.py"))
+    server = MagicMock()
+
+    conf["when_ready"](server)
+
+    assert "timed out" in server.log.warning.call_args.args[0]
+    server.log.info.assert_not_called()
+
+
+@pytest.mark.parametrize("sink", ["local", "null"])
+@patch("etl.upload.bigquery.get_bigquery_client")
+@patch("etl.upload.storage.get_storage_client")
+def test_gunicorn_workers_only_create_gcp_clients_for_the_gcs_sink(
+        mock_storage, mock_bigquery, sink, monkeypatch):
+    monkeypatch.setenv("SINK", sink)
+    conf = runpy.run_path(os.path.join(
+        os.path.dirname(os.path.dirname(__file__)), "gunicorn.conf.py"))
+
+    conf["post_fork"](MagicMock(), MagicMock())
+
+    mock_storage.assert_not_called()
+    mock_bigquery.assert_not_called()
@@ -0,0 +1,114 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from etl.fetch import ElementSummaryFetcher
+from etl.fetch.circuit_breaker import (
+    CircuitBreaker,
+    CircuitOpenError,
+    GameUpdatingError,
+    check_gameweek_settled
+)
+
+
+def test_trips_after_consecutive_failures_only():
+    breaker = CircuitBreaker(failure_threshold=3)
+
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert not breaker.is_open
+
+    breaker.record_failure()
+    assert breaker.is_open
+
+
+def test_pauses_until_a_probe_succeeds():
+    probes = iter([False, True])
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=0.01,
+                             probe=lambda: next(probes))
+    breaker.record_failure()
+
+    breaker.before_request()
+
+    assert not breaker.is_open
+
+
+def test_gives_up_after_max_pause():
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=0.01,
+                             max_pause=0.05, probe=lambda: False)
+    breaker.record_failure()
+
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+    with pytest.raises(CircuitOpenError):
+        breaker.raise_if_open()
+
+
+class _Response:
+    def __init__(self, status, payload=None):
+        self.status = status
+        self.payload = payload
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def json(self):
+        return self.payload
+
+
+def test_player_is_retried_once_the_api_is_back(element_summary_data):
+    probe = MagicMock(return_value=True)
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=0.01, probe=probe)
+    session = MagicMock()
+    session.get.side_effect = [_Response(503),
+                               _Response(200, element_summary_data)]
+    fetcher = ElementSummaryFetcher([7], circuit_breaker=breaker)
+
+    result = asyncio.run(fetcher.fetch_player(session, 7))
+
+    assert "error" not in result
+    assert result["history"] == [
+        {"element": 7, "data": element_summary_data["history"][0]}]
+    probe.assert_called_once()
+
+
+@patch("etl.fetch.element_summary.random.uniform",
+       side_effect=lambda low, high: high)
+def test_503s_are_retried_after_a_growing_jittered_wait(
+        mock_uniform, element_summary_data):
+    breaker = CircuitBreaker(failure_threshold=5)
+    session = MagicMock()
+    session.get.side_effect = [_Response(503), _Response(503),
+                               _Response(200, element_summary_data)]
+    fetcher = ElementSummaryFetcher([7], circuit_breaker=breaker)
+
+    with patch("etl.fetch.element_summary.asyncio.sleep",
+               new_callable=AsyncMock) as mock_sleep:
+        result = asyncio.run(fetcher.fetch_player(session, 7))
+
+    assert "error" not in result
+    assert [c.args[0] for c in mock_sleep.call_args_list] == [
+        fetcher.RETRY_BACKOFF, fetcher.RETRY_BACKOFF * 2]
+    assert [c.args for c in mock_uniform.call_args_list] == [
+        (0, fetcher.RETRY_BACKOFF), (0, fetcher.RETRY_BACKOFF * 2)]
+
+
+def test_finished_gameweek_waits_for_data_check():
+    events = [
+        {"id": 1, "is_current": False, "finished": True,
+         "data_checked": True},
+        {"id": 2, "is_current": True, "finished": True,
+         "data_checked": False},
+    ]
+    with pytest.raises(GameUpdatingError):
+        check_gameweek_settled(events)
+
+    events[1]["data_checked"] = True
+    check_gameweek_settled(events)
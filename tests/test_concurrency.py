@@ -0,0 +1,110 @@
+import asyncio
+import threading
+
+from etl.utils.concurrency import AdaptiveConcurrencyLimiter
+
+
+def _limiter(**kwargs):
+    kwargs.setdefault("cpu_usage", lambda: 0.1)
+    return AdaptiveConcurrencyLimiter(
+        name="test", initial_limit=8, min_limit=1, max_limit=64,
+        latency_target=0.2, min_window=8, **kwargs)
+
+
+def _window(limiter, latency, ok=True):
+    """Complete one window of requests that kept the limit in use."""
+    for _ in range(limiter.limit):
+        limiter.acquire()
+    # As if they had all taken `latency` side by side
+    limiter._busy_since -= latency
+    for _ in range(limiter.limit):
+        limiter.release(latency, ok)
+
+
+def test_grows_under_target_and_backs_off_over_it():
+    limiter = _limiter()
+    for _ in range(10):
+        _window(limiter, 0.1)
+    grown = limiter.limit
+    assert grown > 8
+
+    for _ in range(10):
+        _window(limiter, 0.8)
+    assert limiter.limit < grown
+
+
+def test_errors_halve_and_cpu_holds_the_limit():
+    limiter = _limiter()
+    _window(limiter, 0.1, ok=False)
+    assert limiter.limit < 8
+
+    busy = _limiter(cpu_usage=lambda: 0.99)
+    for _ in range(5):
+        _window(busy, 0.1)
+    assert busy.limit == 8
+
+
+def test_idle_time_between_runs_does_not_hold_the_limit(monkeypatch):
+    clock = [0.0]
+    monkeypatch.setattr("etl.utils.concurrency.time.monotonic",
+                        lambda: clock[0])
+    limiter = AdaptiveConcurrencyLimiter(
+        name="test", initial_limit=2, latency_target=0.2, min_window=1,
+        cpu_usage=lambda: 0.1)
+
+    # One upload per run, an hour apart, so a window spans two runs
+    for _ in range(2):
+        limiter.acquire()
+        clock[0] += 0.1
+        limiter.release(0.1)
+        clock[0] += 3600
+
+    assert limiter._estimate > 2
+
+
+def test_async_acquire_bounds_requests_in_flight_across_loops():
+    limiter = AdaptiveConcurrencyLimiter(
+        name="test", initial_limit=3, min_limit=3, max_limit=3)
+    peak = []
+
+    async def request():
+        await limiter.acquire_async()
+        peak.append(limiter.in_flight)
+        await asyncio.sleep(0.001)
+        limiter.release(0.001)
+
+    async def fetch_all():
+        await asyncio.gather(*(request() for _ in range(20)))
+
+    threads = [threading.Thread(target=asyncio.run, args=(fetch_all(),))
+               for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(peak) == 60
+    assert max(peak) <= 3
+    assert limiter.in_flight == 0
+
+
+def test_waiter_on_a_closed_loop_gives_its_slot_back():
+    limiter = AdaptiveConcurrencyLimiter(
+        name="test", initial_limit=1, max_limit=1, cpu_usage=lambda: 0.1)
+    limiter.acquire()
+
+    closed_loop = asyncio.new_event_loop()
+    closed_loop.close()
+    waiter = threading.Thread(target=limiter.acquire, daemon=True)
+    # A waiter whose event loop closed before it was granted a slot
+    limiter._try_acquire(
+        lambda: closed_loop.call_soon_threadsafe(lambda: None))
+    waiter.start()
+    while len(limiter._waiters) < 2:
+        pass
+
+    limiter.release(0.1)
+    waiter.join(timeout=5)
+
+    assert not waiter.is_alive()
+    assert limiter.in_flight == 1
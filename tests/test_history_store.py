@@ -0,0 +1,68 @@
+import pytest
+
+from etl.history import PlayerHistoryStore
+
+
+def _match(round_, minutes, points, kickoff_time):
+    return {"fixture": round_ * 10, "round": round_, "minutes": minutes,
+            "total_points": points, "kickoff_time": kickoff_time,
+            "was_home": True, "expected_goals": "0.25"}
+
+
+def _results(history_by_element):
+    return {
+        "history": [{"element": element, "data": row}
+                    for element, rows in history_by_element.items()
+                    for row in rows],
+        "fixtures": [],
+        "errors": [],
+    }
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = PlayerHistoryStore(str(tmp_path / "history.sqlite3"))
+    store.apply_results(_results({
+        1: [_match(1, 90, 2, "2024-08-17T14:00:00Z"),
+            _match(2, 90, 12, "2024-08-24T14:00:00Z"),
+            _match(3, 45, 1, "2024-09-01T14:00:00Z")],
+        2: [_match(1, 90, 6, "2024-08-17T14:00:00Z"),
+            _match(2, 30, 1, "2024-08-24T14:00:00Z")],
+    }))
+    yield store
+    store.close()
+
+
+def test_history_projects_and_paginates(store):
+    page = store.history(1, columns=["round", "total_points"], page_size=2)
+
+    assert page["rows"] == [{"round": 3, "total_points": 1},
+                            {"round": 2, "total_points": 12}]
+    assert page["total"] == 3
+    assert store.history(1, page=2, page_size=2)["rows"][0]["round"] == 1
+    assert store.history(1, columns=["was_home", "expected_goals"],
+                         round_to=1)["rows"] == [
+        {"was_home": 1, "expected_goals": 0.25}]
+
+
+def test_totals_filter_and_rank(store):
+    august = store.totals(columns=["minutes", "matches"], order_by="minutes",
+                          since="2024-08-01", until="2024-09-01")
+
+    assert august["players"] == [
+        {"element": 1, "minutes": 180, "matches": 2},
+        {"element": 2, "minutes": 120, "matches": 2}]
+    assert store.totals(min_minutes=150)["total"] == 1
+    with pytest.raises(ValueError):
+        store.totals(order_by="data")
+
+
+def test_update_replaces_only_the_players_in_it(store):
+    version = store.version
+    store.apply_results(_results({2: [_match(1, 90, 6,
+                                             "2024-08-17T14:00:00Z")]}))
+
+    assert store.version > version
+    assert store.history(2)["total"] == 1
+    assert store.history(1)["total"] == 3
+    assert len(store) == 4
@@ -0,0 +1,57 @@
+import os
+import re
+import sys
+import subprocess
+
+import pytest
+
+# Cumulative `import app` budget in microseconds, overridable for slow
+# machines
+IMPORT_TIME_BUDGET_US = int(os.getenv("IMPORT_TIME_BUDGET_MS", "750")) * 1000
+
+# Modules that must only be loaded when first used
+LAZY_MODULES = [
+    "google.cloud.storage",
+    "google.cloud.bigquery",
+    "google.cloud.logging_v2",
+    "aiohttp",
+]
+
+IMPORT_TIME_LINE = re.compile(
+    r"import time:\s+\d+ \|\s+(\d+) \|\s+(\S+)")
+
+
+@pytest.fixture(scope="module")
+def app_import_times():
+    """Cumulative import time in microseconds of each module imported by
+    `import app`, as reported by -X importtime."""
+    env = dict(
+        os.environ,
+        PROJECT_ID="project",
+        BUCKET_ID="bucket",
+        DATASET_ID="dataset",
+        LOCAL_ENV="true",
+    )
+    env.pop("BOOTSTRAP_SNAPSHOT_PATH", None)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        cwd=root, env=env, capture_output=True, text=True, check=True
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match:
+            times[match.group(2)] = int(match.group(1))
+    return times
+
+
+@pytest.mark.parametrize("module", LAZY_MODULES)
+def test_heavy_modules_not_imported_at_startup(app_import_times, module):
+    assert module not in app_import_times
+
+
+def test_app_import_within_budget(app_import_times):
+    assert app_import_times["app"] <= IMPORT_TIME_BUDGET_US, (
+        f"import app took {app_import_times['app'] / 1000:.0f}ms, "
+        f"budget is {IMPORT_TIME_BUDGET_US / 1000:.0f}ms")
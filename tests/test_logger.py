@@ -0,0 +1,69 @@
+import logging
+import threading
+
+from log.logger import DeferredQueueHandler, SamplingFilter
+
+
+def _record(msg, args=(), level=logging.INFO):
+    return logging.LogRecord("etl", level, __file__, 1, msg, args, None)
+
+
+def test_sampling_filter_limits_each_template(monkeypatch):
+    clock = [0.0]
+    monkeypatch.setattr("log.logger.time.monotonic", lambda: clock[0])
+    sampler = SamplingFilter(burst=2, interval=60)
+
+    passed = [sampler.filter(_record("Fetched player %s", (i,)))
+              for i in range(5)]
+    assert passed == [True, True, False, False, False]
+    # Other templates and warnings are not affected
+    assert sampler.filter(_record("Other %s", (1,)))
+    assert sampler.filter(_record("Failed %s", (1,), logging.WARNING))
+    assert sampler.suppressed == 3
+
+    clock[0] = 61.0
+    assert sampler.filter(_record("Fetched player %s", (6,)))
+
+
+def test_sampling_filter_passes_non_string_messages():
+    sampler = SamplingFilter(burst=1, interval=60)
+
+    passed = [sampler.filter(_record({"event": "fetched", "player": i}))
+              for i in range(3)]
+
+    assert passed == [True, True, True]
+    assert sampler.suppressed == 0
+
+
+def test_sampling_filter_counts_exactly_across_threads():
+    sampler = SamplingFilter(burst=100, interval=60)
+    passed = []
+
+    def log_many():
+        passed.append(sum(sampler.filter(_record("Fetched player %s", (i,)))
+                          for i in range(2000)))
+
+    threads = [threading.Thread(target=log_many) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sum(passed) == 100
+    assert sampler.suppressed == 8 * 2000 - 100
+
+
+def test_deferred_queue_handler_does_not_format():
+    enqueued = []
+
+    class ListQueue:
+        def put_nowait(self, record):
+            enqueued.append(record)
+
+    handler = DeferredQueueHandler(ListQueue())
+    record = _record("Fetched player %s", (1,))
+    handler.handle(record)
+
+    assert enqueued[0] is record
+    assert record.msg == "Fetched player %s"
+    assert record.args == (1,)
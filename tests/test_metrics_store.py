@@ -0,0 +1,138 @@
+from etl.metrics import (
+    PlayerMetricsStore,
+    get_metrics_store,
+    save_metrics_store
+)
+from etl.metrics import store as metrics_store_module
+
+
+def _history(*points, minutes=90):
+    return [{"total_points": p, "minutes": minutes, "expected_goals": "0.5"}
+            for p in points]
+
+
+def _results(history_by_element, fixtures_by_element=None):
+    return {
+        "history": [{"element": element, "data": row}
+                    for element, rows in history_by_element.items()
+                    for row in rows],
+        "fixtures": [{"element": element, "data": row}
+                     for element, rows in (fixtures_by_element or {}).items()
+                     for row in rows],
+        "errors": [],
+    }
+
+
+def test_rolling_and_season_metrics():
+    store = PlayerMetricsStore(window=3)
+    store.apply_results(_results(
+        {1: _history(2, 6, 1, 8)},
+        {1: [{"difficulty": 2}, {"difficulty": 4}, {"difficulty": 5},
+             {"difficulty": 5}]}
+    ))
+
+    metrics = store.get(1)
+    assert metrics["total_points"] == 17
+    assert metrics["points_per_90"] == 4.25
+    assert metrics["form"] == 5
+    assert metrics["rolling_xg"] == 1.5
+    assert metrics["fixture_difficulty"] == 3.667
+    assert store.get(2) is None
+
+
+def test_updates_match_a_full_recompute():
+    incremental = PlayerMetricsStore(window=2)
+    incremental.apply_history(1, _history(2, 6))
+    # The last match was still in progress and has since changed
+    incremental.apply_history(1, _history(2, 9, 3))
+    incremental.apply_history(1, _history(2, 9, 3, 1))
+
+    full = PlayerMetricsStore(window=2)
+    full.apply_history(1, _history(2, 9, 3, 1))
+
+    assert incremental.get(1) == full.get(1)
+    assert incremental.get(1)["form"] == 2
+
+
+def test_corrected_earlier_rows_are_recomputed():
+    incremental = PlayerMetricsStore(window=2)
+    incremental.apply_history(1, _history(2, 6, 1))
+    # Bonus points of the first match were awarded late
+    incremental.apply_history(1, _history(5, 6, 1, 4))
+
+    full = PlayerMetricsStore(window=2)
+    full.apply_history(1, _history(5, 6, 1, 4))
+
+    assert incremental.get(1) == full.get(1)
+    assert incremental.get(1)["total_points"] == 16
+
+
+def test_fewer_rows_start_a_new_season():
+    store = PlayerMetricsStore()
+    store.apply_history(1, _history(5, 5, 5))
+    store.apply_history(1, _history(1))
+
+    assert store.get(1)["total_points"] == 1
+
+
+def test_top_players(tmp_path):
+    store = PlayerMetricsStore()
+    store.apply_results(_results({
+        1: _history(2, 2),
+        2: _history(9, 9),
+        3: _history(20, minutes=10),
+    }))
+
+    assert store.top("total_points", n=2) == [
+        {"element": 3, "value": 20}, {"element": 2, "value": 18}]
+    assert [p["element"] for p in store.top(
+        "total_points", n=2, min_minutes=100)] == [2, 1]
+
+    path = str(tmp_path / "metrics.bin")
+    store.save(path)
+    loaded = PlayerMetricsStore.load(path)
+    assert loaded.get_many([1, 4]) == store.get_many([1, 4])
+    assert loaded.version == store.version
+
+
+def test_a_run_saves_its_store_after_another_worker_saved(
+        tmp_path, monkeypatch):
+    path = str(tmp_path / "metrics.bin")
+    monkeypatch.setenv("METRICS_SNAPSHOT_PATH", path)
+    monkeypatch.setattr(metrics_store_module, "_metrics_store", None)
+    monkeypatch.setattr(metrics_store_module, "_metrics_store_mtime", 0.0)
+
+    # This worker starts a run...
+    run_store = get_metrics_store()
+    # ...while another worker finishes one and saves its store
+    other_store = PlayerMetricsStore()
+    other_store.apply_results(_results({2: _history(5)}))
+    other_store.save(path)
+    # This worker's run then applies its results and saves in turn
+    run_store.apply_results(_results({1: _history(3)}))
+    save_metrics_store(run_store)
+
+    saved = PlayerMetricsStore.load(path)
+    assert 1 in saved
+    # The other worker's update is merged rather than overwritten
+    assert saved.get(2) == other_store.get(2)
+    assert get_metrics_store() is run_store
+
+
+def test_a_save_keeps_its_own_update_of_a_player_another_worker_saved(
+        tmp_path, monkeypatch):
+    path = str(tmp_path / "metrics.bin")
+    monkeypatch.setenv("METRICS_SNAPSHOT_PATH", path)
+    monkeypatch.setattr(metrics_store_module, "_metrics_store", None)
+    monkeypatch.setattr(metrics_store_module, "_metrics_store_mtime", 0.0)
+
+    run_store = get_metrics_store()
+    other_store = PlayerMetricsStore()
+    other_store.apply_results(_results({1: _history(2), 2: _history(5)}))
+    other_store.save(path)
+    run_store.apply_results(_results({1: _history(3, 4)}))
+    save_metrics_store(run_store)
+
+    saved = PlayerMetricsStore.load(path)
+    assert saved.get(1)["total_points"] == 7
+    assert saved.get(2)["total_points"] == 5
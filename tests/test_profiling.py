@@ -0,0 +1,117 @@
+import json
+import time
+import threading
+import tracemalloc
+from unittest.mock import patch
+
+from etl.process.element_summary import (
+    fetch_and_upload_element_summary,
+    write_profile
+)
+from etl.utils.profiling import PipelineProfiler, StackSampler
+
+
+def _busy_allocate():
+    blocks = []
+    deadline = time.perf_counter() + 0.1
+    while time.perf_counter() < deadline:
+        blocks.append(bytearray(10_000))
+    return blocks
+
+
+def test_stage_reports_memory_and_cpu_samples(tmp_path):
+    profiler = PipelineProfiler(enabled=True, interval=0.001)
+
+    with profiler.stage("fetch"):
+        blocks = _busy_allocate()
+
+    stage = profiler.report()["stages"][0]
+    assert stage["stage"] == "fetch"
+    assert stage["peak_bytes"] >= 10_000 * len(blocks)
+    assert "test_profiling.py" in stage["top_allocators"][0]["location"]
+    assert any(stack.startswith("fetch;")
+               and "_busy_allocate" in stack
+               for stack in profiler.sampler.stacks)
+
+    locations = profiler.write(str(tmp_path))
+    report_path = next(p for p in locations if p.endswith(".json"))
+    with open(report_path) as f:
+        assert json.load(f)["stages"][0]["stage"] == "fetch"
+
+
+def test_disabled_profiler_does_nothing(tmp_path):
+    profiler = PipelineProfiler(enabled=False)
+
+    with profiler.stage("fetch"):
+        pass
+
+    assert profiler.stages == []
+    assert profiler.write(str(tmp_path)) == []
+    assert not any(tmp_path.iterdir())
+
+
+def test_overlapping_stages_keep_tracemalloc_running():
+    first = PipelineProfiler(enabled=True)
+    second = PipelineProfiler(enabled=True)
+
+    first_stage = first.stage("fetch")
+    second_stage = second.stage("fetch")
+
+    first_stage.__enter__()
+    second_stage.__enter__()
+    first_stage.__exit__(None, None, None)
+    assert tracemalloc.is_tracing()
+    second_stage.__exit__(None, None, None)
+    assert not tracemalloc.is_tracing()
+
+
+def test_sampler_skips_idle_threads():
+    idle = threading.Event()
+    waiter = threading.Thread(target=idle.wait, name="idle")
+    waiter.start()
+    sampler = StackSampler(interval=0.001)
+
+    sampler.start()
+    _busy_allocate()
+    sampler.stop()
+    idle.set()
+    waiter.join()
+
+    assert sampler.stacks
+    assert not any(stack.split(";")[-1].startswith("threading:wait:")
+                   for stack in sampler.stacks)
+
+
+@patch("etl.process.element_summary.get_element_summary_for_teams")
+@patch("etl.process.element_summary.load_run_bootstrap_static",
+       return_value={"teams": [{"id": 1}]})
+def test_failed_profile_write_does_not_fail_the_run(
+        mock_bootstrap, mock_fetch, element_summary_data, caplog):
+    mock_fetch.return_value = element_summary_data
+
+    with patch.object(PipelineProfiler, "write",
+                      side_effect=OSError("read-only")):
+        report = fetch_and_upload_element_summary(
+            project_id=None,
+            bucket_name=None,
+            dataset_id=None,
+            replay_gameweek=1,
+            dry_run=True,
+            profile=True
+        )
+
+    assert report["sink"] == "null"
+    assert "read-only" in caplog.text
+
+
+def test_profile_without_a_bucket_is_written_under_sink_dir(
+        tmp_path, monkeypatch):
+    monkeypatch.delenv("PROFILE_OUTPUT", raising=False)
+    monkeypatch.setenv("SINK_DIR", str(tmp_path))
+    profiler = PipelineProfiler(enabled=True)
+    with profiler.stage("fetch"):
+        pass
+
+    write_profile(profiler, bucket_name=None)
+
+    assert len(list((tmp_path / "profiles").iterdir())) == 2
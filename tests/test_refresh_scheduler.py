@@ -0,0 +1,67 @@
+from etl.process.element_summary import (
+    failed_element_ids,
+    plan_changed_only_refresh
+)
+from etl.process.refresh_scheduler import RefreshScheduler
+
+
+def _elements(points_by_id):
+    return [{"id": element_id, "team": 1 if element_id <= 3 else 2,
+             "total_points": points, "minutes": 0}
+            for element_id, points in points_by_id.items()]
+
+
+def test_first_run_fetches_everyone(tmp_path):
+    scheduler = RefreshScheduler(str(tmp_path / "state.json"), sweep_size=2)
+
+    plan = scheduler.plan(_elements({1: 0, 2: 0, 3: 0}))
+
+    assert plan.changed_ids == [1, 2, 3]
+    assert plan.sweep_ids == []
+
+
+def test_only_changed_players_and_a_rotating_sweep(tmp_path):
+    scheduler = RefreshScheduler(str(tmp_path / "state.json"), sweep_size=2)
+    points = {1: 0, 2: 0, 3: 0, 4: 0, 5: 0}
+    scheduler.commit(scheduler.plan(_elements(points)))
+
+    points[3] = 6
+    plan = scheduler.plan(_elements(points))
+    assert plan.changed_ids == [3]
+    assert plan.sweep_ids == [1, 2]
+    scheduler.commit(plan)
+
+    plan = scheduler.plan(_elements(points))
+    assert plan.changed_ids == []
+    assert plan.sweep_ids == [3, 4]
+    scheduler.commit(plan)
+
+    # The sweep wraps around to the start
+    assert scheduler.plan(_elements(points)).sweep_ids == [5, 1]
+
+
+def test_failed_players_are_retried(tmp_path):
+    scheduler = RefreshScheduler(str(tmp_path / "state.json"), sweep_size=0)
+    elements = _elements({1: 0, 2: 0, 4: 0})
+    plan = scheduler.plan(elements)
+
+    # Player 2 failed and team 2 failed outright
+    failed = failed_element_ids(plan, elements, {1: [2], 2: None})
+    assert failed == [2, 4]
+    scheduler.commit(plan, failed)
+
+    assert scheduler.plan(elements).changed_ids == [2, 4]
+
+
+def test_each_team_is_planned_its_own_players(tmp_path, monkeypatch):
+    monkeypatch.setenv("REFRESH_STATE_PATH", str(tmp_path / "state.json"))
+    monkeypatch.setenv("REFRESH_SWEEP_SIZE", "0")
+    elements = _elements({1: 0, 2: 0, 4: 0, 5: 0})
+
+    _, plan, team_element_ids, run_folder = plan_changed_only_refresh(
+        elements, team_ids=[1, 2, 3], element_ids=[1, 4, 5],
+        bucket_name="bucket", destination_folder="element_summary")
+
+    assert plan.element_ids == [1, 4, 5]
+    assert team_element_ids == {1: [1], 2: [4, 5]}
+    assert run_folder.startswith("element_summary/incremental/")
@@ -0,0 +1,104 @@
+import gzip
+import json
+import importlib
+from unittest.mock import patch, MagicMock
+
+import pytest
+
+from response_cache import ResponseCache
+
+
+def test_get_or_build_caches_per_payload_and_version():
+    cache = ResponseCache()
+    build = MagicMock(return_value={"elements": [1, 2]})
+
+    first = cache.get_or_build("endpoint", {"team_id": 1}, 1, build)
+    second = cache.get_or_build("endpoint", {"team_id": 1}, 1, build)
+    assert first is second
+    build.assert_called_once()
+
+    cache.get_or_build("endpoint", {"team_id": 1}, 2, build)
+    cache.get_or_build("endpoint", {"team_id": 2}, 2, build)
+    assert build.call_count == 3
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResponseCache(maxsize=2)
+    build = MagicMock(return_value={})
+
+    for team_id in (1, 2, 1, 3):
+        cache.get_or_build("endpoint", {"team_id": team_id}, 1, build)
+    cache.get_or_build("endpoint", {"team_id": 1}, 1, build)
+    cache.get_or_build("endpoint", {"team_id": 2}, 1, build)
+
+    # 1, 2 and 3 built once each, then 2 again after it was evicted
+    assert build.call_count == 4
+
+
+def test_negotiate():
+    cache = ResponseCache(min_gzip_size=0)
+    cached = cache.encode({"elements": list(range(100))})
+
+    status, body, headers = cache.negotiate(cached, "", "gzip, br")
+    assert status == 200
+    assert headers["Content-Encoding"] == "gzip"
+    assert json.loads(gzip.decompress(body)) == {"elements": list(range(100))}
+
+    status, body, headers = cache.negotiate(cached, "", "")
+    assert (status, body) == (200, cached.body)
+    assert "Content-Encoding" not in headers
+
+    status, body, headers = cache.negotiate(cached, cached.etag, "gzip")
+    assert (status, body, headers["ETag"]) == (304, b"", cached.etag)
+
+    status, body, _ = cache.negotiate(cached, cached.etag, "", "POST")
+    assert (status, body) == (200, cached.body)
+
+
+@pytest.fixture
+def flask_client(monkeypatch):
+    monkeypatch.setenv("PROJECT_ID", "project")
+    monkeypatch.setenv("BUCKET_ID", "bucket")
+    monkeypatch.setenv("DATASET_ID", "dataset")
+    monkeypatch.setenv("LOCAL_ENV", "true")
+    app_module = importlib.import_module("app")
+    importlib.import_module("handlers").response_cache = ResponseCache()
+    return app_module.app.test_client()
+
+
+@patch("handlers.bootstrap_static_version", return_value=1)
+@patch("handlers.get_elements_from_teams",
+       return_value={1: [1, 5], 2: [2]})
+def test_batched_endpoint_conditional_get(mock_get, mock_version,
+                                          flask_client):
+    response = flask_client.post("/get-elements-from-teams", json={})
+    assert response.status_code == 200
+    assert response.get_json() == {"teams": {"1": [1, 5], "2": [2]}}
+    mock_get.assert_called_once_with(None)
+
+    etag = response.headers["ETag"]
+    response = flask_client.get("/get-elements-from-teams",
+                                headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    mock_get.assert_called_once()
+
+    # POST requests are never conditional
+    response = flask_client.post("/get-elements-from-teams", json={},
+                                 headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.get_json() == {"teams": {"1": [1, 5], "2": [2]}}
+
+
+@patch("handlers.get_metrics_store")
+def test_get_reads_list_parameters_from_the_query_string(mock_store,
+                                                         flask_client):
+    mock_store.return_value = MagicMock(
+        version=1, get_many=lambda ids, metrics: {"ids": ids})
+
+    response = flask_client.get(
+        "/get-player-metrics?element_ids=1,2&element_ids=3")
+
+    assert response.status_code == 200
+    assert response.get_json() == {"ids": [1, 2, 3]}
+    assert flask_client.get(
+        "/get-player-metrics?element_ids=x").status_code == 400
@@ -0,0 +1,82 @@
+from unittest.mock import MagicMock, patch
+
+from etl.fetch.shared_snapshot import (
+    SharedBootstrapSnapshot,
+    get_shared_snapshot
+)
+from etl.process.element_summary import build_element_summary_fetcher
+
+
+def _tables(cost):
+    return {
+        "elements": [
+            {"id": 1, "team": 1, "now_cost": cost},
+            {"id": 2, "team": 2, "now_cost": cost},
+            {"id": 5, "team": 1, "now_cost": cost},
+        ],
+        "teams": [{"id": 1}, {"id": 2}],
+    }
+
+
+def test_load_fetches_once_and_serves_index(tmp_path):
+    path = str(tmp_path / "bootstrap.snapshot")
+    fetch = MagicMock(return_value=_tables(50))
+
+    snapshot = SharedBootstrapSnapshot(path)
+    tables = snapshot.load(fetch)
+    # A second process mapping the same file does not fetch again
+    other_worker = SharedBootstrapSnapshot(path)
+    other_tables = other_worker.load(fetch)
+
+    fetch.assert_called_once()
+    assert tables["teams"] == [{"id": 1}, {"id": 2}]
+    assert dict(other_tables) == _tables(50)
+    assert other_worker.team_elements(1) == [1, 5]
+    assert other_worker.team_elements(3) == []
+
+
+def test_readers_pick_up_swapped_version(tmp_path):
+    path = str(tmp_path / "bootstrap.snapshot")
+    writer = SharedBootstrapSnapshot(path)
+    reader = SharedBootstrapSnapshot(path)
+
+    writer.publish(_tables(50))
+    first_version = reader.version
+    assert reader.table("elements")[0]["now_cost"] == 50
+
+    writer.load(MagicMock(return_value=_tables(55)), force_refresh=True)
+
+    assert reader.version > first_version
+    assert reader.table("elements")[0]["now_cost"] == 55
+
+
+def test_tables_are_decoded_on_demand_and_not_kept(tmp_path):
+    path = str(tmp_path / "bootstrap.snapshot")
+    writer = SharedBootstrapSnapshot(path)
+    reader = SharedBootstrapSnapshot(path)
+    writer.publish(_tables(50))
+
+    elements = reader.load(MagicMock())["elements"]
+    assert reader.table("elements") is not elements
+    assert reader.table("elements") == elements
+    assert reader.element_teams() == {1: 1, 2: 2, 5: 1}
+
+    tables = _tables(55)
+    tables["elements"][1]["team"] = 1
+    writer.publish(tables)
+    assert reader.table("elements")[0]["now_cost"] == 55
+    assert reader.element_teams() == {1: 1, 2: 1, 5: 1}
+    assert reader.team_elements(1) == [1, 2, 5]
+
+
+def test_fetcher_selects_players_from_the_index(tmp_path, monkeypatch):
+    path = str(tmp_path / "bootstrap.snapshot")
+    monkeypatch.setenv("BOOTSTRAP_SNAPSHOT_PATH", path)
+    snapshot = get_shared_snapshot()
+    snapshot.publish(_tables(50))
+
+    with patch.object(snapshot, "table", wraps=snapshot.table) as table:
+        fetcher = build_element_summary_fetcher([1], element_ids=[2, 5])
+
+    assert fetcher.player_ids == [5]
+    assert "elements" not in [call.args[0] for call in table.call_args_list]
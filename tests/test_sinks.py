@@ -0,0 +1,286 @@
+import json
+import asyncio
+import threading
+from unittest.mock import patch, AsyncMock, MagicMock
+
+import pytest
+
+from etl.process.element_summary import (
+    IncompleteRunError,
+    fetch_and_upload_element_summary,
+    fetch_and_upload_team_summary_async
+)
+from etl.process.refresh_scheduler import RefreshPlan
+from etl.upload.sinks import (
+    GcsBigQuerySink,
+    LocalSink,
+    NullSink,
+    Sink,
+    get_sink
+)
+
+
+ROWS = [{"element": 1, "data": {"round": 1}},
+        {"element": 2, "data": {"round": 1}}]
+
+
+def test_local_sink_writes_ndjson_and_counts(tmp_path):
+    sink = LocalSink(str(tmp_path))
+
+    sink.write("run", "element_summary_history", 1, ROWS)
+    sink.write("run", "element_summary_history", 2, ROWS[:1])
+
+    path = tmp_path / "run" / "element_summary_history_1.json"
+    lines = path.read_bytes().splitlines()
+    assert [json.loads(line) for line in lines] == ROWS
+    stats = sink.stats["element_summary_history"]
+    assert stats["rows"] == 3
+    assert stats["parts"] == 2
+    assert stats["bytes"] == sum(
+        p.stat().st_size for p in (tmp_path / "run").iterdir())
+
+
+def test_null_sink_counts_without_writing():
+    sink = NullSink()
+
+    sink.write("run", "element_summary_fixtures", 1, ROWS)
+    sink.load("run", ["element_summary_fixtures"])
+
+    assert sink.totals() == {"rows": 2, "bytes": len(
+        "\n".join(json.dumps(row) for row in ROWS).encode())}
+
+
+@patch("etl.upload.sinks.refresh_gameweek_aggregates")
+@patch("etl.upload.sinks.upload_element_summary_from_gcs_to_bigquery")
+@patch("etl.upload.sinks.upload_bytes_to_gcs")
+def test_gcs_sink_batches_objects_and_loads_manifest(
+        mock_upload, mock_load, mock_refresh):
+    sink = GcsBigQuerySink("project", "bucket", "dataset", object_bytes=100)
+
+    for team_id in range(1, 5):
+        sink.write("run", "element_summary_history", team_id, ROWS)
+    sink.write("run", "element_summary_fixtures", 1, ROWS[:1])
+    sink.load("run", ["element_summary_history", "element_summary_fixtures",
+                      "element_summary_history_past"])
+
+    uploaded = {call.kwargs["blob_name"]: call.kwargs["data"]
+                for call in mock_upload.call_args_list}
+    # Two parts fill each history object, the fixtures part is flushed
+    assert sorted(uploaded) == [
+        "run/_manifest.json",
+        "run/element_summary_fixtures_000.json",
+        "run/element_summary_history_000.json",
+        "run/element_summary_history_001.json",
+    ]
+    rows = [json.loads(line) for line in
+            uploaded["run/element_summary_history_001.json"].splitlines()]
+    assert rows == ROWS * 2
+    manifest = json.loads(uploaded["run/_manifest.json"])["tables"]
+    assert [o["rows"] for o in manifest["element_summary_history"]] == [4, 4]
+    loaded = {call.kwargs["table_id"]: call.kwargs["source_uris"]
+              for call in mock_load.call_args_list}
+    assert loaded == {
+        "element_summary_history": [
+            "gs://bucket/run/element_summary_history_000.json",
+            "gs://bucket/run/element_summary_history_001.json"],
+        "element_summary_fixtures": [
+            "gs://bucket/run/element_summary_fixtures_000.json"],
+    }
+    mock_refresh.assert_called_once_with(
+        "project", "dataset", element_ids=None)
+
+
+@patch("etl.upload.sinks.delete_folder_from_gcs", return_value=3)
+@patch("etl.upload.sinks.refresh_gameweek_aggregates")
+@patch("etl.upload.sinks.merge_element_summary_from_gcs_to_bigquery")
+@patch("etl.upload.sinks.upload_bytes_to_gcs")
+def test_gcs_sink_merges_then_deletes_the_incremental_folder(
+        mock_upload, mock_merge, mock_refresh, mock_delete):
+    sink = GcsBigQuerySink("project", "bucket", "dataset")
+
+    sink.write("run", "element_summary_history", 1, ROWS)
+    sink.write("run", "element_summary_fixtures", 1,
+               [{"element": 9, "data": {"event": 2}}])
+    sink.load("run", ["element_summary_history", "element_summary_fixtures"],
+              incremental=True)
+
+    assert mock_merge.call_count == 2
+    mock_refresh.assert_called_once_with(
+        "project", "dataset", element_ids=[1, 2])
+    mock_delete.assert_called_once_with("bucket", "run")
+
+
+@patch("etl.upload.sinks.delete_folder_from_gcs", return_value=1)
+@patch("etl.upload.sinks.refresh_gameweek_aggregates")
+@patch("etl.upload.sinks.merge_element_summary_from_gcs_to_bigquery")
+@patch("etl.upload.sinks.upload_bytes_to_gcs")
+def test_gcs_sink_merges_tables_the_refreshed_players_left_empty(
+        mock_upload, mock_merge, mock_refresh, mock_delete):
+    sink = GcsBigQuerySink("project", "bucket", "dataset")
+
+    sink.write("run", "element_summary_history", 1, ROWS)
+    sink.load("run", ["element_summary_history", "element_summary_fixtures"],
+              incremental=True, element_ids=[1, 2, 3])
+
+    merged = {call.kwargs["table_id"]: call.kwargs
+              for call in mock_merge.call_args_list}
+    assert merged["element_summary_fixtures"]["source_uris"] == []
+    assert merged["element_summary_fixtures"]["element_ids"] == [1, 2, 3]
+    mock_refresh.assert_called_once_with(
+        "project", "dataset", element_ids=[1, 2, 3])
+
+
+@patch("etl.upload.sinks.upload_bytes_to_gcs")
+def test_gcs_sink_stops_its_upload_threads_when_closed(mock_upload):
+    with GcsBigQuerySink("project", "bucket", "dataset",
+                         object_bytes=1) as sink:
+        sink.write("run", "element_summary_history", 1, ROWS)
+
+    assert sink._executor._shutdown
+
+
+@patch("etl.process.element_summary.load_run_bootstrap_static",
+       side_effect=RuntimeError("game updating"))
+def test_a_failed_run_closes_its_sink(mock_bootstrap):
+    sink = NullSink()
+
+    with patch.object(sink, "close") as mock_close:
+        with pytest.raises(RuntimeError):
+            fetch_and_upload_element_summary(
+                project_id=None, bucket_name=None, dataset_id=None,
+                sink=sink)
+
+    mock_close.assert_called_once()
+
+
+def test_get_sink(monkeypatch, tmp_path):
+    monkeypatch.setenv("SINK_DIR", str(tmp_path))
+
+    assert isinstance(get_sink("null"), NullSink)
+    assert get_sink("local").root_dir == str(tmp_path)
+    with pytest.raises(ValueError):
+        get_sink("gcs")
+    with pytest.raises(ValueError):
+        get_sink("s3")
+
+
+@patch("etl.process.element_summary.get_element_summary_for_teams")
+@patch("etl.process.element_summary.load_run_bootstrap_static",
+       return_value={"teams": [{"id": 1}, {"id": 2}]})
+def test_dry_run_reports_throughput(mock_bootstrap, mock_fetch,
+                                    element_summary_data):
+    mock_fetch.return_value = element_summary_data
+
+    report = fetch_and_upload_element_summary(
+        project_id=None,
+        bucket_name=None,
+        dataset_id=None,
+        replay_gameweek=1,
+        dry_run=True
+    )
+
+    assert report["sink"] == "null"
+    assert set(report["stages"]) == {
+        "bootstrap_static", "fetch_and_upload_teams", "load_tables"}
+    assert report["stages"]["fetch_and_upload_teams"]["rows"] == 6
+    assert report["tables"]["element_summary_history"]["parts"] == 2
+
+
+@patch("etl.process.element_summary.plan_changed_only_refresh")
+@patch("etl.process.element_summary.save_metrics_store")
+@patch("etl.process.element_summary.update_history_store")
+@patch("etl.process.element_summary.get_metrics_store")
+@patch("etl.process.element_summary.get_element_summary_for_teams")
+@patch("etl.process.element_summary.load_run_bootstrap_static",
+       return_value={"teams": [{"id": 1}], "elements": []})
+def test_live_dry_run_leaves_the_stores_alone(
+        mock_bootstrap, mock_fetch, mock_metrics, mock_history, mock_save,
+        mock_plan, element_summary_data):
+    mock_fetch.return_value = element_summary_data
+
+    report = fetch_and_upload_element_summary(
+        project_id=None,
+        bucket_name=None,
+        dataset_id=None,
+        changed_only=True,
+        dry_run=True
+    )
+
+    assert report["stages"]["fetch_and_upload_teams"]["rows"] == 3
+    mock_metrics.assert_not_called()
+    mock_history.assert_not_called()
+    mock_save.assert_not_called()
+    mock_plan.assert_not_called()
+
+
+@patch("etl.process.element_summary.fetch_and_upload_multiple_teams",
+       return_value={1: [], 2: None})
+@patch("etl.process.element_summary.load_run_bootstrap_static",
+       return_value={"teams": [{"id": 1}, {"id": 2}]})
+def test_full_run_with_a_failed_team_keeps_the_previous_load(
+        mock_bootstrap, mock_teams):
+    sink = NullSink()
+
+    with patch.object(sink, "load") as mock_load:
+        with pytest.raises(IncompleteRunError, match=r"\[2\]"):
+            fetch_and_upload_element_summary(
+                project_id=None, bucket_name=None, dataset_id=None,
+                replay_gameweek=1, sink=sink)
+
+    mock_load.assert_not_called()
+
+
+@patch("etl.process.element_summary.update_history_store")
+@patch("etl.process.element_summary.build_element_summary_fetcher")
+def test_async_team_updates_the_stores_off_the_event_loop(
+        mock_fetcher, mock_history, element_summary_data):
+    mock_fetcher.return_value.run_async = AsyncMock(
+        return_value=element_summary_data)
+    threads = []
+    mock_history.side_effect = lambda data: threads.append(
+        threading.get_ident())
+    metrics_store = MagicMock()
+    metrics_store.apply_results.side_effect = lambda data: threads.append(
+        threading.get_ident())
+
+    failed = asyncio.run(fetch_and_upload_team_summary_async(
+        session=None, team_id=1, sink=NullSink(),
+        metrics_store=metrics_store))
+
+    assert failed == []
+    assert len(threads) == 2
+    assert threading.get_ident() not in threads
+
+
+def test_sinks_must_implement_write():
+    class IncompleteSink(Sink):
+        name = "incomplete"
+
+    with pytest.raises(TypeError):
+        IncompleteSink()
+
+
+@patch("etl.process.element_summary.fetch_and_upload_multiple_teams",
+       return_value={1: [5], 2: None})
+@patch("etl.process.element_summary.plan_changed_only_refresh")
+@patch("etl.process.element_summary.load_run_bootstrap_static")
+def test_changed_only_run_merges_the_refreshed_players(
+        mock_bootstrap, mock_plan, mock_teams):
+    elements = [{"id": 1, "team": 1}, {"id": 5, "team": 1},
+                {"id": 7, "team": 2}]
+    mock_bootstrap.return_value = {"teams": [{"id": 1}, {"id": 2}],
+                                   "elements": elements}
+    scheduler = MagicMock()
+    mock_plan.return_value = (scheduler, RefreshPlan([1, 5, 7], [], {}, 0),
+                              {1: [1, 5], 2: [7]}, "incremental/run")
+    sink = NullSink()
+
+    with patch.object(sink, "load") as mock_load:
+        fetch_and_upload_element_summary(
+            project_id=None, bucket_name=None, dataset_id=None,
+            replay_gameweek=1, changed_only=True, sink=sink)
+
+    assert mock_load.call_args.kwargs == {"incremental": True,
+                                          "element_ids": [1]}
+    scheduler.commit.assert_called_once_with(
+        mock_plan.return_value[1], [5, 7])
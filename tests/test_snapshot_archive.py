@@ -0,0 +1,118 @@
+import asyncio
+import threading
+from unittest.mock import MagicMock
+
+from etl.archive import SnapshotArchive, current_gameweek
+from etl.archive.replay import (
+    ReplayBootstrapStaticFetcher,
+    ReplayElementSummaryFetcher
+)
+from etl.fetch.element_summary import ElementSummaryFetcher
+
+
+def test_put_deduplicates_by_content(tmp_path, element_summary_data):
+    archive = SnapshotArchive(str(tmp_path))
+
+    first = archive.put("element_summary", element_summary_data, 3, key=1)
+    second = archive.put("element_summary", element_summary_data, 3, key=1)
+    other_key = archive.put("element_summary", element_summary_data, 3, key=2)
+
+    assert first == second == other_key
+    assert len(list((tmp_path / "objects").rglob("*.json.*"))) == 1
+    # Unchanged payloads for the same key are not re-indexed
+    assert [e["key"] for e in archive.entries(3)] == [1, 2]
+    assert archive.get(first) == element_summary_data
+
+
+def test_latest_survives_reopening(tmp_path):
+    archive = SnapshotArchive(str(tmp_path))
+    archive.put("element_summary", {"history": [1]}, 5, key=7)
+    archive.put("element_summary", {"history": [1, 2]}, 5, key=7)
+
+    reopened = SnapshotArchive(str(tmp_path))
+    assert reopened.latest("element_summary", 5, key=7) == {"history": [1, 2]}
+    assert reopened.latest("element_summary", 6, key=7) is None
+
+
+def test_bootstrap_static_indexed_under_current_gameweek(
+        tmp_path,
+        sample_bootstrap_data):
+    sample_bootstrap_data["events"] = [
+        {"id": 1, "is_current": False},
+        {"id": 2, "is_current": True},
+    ]
+    archive = SnapshotArchive(str(tmp_path))
+    archive.put_bootstrap_static(sample_bootstrap_data)
+
+    assert current_gameweek(sample_bootstrap_data["events"]) == 2
+    replayed = ReplayBootstrapStaticFetcher(archive, 2).run()
+    assert replayed["elements"] == sample_bootstrap_data["elements"]
+
+
+def test_replay_element_summary(tmp_path, element_summary_data):
+    archive = SnapshotArchive(str(tmp_path))
+    archive.put("element_summary", element_summary_data, 4, key=1)
+
+    fetcher = ReplayElementSummaryFetcher([1, 2], archive, 4)
+    data = fetcher.run()
+
+    assert data["history"] == [
+        {"element": 1, "data": {"history_data": "example"}}]
+    assert data["errors"] == [
+        {"player_id": 2, "error": "Not archived for gameweek 4"}]
+
+
+def test_processes_sharing_an_archive_do_not_index_twice(tmp_path):
+    # Separate instances stand in for worker processes, each with its own
+    # cache of the index
+    first = SnapshotArchive(str(tmp_path))
+    second = SnapshotArchive(str(tmp_path))
+    first.latest_digests("element_summary", 3)
+
+    old = first.put("element_summary", {"history": [1]}, 3, key=7)
+    second.put("element_summary", {"history": [1]}, 3, key=7)
+    new = second.put("element_summary", {"history": [1, 2]}, 3, key=7)
+    first.put("element_summary", {"history": [1, 2]}, 3, key=7)
+    # A payload that changed back is indexed again
+    first.put("element_summary", {"history": [1]}, 3, key=7)
+
+    assert [e["sha256"] for e in first.entries(3)] == [old, new, old]
+
+
+class _Response:
+    status = 200
+
+    def __init__(self, payload):
+        self.payload = payload
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def json(self):
+        return self.payload
+
+
+def test_fetched_payloads_are_archived_off_the_event_loop(
+        tmp_path, element_summary_data):
+    archive = SnapshotArchive(str(tmp_path))
+    threads = []
+    put = archive.put
+
+    def recording_put(*args, **kwargs):
+        threads.append(threading.get_ident())
+        return put(*args, **kwargs)
+
+    archive.put = recording_put
+    session = MagicMock()
+    session.get.return_value = _Response(element_summary_data)
+    fetcher = ElementSummaryFetcher([7], archive=archive, gameweek=3)
+
+    result = asyncio.run(fetcher.fetch_player(session, 7))
+
+    assert "error" not in result
+    assert len(threads) == 1 and threads[0] != threading.get_ident()
+    assert archive.latest("element_summary", 3, key=7) == \
+        element_summary_data